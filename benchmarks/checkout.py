@@ -0,0 +1,63 @@
+"""
+Query count and latency of checkout for carts of 1, 10 and 100 lines.
+
+Compares the original per-line loop (3N+1 queries, no transaction) with
+:func:`store.checkout.place_order`::
+
+    python -m benchmarks.checkout
+"""
+from benchmarks.harness import test_database, timed
+
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+
+from store.checkout import place_order
+from store.models import Order, OrderItem, Product, Store, User
+
+CART_SIZES = (1, 10, 100)
+REPEAT = 20
+
+
+def legacy_checkout(user, cart):
+    """The per-line checkout loop that ``place_order`` replaced."""
+    for product_id, quantity in cart.items():
+        product = Product.objects.get(id=product_id)
+        if product.stock < quantity:
+            raise ValueError(product.name)
+    order = Order.objects.create(user=user)
+    for product_id, quantity in cart.items():
+        product = Product.objects.get(id=product_id)
+        OrderItem.objects.create(order=order, product=product,
+                                 quantity=quantity, price=product.price)
+        product.stock -= quantity
+        product.save()
+    return order
+
+
+def main():
+    with test_database():
+        vendor = User.objects.create_user('bench-vendor', role=User.VENDOR)
+        buyer = User.objects.create_user('bench-buyer', role=User.BUYER)
+        store = Store.objects.create(owner=vendor, name='Bench Store')
+        Product.objects.bulk_create([
+            Product(store=store, name=f'P{i}', price='9.99', stock=10 ** 6)
+            for i in range(max(CART_SIZES))
+        ])
+        ids = list(Product.objects.values_list('id', flat=True))
+
+        print(f"{'lines':>5} {'impl':>8} {'queries':>8} "
+              f"{'p50 ms':>8} {'p99 ms':>8}")
+        for size in CART_SIZES:
+            cart = {str(pk): 1 for pk in ids[:size]}
+            for label, impl in (('legacy', legacy_checkout),
+                                ('engine', place_order)):
+                reset_queries()
+                with CaptureQueriesContext(connection) as ctx:
+                    impl(buyer, cart)
+                stats = timed(lambda: impl(buyer, cart), REPEAT)
+                print(f"{size:>5} {label:>8} {len(ctx):>8} "
+                      f"{stats['p50']:>8.2f} {stats['p99']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Resident memory while exporting a large store catalog.
+
+Streams the CSV export of :mod:`store.exports` and samples the process
+RSS as chunks are produced, then builds the same CSV the buffered way
+(model instances in a list, one big string, as a plain ``HttpResponse``
+would need) for comparison::
+
+    python -m benchmarks.export_memory [products]
+
+Defaults to one million products. RSS is read from ``/proc`` (Linux).
+"""
+import csv
+import io
+import os
+import sys
+import time
+
+from benchmarks.harness import test_database
+
+from store.exports import PRODUCT_EXPORT_COLUMNS, store_products_export
+from store.models import Product, Store, User
+
+SEED_CHUNK = 10_000
+SAMPLE_EVERY = 50
+
+
+def rss_mb() -> float:
+    with open('/proc/self/statm') as fh:
+        pages = int(fh.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
+def buffered_export(store_id: int) -> str:
+    """Builds the whole export in memory before responding."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow([name for name, _ in PRODUCT_EXPORT_COLUMNS])
+    for product in list(Product.objects.filter(store_id=store_id)):
+        writer.writerow([getattr(product, lookup)
+                         for _, lookup in PRODUCT_EXPORT_COLUMNS])
+    return out.getvalue()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 6
+    with test_database():
+        vendor = User.objects.create_user('bench-vendor', role=User.VENDOR)
+        store = Store.objects.create(owner=vendor, name='Bench Store')
+        for start in range(0, count, SEED_CHUNK):
+            Product.objects.bulk_create([
+                Product(store=store, name=f'Product {i}', price='9.99',
+                        stock=i % 50, description='A fine product. ' * 4)
+                for i in range(start, min(start + SEED_CHUNK, count))
+            ])
+
+        baseline = rss_mb()
+        peak = baseline
+        size = 0
+        began = time.perf_counter()
+        for i, chunk in enumerate(store_products_export(store.id, 'csv')):
+            size += len(chunk)
+            if i % SAMPLE_EVERY == 0:
+                peak = max(peak, rss_mb())
+        elapsed = time.perf_counter() - began
+        print(f"{count} rows, {size / 2 ** 20:.0f} MB of CSV")
+        print(f"streamed   {elapsed:6.1f}s  RSS {baseline:7.1f} MB -> "
+              f"peak {peak:7.1f} MB (+{peak - baseline:.1f})")
+
+        baseline = rss_mb()
+        began = time.perf_counter()
+        body = buffered_export(store.id)
+        elapsed = time.perf_counter() - began
+        peak = rss_mb()
+        print(f"buffered   {elapsed:6.1f}s  RSS {baseline:7.1f} MB -> "
+              f"after {peak:7.1f} MB (+{peak - baseline:.1f}, "
+              f"{len(body) / 2 ** 20:.0f} MB body)")
+
+
+if __name__ == '__main__':
+    main()
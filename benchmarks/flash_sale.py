@@ -0,0 +1,84 @@
+"""
+Hundreds of buyers checking out the same SKU at once.
+
+Each buyer reserves one unit (:func:`store.checkout.reserve_cart`) and
+then places the order, from a pool of worker threads with their own
+database connections. The script checks that exactly ``stock`` orders
+went through and nothing was oversold, and reports latency per step::
+
+    python -m benchmarks.flash_sale [buyers] [workers]
+
+Run it against MySQL/MariaDB; SQLite serialises every writer and says
+little about row-lock contention.
+"""
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.harness import test_database
+
+from django.db import connection, connections
+
+from store.checkout import CheckoutError, place_order, reserve_cart
+from store.models import Order, Product, Store, User
+
+STOCK = 100
+
+
+def percentile(samples: list, fraction: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def main():
+    buyers = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    with test_database():
+        vendor = User.objects.create_user('flash-vendor', role=User.VENDOR)
+        store = Store.objects.create(owner=vendor, name='Flash Store')
+        product = Product.objects.create(store=store, name='Hot Item',
+                                         price='9.99', stock=STOCK)
+        users = User.objects.bulk_create([
+            User(username=f'flash-buyer-{i}', role=User.BUYER)
+            for i in range(buyers)])
+        cart = {str(product.id): 1}
+        connection.close()
+
+        def buy(user):
+            timings, outcome = {}, 'ordered'
+            try:
+                start = time.perf_counter()
+                reserve_cart(user, cart)
+                timings['reserve'] = time.perf_counter() - start
+                start = time.perf_counter()
+                place_order(user, cart)
+                timings['order'] = time.perf_counter() - start
+            except CheckoutError:
+                outcome = 'sold out'
+            finally:
+                connections.close_all()
+            return outcome, timings
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(buy, users))
+        elapsed = time.perf_counter() - start
+
+        product.refresh_from_db()
+        ordered = sum(outcome == 'ordered' for outcome, _ in results)
+        print(f"{buyers} buyers, {workers} workers, {STOCK} units: "
+              f"{ordered} orders, {buyers - ordered} sold out, "
+              f"{elapsed:.2f}s")
+        print(f"stock left {product.stock}, orders in db "
+              f"{Order.objects.count()}, oversold "
+              f"{max(0, Order.objects.count() - STOCK)}")
+        for step in ('reserve', 'order'):
+            samples = [t[step] * 1000 for _, t in results if step in t]
+            if samples:
+                print(f"{step:>8} p50 {statistics.median(samples):8.2f} ms  "
+                      f"p99 {percentile(samples, 0.99):8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Shared set-up for the scripts in this package.
+
+Every benchmark runs against a throwaway test database created from the
+configured ``DATABASES['default']`` (``test_<NAME>``), so it never
+touches real data. Run them from the project root, e.g.::
+
+    python -m benchmarks.checkout
+"""
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce_project.settings')
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import (setup_test_environment,  # noqa: E402
+                               teardown_test_environment)
+
+
+@contextmanager
+def test_database():
+    """
+    Creates the test database on entry and destroys it on exit.
+    """
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def timed(func, repeat: int) -> dict:
+    """
+    Calls ``func`` ``repeat`` times and summarises the wall-clock latency.
+
+    :param func: A zero-argument callable to measure.
+    :param repeat: How many times to call it.
+    :return: ``{'p50': ms, 'p99': ms, 'mean': ms}``.
+    :rtype: dict
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'p50': samples[len(samples) // 2],
+        'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        'mean': statistics.fmean(samples),
+    }
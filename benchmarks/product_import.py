@@ -0,0 +1,71 @@
+"""
+Throughput of the bulk product import against the one-form-per-product
+path of ``create_product``::
+
+    python -m benchmarks.product_import [rows] [per-row rows]
+
+Imports a synthetic CSV of ``rows`` products (default 50,000) with
+:func:`store.imports.import_products`, once into an empty store and once
+more as updates, then saves ``per-row rows`` products (default 2,000)
+one ``ProductForm`` at a time, as the view does (without the tweet).
+"""
+import io
+import sys
+import time
+
+from benchmarks.harness import test_database
+
+from django.db import transaction
+
+from store.forms import ProductForm
+from store.imports import import_products, read_rows
+from store.models import Store, User
+
+
+def synthetic_csv(count: int, price: str = '9.99') -> str:
+    out = io.StringIO()
+    out.write('sku,name,price,stock,description\n')
+    for i in range(count):
+        out.write(f'SKU-{i},Product {i},{price},{i % 50},A fine product\n')
+    return out.getvalue()
+
+
+def bulk(store, text: str) -> float:
+    started = time.perf_counter()
+    result = import_products(store, read_rows(io.StringIO(text), 'csv'))
+    elapsed = time.perf_counter() - started
+    return (result.imported + result.rejected) / elapsed
+
+
+def per_row(store, count: int) -> float:
+    started = time.perf_counter()
+    for i in range(count):
+        form = ProductForm({'name': f'Product {i}', 'price': '9.99',
+                            'stock': i % 50})
+        form.is_valid()
+        product = form.save(commit=False)
+        product.store = store
+        with transaction.atomic():
+            product.save()
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    single = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    with test_database():
+        vendor = User.objects.create_user('bench-vendor', role=User.VENDOR)
+        store = Store.objects.create(owner=vendor, name='Bench Store')
+        other = Store.objects.create(owner=vendor, name='Per-row Store')
+
+        print(f"bulk insert   {bulk(store, synthetic_csv(rows)):>9.0f} rows/s"
+              f"  ({rows} rows)")
+        print(f"bulk update   "
+              f"{bulk(store, synthetic_csv(rows, '8.99')):>9.0f} rows/s"
+              f"  ({rows} rows)")
+        print(f"per-row form  {per_row(other, single):>9.0f} rows/s"
+              f"  ({single} rows)")
+
+
+if __name__ == '__main__':
+    main()
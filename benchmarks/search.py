@@ -0,0 +1,78 @@
+"""
+Build time, index size and query latency of the product search index
+over a synthetic catalog, compared with a linear substring scan (what a
+``LIKE '%term%'`` query does)::
+
+    python -m benchmarks.search [products]
+
+Product text is drawn from a Zipf-distributed vocabulary, like real
+catalog text where a few words are everywhere and most are rare. Each
+query is timed as served by ``search_products``, with the last term
+matched as a prefix (``prefix``), and with whole words only
+(``exact``). The index is in-process, so no database is needed (the
+``in_bulk`` of the results is not timed). Defaults to one million
+products.
+"""
+import itertools
+import random
+import sys
+import time
+
+from benchmarks.harness import timed
+
+from store.search import SearchIndex
+
+VOCABULARY = 20000
+QUERIES = ('w1', 'w25 w300', 'w40', 'w1200 w7', 'w2', 'w25 w3',
+           'w900 w15000 w3')
+REPEAT = 50
+
+
+def catalog(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    words = [f'w{rank}' for rank in range(1, VOCABULARY + 1)]
+    weights = list(itertools.accumulate(1 / rank
+                                        for rank in range(1, VOCABULARY + 1)))
+    for product_id in range(1, count + 1):
+        yield (product_id,
+               ' '.join(rng.choices(words, cum_weights=weights, k=4)),
+               ' '.join(rng.choices(words, cum_weights=weights, k=25)))
+
+
+def index_size(index: SearchIndex) -> int:
+    arrays = [array for posting in index.postings.values()
+              for array in posting]
+    arrays += [index.slot_products, index.slot_lengths]
+    return sum(a.itemsize * len(a) for a in arrays)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 6
+    start = time.perf_counter()
+    index = SearchIndex.build(catalog(count))
+    print(f"Indexed {count} products in {time.perf_counter() - start:.1f}s; "
+          f"posting arrays {index_size(index) / 2 ** 20:.0f} MiB, "
+          f"{len(index.terms)} terms")
+
+    texts = [f'{name} {description}' for _, name, description
+             in catalog(min(count, 10 ** 5))]
+    print(f"{'query':>16} {'postings':>9} {'impl':>6} "
+          f"{'p50 ms':>8} {'p99 ms':>8}")
+    for query in QUERIES:
+        postings = sum(len(index.postings.get(term, ((),))[0])
+                       for term in query.split())
+        for impl, prefix in (('prefix', True), ('exact', False)):
+            index.search(query, prefix=prefix)
+            stats = timed(lambda: index.search(query, prefix=prefix),
+                          REPEAT)
+            print(f"{query:>16} {postings:>9} {impl:>6} "
+                  f"{stats['p50']:>8.2f} {stats['p99']:>8.2f}")
+    term = QUERIES[-1].split()[0]
+    stats = timed(lambda: [t for t in texts if term in t], 5)
+    print(f"{'scan ' + term:>16} {len(texts):>9} {'scan':>6} "
+          f"{stats['p50']:>8.2f} {stats['p99']:>8.2f}"
+          f"  (first {len(texts)} products only)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Checkout throughput on one hot product, with its stock in a single row
+versus split over stock shards.
+
+Worker threads with their own database connections place one-unit
+orders for the same product through :func:`store.checkout.place_order`
+(the engine behind the ``checkout`` view) for a fixed number of orders::
+
+    python -m benchmarks.sharded_stock [orders] [workers] [shards]
+
+Run it against MySQL/MariaDB; SQLite serialises every writer, so both
+modes measure the same global lock there.
+"""
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.harness import test_database
+
+from django.db import connection, connections
+
+from store.checkout import CheckoutError, place_order
+from store.models import Product, Store, User
+from store.stock import rebalance, shard_totals
+
+
+def run(product, buyers, orders: int, workers: int) -> dict:
+    cart = {str(product.id): 1}
+    connection.close()
+
+    def buy(i):
+        start = time.perf_counter()
+        try:
+            place_order(buyers[i % len(buyers)], cart)
+            return time.perf_counter() - start
+        except CheckoutError:
+            return None
+        finally:
+            connections.close_all()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        samples = list(pool.map(buy, range(orders)))
+    elapsed = time.perf_counter() - start
+    ok = sorted(s * 1000 for s in samples if s is not None)
+    return {'orders/s': len(ok) / elapsed,
+            'failed': orders - len(ok),
+            'p50': statistics.median(ok) if ok else 0.0,
+            'p99': ok[min(len(ok) - 1, int(len(ok) * 0.99))] if ok else 0.0}
+
+
+def main():
+    orders = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    shards = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    with test_database():
+        vendor = User.objects.create_user('hot-vendor', role=User.VENDOR)
+        store = Store.objects.create(owner=vendor, name='Hot Store')
+        buyers = User.objects.bulk_create([
+            User(username=f'hot-buyer-{i}', role=User.BUYER)
+            for i in range(workers)])
+        single = Product.objects.create(store=store, name='Single',
+                                        price='1.00', stock=orders * 2)
+        sharded = Product.objects.create(store=store, name='Sharded',
+                                         price='1.00', stock=orders * 2)
+        rebalance(sharded, shards)
+
+        print(f"{orders} orders, {workers} workers")
+        print(f"{'mode':>12} {'orders/s':>9} {'failed':>7} "
+              f"{'p50 ms':>8} {'p99 ms':>8}")
+        for label, product in (('single row', single),
+                               (f'{shards} shards', sharded)):
+            stats = run(product, buyers, orders, workers)
+            print(f"{label:>12} {stats['orders/s']:>9.0f} "
+                  f"{stats['failed']:>7} {stats['p50']:>8.2f} "
+                  f"{stats['p99']:>8.2f}")
+
+        single.refresh_from_db()
+        left = shard_totals([sharded.id])[sharded.id]
+        print(f"stock left: single {single.stock}, sharded {left} "
+              f"(both started at {orders * 2})")
+
+
+if __name__ == '__main__':
+    main()
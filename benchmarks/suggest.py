@@ -0,0 +1,55 @@
+"""
+Build time and lookup latency of the type-ahead suggester over synthetic
+product names, compared with a linear ``startswith`` scan (what an
+unindexed ``name__istartswith`` query does)::
+
+    python -m benchmarks.suggest [names]
+
+The suggester is in-process, so no database is needed. Defaults to one
+million names.
+"""
+import random
+import string
+import sys
+import time
+
+from benchmarks.harness import timed
+
+from store.suggest import Suggester
+
+WORDS = ['blue', 'red', 'steel', 'wooden', 'cotton', 'leather', 'glass',
+         'smart', 'mini', 'pro', 'eco', 'lamp', 'mug', 'chair', 'desk',
+         'speaker', 'cable', 'shirt', 'shoe', 'bag', 'watch', 'phone']
+REPEAT = 2000
+
+
+def names(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    for product_id in range(1, count + 1):
+        name = ' '.join(rng.choices(WORDS, k=3))
+        yield product_id, f'{name} {product_id}', int(rng.paretovariate(1.2))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 6
+    start = time.perf_counter()
+    suggester = Suggester(names(count))
+    print(f"Built suggester for {len(suggester)} names in "
+          f"{time.perf_counter() - start:.1f}s")
+
+    rng = random.Random(2)
+    prefixes = [rng.choice(string.ascii_lowercase[:20])
+                for _ in range(REPEAT // 2)]
+    prefixes += [rng.choice(suggester.keys)[:rng.randint(2, 12)]
+                 for _ in range(REPEAT // 2)]
+    queue = iter(prefixes * 2)
+    stats = timed(lambda: suggester.suggest(next(queue)), REPEAT)
+    print(f"suggest   p50 {stats['p50']:.3f} ms  p99 {stats['p99']:.3f} ms")
+
+    keys = suggester.keys
+    stats = timed(lambda: [k for k in keys if k.startswith('blue s')], 3)
+    print(f"scan      p50 {stats['p50']:.3f} ms  p99 {stats['p99']:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Latency of the vendor order list for a vendor with many orders.
+
+Compares the original ``DISTINCT`` join over order items (which loaded
+every order the vendor ever received) with first and deep keyset pages
+of :class:`store.models.VendorOrderSummary`::
+
+    python -m benchmarks.vendor_orders [orders]
+
+Defaults to 100,000 orders.
+"""
+import sys
+from io import StringIO
+
+from benchmarks.harness import test_database, timed
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from store.models import (Order, OrderItem, Product, Store, User,
+                          VendorOrderSummary)
+from store.pagination import encode_cursor, keyset_page
+from store.views import VENDOR_ORDER_ORDERING
+
+PAGE_SIZE = 25
+CHUNK = 5000
+REPEAT = 50
+
+
+def legacy_orders(vendor):
+    """The query ``vendor_orders`` ran before the summary table."""
+    stores = Store.objects.filter(owner=vendor)
+    return list(Order.objects
+                .filter(items__product__store__in=stores)
+                .select_related('user')
+                .distinct())
+
+
+def summary_page(vendor, cursor=None):
+    return keyset_page(VendorOrderSummary.objects
+                       .filter(vendor=vendor).select_related('store'),
+                       VENDOR_ORDER_ORDERING, cursor, PAGE_SIZE)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with test_database():
+        vendor = User.objects.create_user('bench-vendor', role=User.VENDOR)
+        buyer = User.objects.create_user('bench-buyer', role=User.BUYER)
+        store = Store.objects.create(owner=vendor, name='Bench Store')
+        products = Product.objects.bulk_create([
+            Product(store=store, name=f'P{i}', price='9.99', stock=0)
+            for i in range(20)
+        ])
+        now = timezone.now()
+        for start in range(0, count, CHUNK):
+            orders = Order.objects.bulk_create([
+                Order(user=buyer, total='19.98', created_at=now)
+                for _ in range(min(CHUNK, count - start))
+            ])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=products[(order.pk + i) % 20],
+                          quantity=1, price='9.99')
+                for order in orders for i in range(2)
+            ])
+        call_command('backfill_vendor_order_summaries', stdout=StringIO())
+        print(f"{count} orders, {PAGE_SIZE} per page")
+
+        stats = timed(lambda: legacy_orders(vendor), 3)
+        print(f"distinct join   p50 {stats['p50']:>9.2f} ms  "
+              f"p99 {stats['p99']:>9.2f} ms")
+        stats = timed(lambda: summary_page(vendor), REPEAT)
+        print(f"first page      p50 {stats['p50']:>9.2f} ms  "
+              f"p99 {stats['p99']:>9.2f} ms")
+
+        middle = (VendorOrderSummary.objects.filter(vendor=vendor)
+                  .order_by(*VENDOR_ORDER_ORDERING)[count // 2])
+        cursor = encode_cursor(middle, VENDOR_ORDER_ORDERING)
+        stats = timed(lambda: summary_page(vendor, cursor), REPEAT)
+        print(f"middle page     p50 {stats['p50']:>9.2f} ms  "
+              f"p99 {stats['p99']:>9.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -49,11 +49,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'store.middleware.QueryCountMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'store.middleware.SessionCartMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -155,6 +157,62 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Cache for rendered pages and fragments. Local memory by default; point
+# CACHE_BACKEND/CACHE_LOCATION at a shared cache (e.g.
+# django.core.cache.backends.redis.RedisCache) when running several
+# workers so invalidation reaches all of them
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND',
+                             'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'ecommerce'),
+    }
+}
+
+# Seconds a cached product page is served fresh, and then served stale
+# while a single worker rebuilds it
+PRODUCT_CACHE_TTL = 300
+PRODUCT_CACHE_STALE_TTL = 600
+
+# Seconds a rendered catalog listing is served before it is re-rendered.
+# Product and store changes retire cached listings immediately by bumping
+# the catalog generation, so this only bounds how long an idle entry lives
+CATALOG_CACHE_TTL = int(os.getenv('CATALOG_CACHE_TTL', 300))
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'store.pagination.IdCursorPagination',
+    'PAGE_SIZE': 50,
+}
+
+# Statement shapes repeated more than this many times in one request are
+# logged as possible N+1 queries; override per URL name in the dict below
+QUERY_N_PLUS_ONE_THRESHOLD = 10
+QUERY_N_PLUS_ONE_THRESHOLDS = {}
+
+# Products per page on the keyset-paginated home and catalog pages
+CATALOG_PAGE_SIZE = int(os.getenv('CATALOG_PAGE_SIZE', 24))
+
+# Seconds checkout holds a cart's stock for the buyer before the units
+# return to the shelf; lapsed holds are swept by expire_reservations
+STOCK_RESERVATION_TTL = int(os.getenv('STOCK_RESERVATION_TTL', 600))
+
+# File the build_search_index command writes the product search index to
+SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH',
+                              str(BASE_DIR / 'search_index.pickle'))
+
+# Reviews per page on the product detail page and its "load more" endpoint
+REVIEW_PAGE_SIZE = int(os.getenv('REVIEW_PAGE_SIZE', 10))
+
+# Rows per page on the vendor order list
+VENDOR_ORDER_PAGE_SIZE = int(os.getenv('VENDOR_ORDER_PAGE_SIZE', 25))
+
+# Seconds a process serves type-ahead suggestions before re-reading their
+# popularity; new, renamed and deleted products are picked up at once
+SUGGEST_REFRESH_SECONDS = int(os.getenv('SUGGEST_REFRESH_SECONDS', 3600))
+
+# Items accepted per request by /api/products/bulk/ and bulk-stock/
+PRODUCT_BULK_MAX_ITEMS = int(os.getenv('PRODUCT_BULK_MAX_ITEMS', 1000))
+
 # --- Twitter API Credentials from .env ---
 TWITTER_CONSUMER_KEY = os.getenv('TWITTER_CONSUMER_KEY')              # legacy/read-only
 TWITTER_CONSUMER_SECRET = os.getenv('TWITTER_CONSUMER_SECRET')
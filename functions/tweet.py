@@ -1,21 +1,217 @@
+import logging
+import threading
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling the Twitter API while the breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated errors instead of hammering a failing API.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    every call is rejected for ``reset_timeout`` seconds. The first call
+    after that window is let through as a trial: success closes the
+    breaker, failure opens it for another window.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Raises :class:`CircuitOpenError` if a call may not be made."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if (self.state == self.OPEN
+                    and self.clock() - self.opened_at >= self.reset_timeout):
+                self.state = self.HALF_OPEN
+                return
+            raise CircuitOpenError("Twitter API circuit is open; "
+                                   "not calling it until it cools down.")
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if (self.state == self.HALF_OPEN
+                    or self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+
+class TweetMetrics:
+    """
+    Thread-safe counters for calls to the Twitter API.
+
+    The counters live in the process that posts the tweets. :meth:`collect`
+    hands over what was counted since its last call, so the worker can add
+    it to counters shared with the process that serves them, and
+    :func:`render_metrics` formats the totals for Prometheus.
+    """
+    LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    NAMES = (('requests', 'failures', 'short_circuited', 'latency_us')
+             + tuple(f'latency_le_{bound}' for bound in LATENCY_BUCKETS))
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.requests = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * len(self.LATENCY_BUCKETS)
+
+    def observe(self, seconds: float, failed: bool):
+        with self._lock:
+            self.requests += 1
+            self.failures += failed
+            self.latency_sum += seconds
+            for i, bound in enumerate(self.LATENCY_BUCKETS):
+                if seconds <= bound:
+                    self.latency_buckets[i] += 1
+
+    def short_circuit(self):
+        with self._lock:
+            self.short_circuited += 1
+
+    def collect(self) -> dict:
+        """
+        Returns the counts since the last call and resets them.
+
+        :return: Integer counts keyed by the names in :attr:`NAMES`. The
+            latency sum is in microseconds.
+        :rtype: dict
+        """
+        with self._lock:
+            counts = {'requests': self.requests,
+                      'failures': self.failures,
+                      'short_circuited': self.short_circuited,
+                      'latency_us': round(self.latency_sum * 1_000_000)}
+            for bound, count in zip(self.LATENCY_BUCKETS,
+                                    self.latency_buckets):
+                counts[f'latency_le_{bound}'] = count
+            self._reset()
+        return counts
+
+
+def render_metrics(counts: dict, breaker_state: str = None) -> str:
+    """
+    Formats counts in the shape returned by :meth:`TweetMetrics.collect`
+    in the Prometheus text exposition format.
+
+    :param counts: The counts; missing ones are reported as zero.
+    :type counts: dict
+    :param breaker_state: The :class:`CircuitBreaker` state, if known.
+    :type breaker_state: str
+    :return: The exposition text.
+    :rtype: str
+    """
+    requests_total = counts.get('requests', 0)
+    lines = [
+        '# TYPE tweet_requests_total counter',
+        f'tweet_requests_total {requests_total}',
+        '# TYPE tweet_failures_total counter',
+        f'tweet_failures_total {counts.get("failures", 0)}',
+        '# TYPE tweet_short_circuited_total counter',
+        f'tweet_short_circuited_total {counts.get("short_circuited", 0)}',
+        '# TYPE tweet_latency_seconds histogram',
+    ]
+    for bound in TweetMetrics.LATENCY_BUCKETS:
+        lines.append(f'tweet_latency_seconds_bucket{{le="{bound}"}} '
+                     f'{counts.get(f"latency_le_{bound}", 0)}')
+    lines += [
+        f'tweet_latency_seconds_bucket{{le="+Inf"}} {requests_total}',
+        f'tweet_latency_seconds_sum '
+        f'{counts.get("latency_us", 0) / 1_000_000:.6f}',
+        f'tweet_latency_seconds_count {requests_total}',
+    ]
+    if breaker_state is not None:
+        lines += ['# TYPE tweet_circuit_open gauge',
+                  f'tweet_circuit_open {int(breaker_state != "closed")}']
+    return '\n'.join(lines) + '\n'
+
 
 class Tweet:
+    """
+    Process-wide client for posting tweets through the Twitter v2 API.
+
+    The singleton owns a pooled ``requests.Session`` so connections are
+    kept alive between posts, applies connect/read timeouts to every call,
+    and guards the API with a :class:`CircuitBreaker`.
+    """
     _instance = None
+    URL = "https://api.twitter.com/2/tweets"
+    CONNECT_TIMEOUT = 3.05
+    READ_TIMEOUT = 10
+    POOL_SIZE = 10
 
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(Tweet, cls).__new__(cls)
+            instance = super(Tweet, cls).__new__(cls)
+            instance.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1,
+                                  pool_maxsize=cls.POOL_SIZE)
+            instance.session.mount('https://', adapter)
+            instance.breaker = CircuitBreaker()
+            instance.metrics = TweetMetrics()
+            cls._instance = instance
         return cls._instance
 
     def make_tweet(self, tweet, user_token):
-        url = "https://api.twitter.com/2/tweets"
+        try:
+            self.breaker.allow()
+        except CircuitOpenError:
+            self.metrics.short_circuit()
+            raise
         headers = {
             "Authorization": f"Bearer {user_token}",
             "Content-Type": "application/json"
         }
-        response = requests.post(url, headers=headers, json=tweet)
-        if response.status_code not in (200, 201):
+        start = time.perf_counter()
+        try:
+            response = self.session.post(
+                self.URL, headers=headers, json=tweet,
+                timeout=(self.CONNECT_TIMEOUT, self.READ_TIMEOUT))
+        except requests.RequestException:
+            self.metrics.observe(time.perf_counter() - start, failed=True)
+            self.breaker.record_failure()
+            raise
+        failed = response.status_code not in (200, 201)
+        self.metrics.observe(time.perf_counter() - start, failed=failed)
+        if failed:
+            # Client errors (bad token, duplicate text) say nothing about the
+            # API's health, so only server errors and throttling trip it
+            if response.status_code >= 500 or response.status_code == 429:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
             raise Exception(f"Error: {response.status_code} {response.text}")
-        print("Tweeted:", response.json())
+        self.breaker.record_success()
+        logger.info("Tweeted: %s", response.json())
         return response.json()
@@ -1,6 +1,16 @@
-from django.contrib import admin
+import io
+
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.http import HttpResponse
+from django.shortcuts import render
+from .exports import EXPORT_CONTENT_TYPES
+from .forms import ProductImportUploadForm
+from .imports import (UNREADABLE_FILE_ERRORS, RejectWriter, import_format,
+                      import_products, read_rows)
 from .models import User, Store, Product
+from .stock import shard_totals, sync_shards
 
 
 class UserAdmin(BaseUserAdmin):
@@ -71,12 +81,91 @@ class StoreAdmin(admin.ModelAdmin):
     :ivar list_display: Sequence of field names to display in the list view
         of this admin interface.
     :type list_display: tuple
+    :ivar actions: Extra actions on selected stores.
+    :type actions: list
     """
     inlines = [ProductInline]
     list_display = ('name', 'owner', 'created_at')
+    actions = ['import_products_from_file']
+
+    @admin.action(description="Import products from a CSV or JSONL file")
+    def import_products_from_file(self, request, queryset):
+        """
+        Asks for a file and imports it into the selected store with
+        :func:`store.imports.import_products`. Rejected rows come back as
+        a download in the uploaded file's format.
+        """
+        if queryset.count() != 1:
+            self.message_user(request, "Select one store to import into.",
+                              messages.ERROR)
+            return None
+        store = queryset.get()
+        form = ProductImportUploadForm(
+            request.POST if 'apply' in request.POST else None,
+            request.FILES or None)
+        if not form.is_valid():
+            return render(request, 'admin/store/store/import_products.html',
+                          {**self.admin_site.each_context(request),
+                           'title': f"Import products into {store.name}",
+                           'opts': self.model._meta,
+                           'store': store,
+                           'form': form,
+                           'action_checkbox_name':
+                               helpers.ACTION_CHECKBOX_NAME})
+
+        upload = form.cleaned_data['file']
+        fmt = import_format(upload.name)
+        rejects = io.StringIO()
+        try:
+            result = import_products(
+                store,
+                read_rows(io.TextIOWrapper(upload.file, encoding='utf-8-sig',
+                                           newline=''), fmt),
+                rejects=RejectWriter(rejects, fmt))
+        except UNREADABLE_FILE_ERRORS as exc:
+            self.message_user(request, f"Could not read {upload.name} "
+                                       f"({exc}). Products written before "
+                                       f"that point were kept.",
+                              messages.ERROR)
+            return None
+        self.message_user(request, f"Imported {result.imported} products "
+                                   f"into {store.name}.")
+        if not result.rejected:
+            return None
+        response = HttpResponse(rejects.getvalue(),
+                                content_type=EXPORT_CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = (
+            f'attachment; filename="rejects.{fmt}"')
+        return response
+
+
+class ProductAdmin(admin.ModelAdmin):
+    """
+    Administration interface for products.
+
+    The stock of a sharded product is shown as the sum of its shards, and
+    a new level is spread over them (see :mod:`store.stock`).
+
+    :ivar readonly_fields: Fields shown but not editable. The shard count
+        only changes through the ``rebalance_stock_shards`` command, which
+        moves the stock into or out of the shards along with it.
+    :type readonly_fields: tuple
+    """
+    readonly_fields = ('stock_shards',)
+
+    def get_object(self, request, object_id, from_field=None):
+        product = super().get_object(request, object_id, from_field)
+        if product is not None and product.stock_shards:
+            product.stock = shard_totals([product.pk]).get(product.pk, 0)
+        return product
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'stock' in form.changed_data:
+            sync_shards(obj.pk)
 
 
 # Register models with the admin
 admin.site.register(User, UserAdmin)
 admin.site.register(Store, StoreAdmin)
-admin.site.register(Product)
+admin.site.register(Product, ProductAdmin)
@@ -21,4 +21,5 @@ class StoreConfig(AppConfig):
 
     def ready(self):
         from functions.tweet import Tweet
-        Tweet()
\ No newline at end of file
+        from . import signals  # noqa: F401
+        Tweet()
@@ -0,0 +1,34 @@
+from django.db import connections, router
+
+
+def bulk_upsert(model, objs: list, unique_fields: list, update_fields: list,
+                batch_size: int = None) -> list:
+    """
+    Inserts ``objs``, updating ``update_fields`` of the rows that already
+    exist, with ``bulk_create(update_conflicts=True)``.
+
+    MySQL's ``ON DUPLICATE KEY UPDATE`` takes no conflict target and
+    rejects one, while PostgreSQL and SQLite need the unique constraint
+    named, so ``unique_fields`` is only passed where it is supported.
+
+    :param model: The model to write.
+    :param objs: Unsaved instances.
+    :type objs: list
+    :param unique_fields: The fields of the unique constraint rows are
+        matched on.
+    :type unique_fields: list
+    :param update_fields: The fields overwritten on existing rows.
+    :type update_fields: list
+    :param batch_size: Rows per ``INSERT`` statement. Defaults to all.
+    :type batch_size: int
+    :return: ``objs``.
+    :rtype: list
+    """
+    features = connections[router.db_for_write(model)].features
+    if not features.supports_update_conflicts_with_target:
+        unique_fields = None
+    return model.objects.bulk_create(objs,
+                                     batch_size=batch_size,
+                                     update_conflicts=True,
+                                     unique_fields=unique_fields,
+                                     update_fields=update_fields)
@@ -0,0 +1,239 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from functions.tweet import TweetMetrics
+
+
+def get_cache():
+    """Returns the cache used for rendered pages and fragments."""
+    return caches[getattr(settings, 'STORE_CACHE_ALIAS', 'default')]
+
+
+def product_detail_key(product_id: int) -> str:
+    return f'store:product:{product_id}:detail'
+
+
+def get_or_build(key: str, build, ttl: int, stale_ttl: int = None,
+                 lock_timeout: int = 10, wait: float = 2.0):
+    """
+    Returns the cached value of ``key``, building it with ``build()`` when
+    needed, with protection against cache stampedes.
+
+    Each entry carries a soft expiry ``ttl`` seconds after it is built
+    and stays in the cache for ``stale_ttl`` seconds more. Once the soft
+    expiry passes (or :func:`mark_stale` is called), the first caller to
+    win a ``cache.add()`` lock rebuilds the value while every other
+    caller keeps serving the stale copy. On a cold miss, callers that
+    lose the lock wait up to ``wait`` seconds for the winner's value
+    before building it themselves.
+
+    Every entry records the version of its key it was built under, which
+    :func:`mark_stale` increments. A value whose key was marked stale
+    while it was being built may predate the write that marked it, so it
+    is returned to its caller but not cached, and an entry stored under
+    an older version is never served as fresh.
+
+    :param key: The cache key.
+    :type key: str
+    :param build: A zero-argument callable producing the value. If it
+        returns ``None`` nothing is cached.
+    :param ttl: Seconds a freshly built value is served without rebuild.
+    :type ttl: int
+    :param stale_ttl: Seconds a stale value may still be served while it
+        is rebuilt. Defaults to ``ttl``.
+    :type stale_ttl: int
+    :param lock_timeout: Seconds the rebuild lock is held at most.
+    :type lock_timeout: int
+    :param wait: Seconds to wait for another worker on a cold miss.
+    :type wait: float
+    :return: The cached or freshly built value.
+    """
+    cache = get_cache()
+    stale_ttl = ttl if stale_ttl is None else stale_ttl
+    lock_key = key + ':lock'
+    version_key = key + ':version'
+
+    cached = cache.get_many([key, version_key])
+    entry = cached.get(key)
+    version = cached.get(version_key) or _generation(version_key)
+    if (entry is not None and entry.get('version') == version
+            and entry['fresh_until'] > time.time()):
+        return entry['value']
+
+    if not cache.add(lock_key, 1, lock_timeout):
+        if entry is not None:
+            return entry['value']
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry['value']
+        return build()
+
+    try:
+        value = build()
+        if value is not None and cache.get(version_key) == version:
+            cache.set(key,
+                      {'value': value, 'fresh_until': time.time() + ttl,
+                       'version': version},
+                      ttl + stale_ttl)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+def mark_stale(key: str):
+    """
+    Forces the next read of ``key`` to rebuild it, and a rebuild already
+    under way to discard its value (see :func:`get_or_build`).
+
+    The entry is kept so concurrent readers can serve it while a single
+    worker rebuilds it, instead of all of them missing at once.
+    """
+    _bump_generation(key + ':version')
+
+
+def invalidate_product(product_id: int):
+    """Marks the cached detail page fragments of a product stale."""
+    mark_stale(product_detail_key(product_id))
+
+
+CATALOG_VERSION_KEY = 'store:catalog:version'
+CATALOG_HITS_KEY = 'store:catalog:hits'
+CATALOG_MISSES_KEY = 'store:catalog:misses'
+SUGGEST_VERSION_KEY = 'store:suggest:version'
+TWEET_METRICS_PREFIX = 'store:tweet:'
+TWEET_BREAKER_KEY = 'store:tweet:breaker'
+
+
+def _generation(key: str) -> int:
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock rather than 1 so a counter lost to eviction
+        # or a restart never re-uses a generation that still has entries
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_generation(key: str):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        _generation(key)
+
+
+def catalog_version() -> int:
+    """
+    Returns the current catalog generation.
+
+    Listing pages are cached under the generation they were rendered in,
+    so bumping it with :func:`bump_catalog_version` invalidates every
+    cached listing at once without scanning for keys.
+    """
+    return _generation(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Moves the catalog to a new generation."""
+    _bump_generation(CATALOG_VERSION_KEY)
+
+
+def suggest_version() -> int:
+    """
+    Returns the generation of the product names, which moves only when a
+    product is added, renamed or deleted (see :mod:`store.suggest`).
+    """
+    return _generation(SUGGEST_VERSION_KEY)
+
+
+def bump_suggest_version():
+    """Moves the product names to a new generation."""
+    _bump_generation(SUGGEST_VERSION_KEY)
+
+
+def catalog_listing_key(page: str, sort: str, after: list,
+                        page_size: int) -> str:
+    """
+    Returns the cache key of a listing page.
+
+    :param after: The decoded cursor values (see
+        :func:`store.pagination.decode_cursor`), or ``None`` for the first
+        page. They are hashed, so the key stays short and safe for
+        memcached whatever the client sent.
+    :type after: list
+    """
+    position = (hashlib.sha1(repr(after).encode()).hexdigest()
+                if after else '')
+    return (f'store:catalog:{catalog_version()}:{page}:{sort}:'
+            f'{position}:{page_size}')
+
+
+def _count(key: str, delta: int = 1):
+    cache = get_cache()
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, None):
+            cache.incr(key, delta)
+
+
+def record_catalog_lookup(hit: bool):
+    """Counts one listing cache lookup as a hit or a miss."""
+    _count(CATALOG_HITS_KEY if hit else CATALOG_MISSES_KEY)
+
+
+def catalog_cache_stats() -> dict:
+    """
+    Returns the listing cache counters.
+
+    :return: A dict with ``hits``, ``misses`` and ``hit_ratio`` (``None``
+        before the first lookup).
+    :rtype: dict
+    """
+    counts = get_cache().get_many([CATALOG_HITS_KEY, CATALOG_MISSES_KEY])
+    hits = counts.get(CATALOG_HITS_KEY, 0)
+    misses = counts.get(CATALOG_MISSES_KEY, 0)
+    lookups = hits + misses
+    return {'hits': hits, 'misses': misses,
+            'hit_ratio': hits / lookups if lookups else None}
+
+
+def record_tweet_metrics(counts: dict, breaker_state: str):
+    """
+    Adds a worker's Twitter client counts to the shared totals.
+
+    Tweets are posted by the ``drain_tweet_outbox`` worker, so its counts
+    are kept in the cache for the web process to serve.
+
+    :param counts: Counts from :meth:`functions.tweet.TweetMetrics.collect`.
+    :type counts: dict
+    :param breaker_state: The worker's circuit breaker state.
+    :type breaker_state: str
+    """
+    for name, delta in counts.items():
+        if delta:
+            _count(TWEET_METRICS_PREFIX + name, delta)
+    get_cache().set(TWEET_BREAKER_KEY, breaker_state, None)
+
+
+def tweet_metrics() -> tuple:
+    """
+    Returns the shared Twitter client totals.
+
+    :return: The counts by name and the last reported breaker state
+        (``None`` before a worker has reported).
+    :rtype: tuple
+    """
+    cached = get_cache().get_many(
+        [TWEET_BREAKER_KEY]
+        + [TWEET_METRICS_PREFIX + name for name in TweetMetrics.NAMES])
+    counts = {name: cached.get(TWEET_METRICS_PREFIX + name, 0)
+              for name in TweetMetrics.NAMES}
+    return counts, cached.get(TWEET_BREAKER_KEY)
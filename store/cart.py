@@ -0,0 +1,208 @@
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from .bulk import bulk_upsert
+from .models import Cart, CartLine, Product
+
+
+class PricedCart(NamedTuple):
+    """
+    A cart resolved against the product table.
+
+    :ivar lines: One dict per cart line with ``product``, ``quantity`` and
+        ``subtotal`` keys, in the order the cart was filled.
+    :type lines: list
+    :ivar total: The sum of all line subtotals.
+    :type total: Decimal
+    :ivar missing: Product ids in the cart that no longer exist.
+    :type missing: list
+    """
+    lines: list
+    total: Decimal
+    missing: list
+
+
+def normalise_cart(cart: dict) -> dict:
+    """
+    Converts a session cart of ``{'<product id>': quantity}`` into
+    ``{product_id: quantity}`` with integer keys, dropping non-positive
+    quantities.
+
+    :param cart: The cart as stored in ``request.session['cart']``, or as
+        returned by :func:`cart_quantities`.
+    :type cart: dict
+    :return: The cart keyed by integer product id.
+    :rtype: dict
+    """
+    return {int(product_id): int(quantity)
+            for product_id, quantity in cart.items()
+            if int(quantity) > 0}
+
+
+def price_cart(cart: dict, queryset=None) -> PricedCart:
+    """
+    Prices a whole cart with a single ``in_bulk`` query.
+
+    Subtotals and the total are computed with ``Decimal`` arithmetic in
+    one pass. Product ids that no longer resolve are reported in
+    ``missing`` instead of raising, so callers decide whether a stale
+    line is fatal (checkout) or can be dropped quietly (the cart page).
+
+    :param cart: ``{product_id: quantity}``; see :func:`normalise_cart`.
+    :type cart: dict
+    :param queryset: The product queryset to resolve ids against, e.g. a
+        ``select_for_update()`` queryset during checkout. Defaults to all
+        products.
+    :type queryset: QuerySet
+    :return: The priced cart.
+    :rtype: PricedCart
+    """
+    quantities = normalise_cart(cart)
+    if queryset is None:
+        queryset = Product.objects.all()
+    products = queryset.in_bulk(list(quantities)) if quantities else {}
+
+    lines = []
+    missing = []
+    total = Decimal('0.00')
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            missing.append(product_id)
+            continue
+        subtotal = product.price * quantity
+        lines.append({
+            'product': product,
+            'quantity': quantity,
+            'subtotal': subtotal,
+        })
+        total += subtotal
+    return PricedCart(lines, total, missing)
+
+
+def cart_quantities(user) -> dict:
+    """
+    Returns a signed-in buyer's cart as ``{product_id: quantity}``, in
+    the order the lines were added.
+
+    :param user: The buyer.
+    :return: The cart, in the form :func:`price_cart` and
+        :func:`store.checkout.place_order` take.
+    :rtype: dict
+    """
+    return dict(CartLine.objects
+                .filter(cart_id=user.pk)
+                .order_by('id')
+                .values_list('product_id', 'quantity'))
+
+
+def _upsert_lines(lines: list):
+    bulk_upsert(CartLine, lines, ['cart', 'product'],
+                ['quantity', 'updated_at'])
+
+
+def add_line(user, product_id: int, quantity: int = 1):
+    """
+    Adds units of a product to a buyer's cart.
+
+    A product already in the cart costs one ``UPDATE`` of its line. A new
+    one creates the cart row if needed and inserts the line. If a
+    concurrent add (a double click) inserted it first, the insert fails
+    on the unique ``(cart, product)`` constraint and the ``UPDATE`` is
+    retried, so both adds count.
+
+    :param user: The buyer.
+    :param product_id: The product to add.
+    :type product_id: int
+    :param quantity: The number of units to add.
+    :type quantity: int
+    """
+    now = timezone.now()
+    if CartLine.objects.filter(cart_id=user.pk,
+                               product_id=product_id).update(
+            quantity=F('quantity') + quantity, updated_at=now):
+        return
+    Cart.objects.bulk_create([Cart(user_id=user.pk)], ignore_conflicts=True)
+    try:
+        with transaction.atomic():
+            CartLine.objects.create(cart_id=user.pk, product_id=product_id,
+                                    quantity=quantity, updated_at=now)
+    except IntegrityError:
+        CartLine.objects.filter(cart_id=user.pk,
+                                product_id=product_id).update(
+            quantity=F('quantity') + quantity, updated_at=now)
+
+
+def set_line_quantity(user, product_id: int, quantity: int) -> bool:
+    """
+    Changes the quantity of a cart line, removing it if ``quantity`` is
+    not positive. Products not in the cart are left out of it.
+
+    :param user: The buyer.
+    :param product_id: The product whose line changes.
+    :type product_id: int
+    :param quantity: The new number of units.
+    :type quantity: int
+    :return: Whether the product was in the cart.
+    :rtype: bool
+    """
+    if quantity <= 0:
+        return remove_line(user, product_id)
+    return bool(CartLine.objects
+                .filter(cart_id=user.pk, product_id=product_id)
+                .update(quantity=quantity, updated_at=timezone.now()))
+
+
+def remove_line(user, product_id: int) -> bool:
+    """
+    Removes a product from a buyer's cart.
+
+    :return: Whether the product was in the cart.
+    :rtype: bool
+    """
+    deleted, _ = CartLine.objects.filter(cart_id=user.pk,
+                                         product_id=product_id).delete()
+    return bool(deleted)
+
+
+def clear_cart(user):
+    """Empties a buyer's cart, keeping the cart row."""
+    CartLine.objects.filter(cart_id=user.pk).delete()
+
+
+def merge_session_cart(user, cart: dict):
+    """
+    Merges an anonymous session cart into a buyer's cart.
+
+    Quantities of products already in the buyer's cart are added
+    together. One query reads the current quantities (which also drops
+    products deleted since they were added), and a single bulk upsert
+    writes every line.
+
+    :param user: The buyer who has just logged in.
+    :param cart: The cart as stored in ``request.session['cart']``.
+    :type cart: dict
+    """
+    quantities = normalise_cart(cart)
+    if not quantities:
+        return
+    in_cart = (CartLine.objects
+               .filter(cart_id=user.pk, product_id=OuterRef('pk'))
+               .values('quantity'))
+    now = timezone.now()
+    with transaction.atomic():
+        current = (Product.objects
+                   .filter(pk__in=list(quantities))
+                   .values_list('id', Subquery(in_cart)))
+        lines = [CartLine(cart_id=user.pk, product_id=product_id,
+                          quantity=quantities[product_id] + (existing or 0),
+                          updated_at=now)
+                 for product_id, existing in current]
+        if lines:
+            Cart.objects.bulk_create([Cart(user_id=user.pk)],
+                                     ignore_conflicts=True)
+            _upsert_lines(lines)
@@ -0,0 +1,318 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, Sum, When
+from django.utils import timezone
+
+from .cache import invalidate_product
+from .cart import PricedCart, normalise_cart, price_cart
+from .models import Order, OrderItem, Product, StockReservation
+from .rollups import record_daily_sales, record_vendor_summaries
+from .stock import shard_totals, take_from_shards
+
+
+class CheckoutError(Exception):
+    """
+    Raised when a cart cannot be turned into an order.
+
+    The message is safe to show to the buyer. Raising it inside
+    :func:`place_order` rolls back the surrounding transaction, so no
+    order, order item or stock change is left behind.
+    """
+
+
+class InsufficientStock(CheckoutError):
+    """
+    Raised when a cart line asks for more units than are in stock.
+
+    :ivar product: The product that could not be fulfilled.
+    :type product: Product
+    :ivar available: The stock level seen when the row was locked.
+    :type available: int
+    """
+    def __init__(self, product: Product, available: int):
+        self.product = product
+        self.available = available
+        super().__init__(f"Not enough stock for {product.name}. "
+                         f"Only {available} left.")
+
+
+def _lock_cart(cart: dict, lock_shards: bool = False):
+    """
+    Loads, row-locks and prices the cart products with one
+    ``SELECT ... FOR UPDATE``. Must run inside a transaction.
+
+    Sharded products (see :mod:`store.stock`) are not locked, since that
+    would queue every buyer on their row again. They are loaded with a
+    second plain query, only when the cart has any, and their ``stock``
+    is set to the sum of their shards, whose rows are locked as well if
+    ``lock_shards`` is set.
+    """
+    fields = ('id', 'store_id', 'name', 'price', 'stock', 'stock_shards')
+    priced = price_cart(cart,
+                        Product.objects
+                        .select_for_update()
+                        .filter(stock_shards=0)
+                        .only(*fields))
+    if priced.missing:
+        quantities = normalise_cart(cart)
+        sharded = price_cart(
+            {pk: quantities[pk] for pk in priced.missing},
+            Product.objects.filter(stock_shards__gt=0).only(*fields))
+        totals = shard_totals([line['product'].id for line in sharded.lines],
+                              lock=lock_shards)
+        for line in sharded.lines:
+            line['product'].stock = totals.get(line['product'].id, 0)
+        priced = PricedCart(priced.lines + sharded.lines,
+                            priced.total + sharded.total,
+                            sharded.missing)
+    if priced.missing:
+        raise CheckoutError(
+            "A product in your cart is no longer available.")
+    if not priced.lines:
+        raise CheckoutError("Cart is empty.")
+    return priced
+
+
+def reservation_ttl() -> timedelta:
+    """How long a checkout reservation holds stock."""
+    return timedelta(seconds=getattr(settings, 'STOCK_RESERVATION_TTL', 600))
+
+
+def held_quantities(product_ids, exclude_user=None, now=None) -> dict:
+    """
+    Sums the live reservations of some products with one grouped query
+    over the ``reservation_live_idx`` index.
+
+    :param product_ids: The products to look at.
+    :param exclude_user: A buyer whose own reservations are not counted.
+    :type exclude_user: User
+    :param now: The time reservations are live at. Defaults to now.
+    :return: ``{product_id: units held}`` for products with live holds.
+    :rtype: dict
+    """
+    reservations = StockReservation.objects.filter(
+        product_id__in=product_ids,
+        expires_at__gt=now or timezone.now())
+    if exclude_user is not None:
+        reservations = reservations.exclude(user=exclude_user)
+    return dict(reservations.order_by()
+                .values('product_id')
+                .annotate(held=Sum('quantity'))
+                .values_list('product_id', 'held'))
+
+
+def available_stock(product_ids) -> dict:
+    """
+    Returns stock minus live reservations for each product, reading the
+    shards of sharded products.
+
+    :param product_ids: The products to look at.
+    :return: ``{product_id: units available}``.
+    :rtype: dict
+    """
+    held = held_quantities(product_ids)
+    stocks = {pk: (stock, shards) for pk, stock, shards in
+              Product.objects.filter(pk__in=product_ids)
+              .values_list('pk', 'stock', 'stock_shards')}
+    totals = shard_totals([pk for pk, (_, shards) in stocks.items()
+                           if shards])
+    return {pk: max(totals.get(pk, 0) - held.get(pk, 0) if shards
+                    else stock - held.get(pk, 0), 0)
+            for pk, (stock, shards) in stocks.items()}
+
+
+def check_available(lines: list, held: dict):
+    """
+    Raises :class:`InsufficientStock` for the first priced
+    cart line that asks for more than its product's stock minus ``held``.
+    """
+    for line in lines:
+        product = line['product']
+        available = product.stock - held.get(product.id, 0)
+        if available < line['quantity']:
+            raise InsufficientStock(product, max(available, 0))
+
+
+def reserve_cart(user, cart: dict, ttl: timedelta = None) -> list:
+    """
+    Holds the stock of a cart for ``user`` while they complete checkout.
+
+    The cart products are row-locked only for the length of this short
+    transaction: the buyer's previous holds on them are replaced, the
+    other buyers' live holds are summed with one aggregate, and the new
+    reservations are written with one ``bulk_create``. Concurrent buyers
+    of the same product queue on its row lock for a few statements
+    rather than for a whole checkout. The shards of sharded products are
+    locked the same way, so their total cannot drop between the check
+    and the hold; :func:`place_order` respects holds on them in turn.
+
+    :param user: The buyer.
+    :type user: User
+    :param cart: ``{product_id: quantity}``, as returned by
+        :func:`store.cart.cart_quantities`.
+    :type cart: dict
+    :param ttl: How long to hold the stock. Defaults to the
+        ``STOCK_RESERVATION_TTL`` setting.
+    :type ttl: timedelta
+    :return: The new reservations.
+    :rtype: list
+    :raises CheckoutError: If the cart is empty or references a product
+        that no longer exists.
+    :raises InsufficientStock: If a line exceeds the available stock.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        priced = _lock_cart(cart, lock_shards=True)
+        product_ids = [line['product'].id for line in priced.lines]
+        release_reservations(user, product_ids)
+        check_available(priced.lines,
+                        held_quantities(product_ids, now=now))
+        expires_at = now + (ttl or reservation_ttl())
+        return StockReservation.objects.bulk_create([
+            StockReservation(product=line['product'],
+                             user=user,
+                             quantity=line['quantity'],
+                             expires_at=expires_at)
+            for line in priced.lines
+        ])
+
+
+def release_reservations(user, product_ids=None) -> int:
+    """
+    Drops a buyer's reservations, on all products or only some.
+
+    :return: The number of reservations deleted.
+    :rtype: int
+    """
+    reservations = StockReservation.objects.filter(user=user)
+    if product_ids is not None:
+        reservations = reservations.filter(product_id__in=product_ids)
+    return reservations.delete()[0]
+
+
+def expire_reservations(batch_size: int = 1000, now=None) -> int:
+    """
+    Deletes lapsed reservations in primary key batches, so the sweep never
+    holds locks on a large range of the table at once.
+
+    :param batch_size: Rows to delete per statement.
+    :type batch_size: int
+    :param now: Reservations that expired by this time are deleted.
+        Defaults to now.
+    :return: The number of reservations deleted.
+    :rtype: int
+    """
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        ids = list(StockReservation.objects
+                   .filter(expires_at__lte=now)
+                   .order_by('expires_at')
+                   .values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += StockReservation.objects.filter(pk__in=ids).delete()[0]
+
+
+def place_order(user, cart: dict) -> Order:
+    """
+    Turns a cart into an order in a constant number of queries.
+
+    All cart products are loaded, row-locked and priced with a single
+    ``SELECT ... FOR UPDATE`` through :func:`store.cart.price_cart`,
+    stock net of other buyers' live reservations is validated in memory,
+    the order lines and the per-store summaries of
+    :func:`store.rollups.record_vendor_summaries` are written with one
+    ``bulk_create`` each, the daily sales rollup is incremented (see
+    :func:`store.rollups.record_daily_sales`), stock is
+    decremented with one conditional ``UPDATE`` and the buyer's own
+    reservations (see :func:`reserve_cart`) are deleted. Everything runs
+    inside one atomic block, so concurrent buyers of the same product are
+    serialised on the row lock instead of overselling.
+
+    Sharded products are bought without locking all their shards, unless
+    other buyers hold reservations on them: then the shards are locked
+    and the holds re-read, as in :func:`reserve_cart`, so the order cannot
+    take held units. A hold that appears while an order takes from the
+    shards unlocked fails the order with a retryable
+    :class:`CheckoutError`. This relies on each statement seeing the
+    latest commits, as under the READ COMMITTED isolation Django uses on
+    MySQL.
+
+    :param user: The buyer placing the order.
+    :type user: User
+    :param cart: ``{product_id: quantity}``, as returned by
+        :func:`store.cart.cart_quantities`.
+    :type cart: dict
+    :return: The newly created order.
+    :rtype: Order
+    :raises CheckoutError: If the cart is empty or references a product
+        that no longer exists.
+    :raises InsufficientStock: If any line exceeds the available stock.
+    """
+    with transaction.atomic():
+        priced = _lock_cart(cart)
+        product_ids = [line['product'].id for line in priced.lines]
+        # The buyer's own reservations are what they are about to buy
+        held = held_quantities(product_ids, exclude_user=user)
+        check_available(priced.lines, held)
+        sharded = [line for line in priced.lines
+                   if line['product'].stock_shards]
+        contested = [line for line in sharded if line['product'].id in held]
+        contested_ids = [line['product'].id for line in contested]
+        if contested:
+            totals = shard_totals(contested_ids, lock=True)
+            for line in contested:
+                line['product'].stock = totals.get(line['product'].id, 0)
+            check_available(contested, held_quantities(contested_ids,
+                                                       exclude_user=user))
+
+        order = Order.objects.create(user=user,
+                                     total=priced.total,
+                                     status=Order.PLACED)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order,
+                      product=line['product'],
+                      quantity=line['quantity'],
+                      price=line['product'].price)
+            for line in priced.lines
+        ])
+        record_daily_sales(
+            record_vendor_summaries(order, user, priced.lines))
+
+        # The stock guard in the WHERE clause makes the decrement safe even
+        # on backends where SELECT ... FOR UPDATE is a no-op (SQLite).
+        single = [line for line in priced.lines
+                  if not line['product'].stock_shards]
+        guard = Q()
+        for line in single:
+            guard |= Q(pk=line['product'].id, stock__gte=line['quantity'])
+        updated = Product.objects.filter(guard).update(stock=Case(
+            *[When(pk=line['product'].id, then=F('stock') - line['quantity'])
+              for line in single],
+            default=F('stock'),
+            output_field=PositiveIntegerField(),
+        )) if single else 0
+        if updated != len(single) or not all(
+                take_from_shards(line['product'], line['quantity'])
+                for line in sharded):
+            raise CheckoutError(
+                "Stock changed while placing your order. Please try again.")
+        # A reservation committed since the holds were read may have
+        # counted the units just taken from unlocked shards; later ones
+        # wait for this commit on the shard rows
+        unlocked_ids = [line['product'].id for line in sharded
+                        if line['product'].id not in contested_ids]
+        if unlocked_ids and held_quantities(unlocked_ids,
+                                            exclude_user=user):
+            raise CheckoutError(
+                "Stock changed while placing your order. Please try again.")
+
+        release_reservations(user, product_ids)
+
+        # Stock is shown on the cached product pages
+        transaction.on_commit(
+            lambda: [invalidate_product(pk) for pk in product_ids])
+    return order
@@ -0,0 +1,125 @@
+import csv
+from itertools import chain
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import OrderItem, Product
+from .stock import current_stock
+
+# Rows fetched per query and written per response chunk
+EXPORT_CHUNK_SIZE = 2000
+
+# (column name, lookup) pairs. The first lookup must be the primary key,
+# which the export pages through. ``current_stock`` is annotated by
+# store_products_export.
+PRODUCT_EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('name', 'name'),
+    ('description', 'description'),
+    ('price', 'price'),
+    ('stock', 'current_stock'),
+    ('rating_count', 'rating_count'),
+    ('rating_sum', 'rating_sum'),
+)
+ORDER_EXPORT_COLUMNS = (
+    ('item_id', 'id'),
+    ('order_id', 'order_id'),
+    ('ordered_at', 'order__created_at'),
+    ('status', 'order__status'),
+    ('buyer', 'order__user__username'),
+    ('product_id', 'product_id'),
+    ('product', 'product__name'),
+    ('quantity', 'quantity'),
+    ('price', 'price'),
+)
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def export_rows(queryset, columns, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Yields the rows of ``queryset`` as tuples, one primary-key range at a
+    time.
+
+    Rows come from ``values_list()``, so no model instances are built,
+    and only ``chunk_size`` of them are held at once. The pages are
+    keyset queries on the primary key rather than one
+    ``.iterator(chunk_size=...)`` cursor, because the MySQL driver reads a
+    whole result set into memory before returning the first row.
+
+    :param queryset: The rows to export.
+    :param columns: ``(name, lookup)`` pairs; the first lookup is the
+        primary key.
+    :type columns: tuple
+    :param chunk_size: Rows per query.
+    :type chunk_size: int
+    """
+    lookups = [lookup for _, lookup in columns]
+    queryset = queryset.order_by('pk').values_list(*lookups)
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(page[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1][0]
+
+
+class _Echo:
+    """A file-like object that hands back what ``csv.writer`` writes."""
+    def write(self, value):
+        return value
+
+
+def _chunked(lines, chunk_size: int):
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def render_export(rows, columns, fmt: str,
+                  chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Renders rows as CSV (with a header line) or as JSON lines.
+
+    :param rows: Value tuples in ``columns`` order.
+    :param columns: ``(name, lookup)`` pairs.
+    :type columns: tuple
+    :param fmt: ``'csv'`` or ``'jsonl'``.
+    :type fmt: str
+    :param chunk_size: Lines joined into each yielded string, so the
+        server is not handed one tiny write per row.
+    :type chunk_size: int
+    :return: A generator of text chunks for a streaming response.
+    """
+    names = [name for name, _ in columns]
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        lines = (writer.writerow(row) for row in rows)
+        return _chunked(chain([writer.writerow(names)], lines), chunk_size)
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    return _chunked((encoder.encode(dict(zip(names, row))) + '\n'
+                     for row in rows), chunk_size)
+
+
+def store_products_export(store_id: int, fmt: str):
+    """Returns the chunks of a store's product catalog export."""
+    rows = export_rows(Product.objects.filter(store_id=store_id)
+                       .annotate(current_stock=current_stock()),
+                       PRODUCT_EXPORT_COLUMNS)
+    return render_export(rows, PRODUCT_EXPORT_COLUMNS, fmt)
+
+
+def store_orders_export(store_id: int, fmt: str):
+    """Returns the chunks of the export of a store's order items."""
+    rows = export_rows(OrderItem.objects.filter(product__store_id=store_id),
+                       ORDER_EXPORT_COLUMNS)
+    return render_export(rows, ORDER_EXPORT_COLUMNS, fmt)
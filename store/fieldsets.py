@@ -0,0 +1,70 @@
+from rest_framework import serializers
+
+from .prefetch import nested_serializer
+
+
+def _split(value: str):
+    """Parses a comma separated query parameter into a set, or ``None``."""
+    if value is None:
+        return None
+    return {part.strip() for part in value.split(',') if part.strip()}
+
+
+def prune_fields(serializer, fields=None, expand=None, prefix: str = ''):
+    """
+    Removes the fields a client did not ask for from a serializer tree.
+
+    ``fields`` lists the fields to keep, using dotted paths for nested
+    ones (``products.name``). A level that no entry addresses keeps all
+    of its plain fields. ``expand`` lists the nested relations to render
+    (``products``, ``products.reviews``). When it is given, every other
+    nested relation is dropped. Without it, nested relations are kept
+    unless ``fields`` restricts their level.
+
+    :param serializer: The serializer to prune in place. A list
+        serializer is pruned through its child.
+    :param fields: The requested field paths, or ``None`` for all.
+    :type fields: set
+    :param expand: The requested nested relation paths, or ``None``.
+    :type expand: set
+    :param prefix: The dotted path of ``serializer`` from the root.
+    :type prefix: str
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    names = {path[len(prefix):] for path in fields or ()
+             if path.startswith(prefix) and '.' not in path[len(prefix):]}
+    for name, field in list(serializer.fields.items()):
+        path = prefix + name
+        child = nested_serializer(field)
+        if child is None:
+            keep = not names or name in names
+        elif expand is not None:
+            keep = name in names or any(
+                e == path or e.startswith(path + '.') for e in expand)
+        else:
+            keep = not names or name in names
+        if not keep:
+            del serializer.fields[name]
+        elif child is not None:
+            prune_fields(child, fields, expand, path + '.')
+
+
+class SparseFieldsetMixin:
+    """
+    Viewset mixin that trims the serializer to the ``?fields=`` and
+    ``?expand=`` query parameters.
+
+    Combined with :class:`store.prefetch.PrefetchPlanMixin`, trimmed fields
+    and relations are also left out of the SQL, so a client asking for
+    ``?fields=id,name,price`` never loads descriptions or review trees.
+    """
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        request = getattr(self, 'request', None)
+        if request is not None and request.method == 'GET':
+            fields = _split(request.query_params.get('fields'))
+            expand = _split(request.query_params.get('expand'))
+            if fields is not None or expand is not None:
+                prune_fields(serializer, fields, expand)
+        return serializer
@@ -0,0 +1,192 @@
+from decimal import Decimal, InvalidOperation
+from typing import NamedTuple
+
+from django.db.models import (BooleanField, Case, Count, Exists, F, OuterRef,
+                              Q, Value, When)
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import StockShard
+
+# Upper bounds of the price facet buckets; the last bucket is open-ended
+PRICE_BUCKETS = (Decimal('10'), Decimal('25'), Decimal('50'),
+                 Decimal('100'), Decimal('250'))
+
+
+class ProductFilters(NamedTuple):
+    """
+    The product filters requested through the query string.
+
+    :ivar stores: Store ids to include (``?store=1,2``), or ``None``.
+    :ivar min_price: Lowest price to include (``?min_price=``).
+    :ivar max_price: Highest price to include (``?max_price=``).
+    :ivar in_stock: ``True`` for products with stock, ``False`` for sold
+        out ones (``?in_stock=``), or ``None`` for both.
+    :ivar min_rating: Lowest average rating to include (``?min_rating=``).
+    """
+    stores: frozenset = None
+    min_price: Decimal = None
+    max_price: Decimal = None
+    in_stock: bool = None
+    min_rating: Decimal = None
+
+
+def _decimal(params, name: str):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValidationError({name: "Must be a number."})
+    if not number.is_finite() or number < 0:
+        raise ValidationError({name: "Must be a non-negative number."})
+    return number
+
+
+def parse_product_filters(params) -> ProductFilters:
+    """
+    Reads :class:`ProductFilters` from query parameters.
+
+    :param params: The request's query parameters.
+    :return: The parsed filters.
+    :rtype: ProductFilters
+    :raises ValidationError: If a parameter is malformed.
+    """
+    stores = None
+    if params.get('store'):
+        try:
+            stores = frozenset(int(part) for part in
+                               params['store'].split(',') if part.strip())
+        except ValueError:
+            raise ValidationError({'store': "Must be comma separated ids."})
+
+    in_stock = None
+    if params.get('in_stock'):
+        value = params['in_stock'].lower()
+        if value not in ('true', 'false', '1', '0'):
+            raise ValidationError({'in_stock': "Must be true or false."})
+        in_stock = value in ('true', '1')
+
+    min_rating = _decimal(params, 'min_rating')
+    if min_rating is not None and min_rating > 5:
+        raise ValidationError({'min_rating': "Must be between 0 and 5."})
+
+    return ProductFilters(stores=stores,
+                          min_price=_decimal(params, 'min_price'),
+                          max_price=_decimal(params, 'max_price'),
+                          in_stock=in_stock,
+                          min_rating=min_rating)
+
+
+def _price_q(filters: ProductFilters) -> Q:
+    q = Q()
+    if filters.min_price is not None:
+        q &= Q(price__gte=filters.min_price)
+    if filters.max_price is not None:
+        q &= Q(price__lte=filters.max_price)
+    return q
+
+
+def filter_products(queryset, filters: ProductFilters, store: bool = True,
+                    price: bool = True):
+    """
+    Applies product filters to a queryset.
+
+    :param queryset: A :class:`store.models.Product` queryset.
+    :param filters: The filters to apply.
+    :type filters: ProductFilters
+    :param store: Whether to apply the store filter.
+    :type store: bool
+    :param price: Whether to apply the price range filter.
+    :type price: bool
+    :return: The filtered queryset.
+    """
+    if store and filters.stores is not None:
+        queryset = queryset.filter(store_id__in=filters.stores)
+    if price:
+        queryset = queryset.filter(_price_q(filters))
+    if filters.in_stock is not None:
+        # Product.stock of a sharded product is only the total as of its
+        # last rebalance, so its shards are asked instead
+        in_stock = (Q(stock_shards=0, stock__gt=0)
+                    | Q(Exists(StockShard.objects.filter(
+                        product=OuterRef('pk'), quantity__gt=0)),
+                        stock_shards__gt=0))
+        queryset = queryset.filter(in_stock) if filters.in_stock \
+            else queryset.exclude(in_stock)
+    if filters.min_rating:
+        # avg >= x  <=>  sum * 100 >= count * x * 100, kept in integers
+        # so the comparison runs on the stored aggregates without division
+        queryset = (queryset
+                    .alias(scaled_rating_sum=F('rating_sum') * 100)
+                    .filter(rating_count__gt=0,
+                            scaled_rating_sum__gte=F('rating_count')
+                            * int(filters.min_rating * 100)))
+    return queryset
+
+
+def price_bucket_label(index: int) -> str:
+    low = PRICE_BUCKETS[index - 1] if index else 0
+    if index == len(PRICE_BUCKETS):
+        return f'{low}+'
+    return f'{low}-{PRICE_BUCKETS[index]}'
+
+
+def product_facets(queryset, filters: ProductFilters) -> dict:
+    """
+    Counts products per store and per price bucket with one grouped query.
+
+    Each facet ignores its own filter, so the store counts show how many
+    products every store has in the selected price range and the price
+    counts show every bucket for the selected stores, letting a client
+    widen a selection as well as narrow it. The query groups by store,
+    price bucket and whether the price is in the requested range; the
+    two facets are summed from those groups.
+
+    :param queryset: A :class:`store.models.Product` queryset.
+    :param filters: The requested filters.
+    :type filters: ProductFilters
+    :return: ``{"store": [{"id", "name", "count"}, ...],
+        "price": [{"bucket", "count"}, ...]}``.
+    :rtype: dict
+    """
+    price_q = _price_q(filters)
+    rows = (filter_products(queryset, filters, store=False, price=False)
+            .order_by()
+            .annotate(
+                bucket=Case(*(When(price__lt=bound, then=Value(i))
+                              for i, bound in enumerate(PRICE_BUCKETS)),
+                            default=Value(len(PRICE_BUCKETS))),
+                in_range=Case(When(price_q, then=Value(True)),
+                              default=Value(False),
+                              output_field=BooleanField())
+                if price_q else Value(True, output_field=BooleanField()))
+            .values('store_id', 'store__name', 'bucket', 'in_range')
+            .annotate(count=Count('id')))
+
+    stores, buckets = {}, [0] * (len(PRICE_BUCKETS) + 1)
+    for row in rows:
+        if row['in_range']:
+            store = stores.setdefault(row['store_id'],
+                                      {'id': row['store_id'],
+                                       'name': row['store__name'],
+                                       'count': 0})
+            store['count'] += row['count']
+        if filters.stores is None or row['store_id'] in filters.stores:
+            buckets[row['bucket']] += row['count']
+    return {
+        'store': sorted(stores.values(), key=lambda s: (-s['count'], s['id'])),
+        'price': [{'bucket': price_bucket_label(i), 'count': count}
+                  for i, count in enumerate(buckets)],
+    }
+
+
+class ProductFilterBackend(BaseFilterBackend):
+    """
+    Filters the product API by ``store``, ``min_price``, ``max_price``,
+    ``in_stock`` and ``min_rating``.
+    """
+    def filter_queryset(self, request, queryset, view):
+        return filter_products(queryset,
+                               parse_product_filters(request.query_params))
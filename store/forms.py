@@ -61,6 +61,18 @@ class ProductForm(forms.ModelForm):
         fields = ['name', 'price', 'stock']
 
 
+class ProductImportForm(ProductForm):
+    """
+    Validates one row of a bulk product import (see :mod:`store.imports`)
+    with the same rules as :class:`ProductForm`, plus the vendor SKU the
+    row is matched on and an optional description.
+    """
+    sku = forms.CharField(max_length=64)
+
+    class Meta(ProductForm.Meta):
+        fields = ProductForm.Meta.fields + ['sku', 'description']
+
+
 class StoreForm(forms.ModelForm):
     """
     Represents a form for handling Store model data using Django's
@@ -80,3 +92,13 @@ class StoreForm(forms.ModelForm):
     class Meta:
         model = Store
         fields = ['name']
+
+
+class ProductImportUploadForm(forms.Form):
+    """
+    The file upload of the admin's product import action.
+
+    :ivar file: A CSV or JSON lines file of products.
+    :type file: FileField
+    """
+    file = forms.FileField()
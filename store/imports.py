@@ -0,0 +1,209 @@
+import csv
+import json
+from functools import partial
+from typing import NamedTuple
+
+from django.db import transaction
+
+from .bulk import bulk_upsert
+from .cache import (bump_catalog_version, bump_suggest_version,
+                    invalidate_product)
+from .forms import ProductImportForm
+from .models import Product
+from .search import loaded_index
+from .stock import respread
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+IMPORT_CHUNK_SIZE = 1000
+# The columns an import row may set, and those overwritten on products
+# that already exist. A row without a description clears it.
+IMPORT_FIELDS = ('sku', 'name', 'description', 'price', 'stock')
+IMPORT_UPDATE_FIELDS = ['name', 'description', 'price', 'stock']
+# Raised while reading a file that is not UTF-8 text or not well-formed
+# CSV. The chunks written before them are kept.
+UNREADABLE_FILE_ERRORS = (UnicodeDecodeError, csv.Error)
+
+
+class ImportResult(NamedTuple):
+    """
+    The outcome of a product import.
+
+    :ivar imported: Rows written, whether they created or updated a
+        product.
+    :type imported: int
+    :ivar rejected: Rows that could not be parsed or failed validation.
+    :type rejected: int
+    """
+    imported: int
+    rejected: int
+
+
+def import_format(path: str) -> str:
+    """Returns ``'jsonl'`` for ``.jsonl``/``.ndjson`` files, else ``'csv'``."""
+    return 'jsonl' if path.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_rows(fh, fmt: str):
+    """
+    Reads import rows from a text file one at a time.
+
+    :param fh: The open file.
+    :param fmt: ``'csv'`` (with a header line) or ``'jsonl'`` (one JSON
+        object per line).
+    :type fmt: str
+    :return: A generator of ``(line number, row dict, parse error)``;
+        the error is ``None`` for well-formed rows.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(fh)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    for line, text in enumerate(fh, 1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError:
+            yield line, {'raw': text.rstrip('\n')}, "Invalid JSON."
+            continue
+        if not isinstance(row, dict):
+            yield line, {'raw': text.rstrip('\n')}, "Expected an object."
+            continue
+        yield line, row, None
+
+
+class RejectWriter:
+    """
+    Writes rejected import rows to a side file in the import's format,
+    with their line number and the reasons they were rejected.
+
+    :ivar count: The number of rows written so far.
+    :type count: int
+    """
+    def __init__(self, fh, fmt: str):
+        self.fh = fh
+        self.fmt = fmt
+        self.count = 0
+        self._writer = None
+
+    def write(self, line: int, row: dict, errors: str):
+        self.count += 1
+        if self.fmt == 'jsonl':
+            self.fh.write(json.dumps({'line': line, 'errors': errors,
+                                      'row': row}, default=str) + '\n')
+            return
+        if self._writer is None:
+            self._writer = csv.writer(self.fh)
+            self._writer.writerow(['line', 'errors', *IMPORT_FIELDS])
+        self._writer.writerow([line, errors,
+                               *(row.get(field, '') for field in
+                                 IMPORT_FIELDS)])
+
+
+def _describe(errors) -> str:
+    return '; '.join(f'{field}: {message}'
+                     for field, messages in errors.items()
+                     for message in messages)
+
+
+def upsert_products(products: list) -> dict:
+    """
+    Creates or updates products matched on ``(store, sku)`` with one
+    upsert statement, overwriting ``IMPORT_UPDATE_FIELDS`` of those that
+    exist. Product signals do not fire: sharded stock is split anew (see
+    :func:`store.stock.respread`), and once the transaction commits cached
+    detail pages are invalidated and the products are added to this
+    process's search index, if it is loaded, as
+    :func:`store.signals.index_product` would. The catalog and suggestion
+    generations are left to the caller, which usually writes several
+    batches.
+
+    Must run inside a transaction.
+
+    :param products: Unsaved products with ``store`` and a unique ``sku``
+        set.
+    :type products: list
+    :return: ``{(store_id, sku): product id}`` for every product written.
+    :rtype: dict
+    """
+    bulk_upsert(Product, products, ['store', 'sku'], IMPORT_UPDATE_FIELDS)
+    keys = {(product.store_id, product.sku) for product in products}
+    written = [product for product in
+               Product.objects
+               .filter(store_id__in={store_id for store_id, _ in keys},
+                       sku__in={sku for _, sku in keys})
+               .only('id', 'store_id', 'sku', 'stock', 'stock_shards')
+               if (product.store_id, product.sku) in keys]
+    respread(written)
+    for product in written:
+        transaction.on_commit(partial(invalidate_product, product.pk))
+    ids = {(product.store_id, product.sku): product.pk
+           for product in written}
+    index = loaded_index()
+    if index is not None:
+        documents = [(ids[product.store_id, product.sku], product.name,
+                      product.description) for product in products]
+        transaction.on_commit(
+            lambda: [index.add(*document) for document in documents])
+    return ids
+
+
+def _write_chunk(products: list) -> int:
+    with transaction.atomic():
+        upsert_products(products)
+    return len(products)
+
+
+def import_products(store, rows, chunk_size: int = IMPORT_CHUNK_SIZE,
+                    rejects: RejectWriter = None) -> ImportResult:
+    """
+    Creates or updates a store's products from import rows.
+
+    Every row is validated by :class:`store.forms.ProductImportForm`, the
+    rules of the product form plus a required SKU. Valid rows are
+    written ``chunk_size`` at a time with one upsert statement each,
+    matched on ``(store, sku)``, and each chunk commits on its own, so a
+    failed import keeps the chunks before it. No product signals fire and
+    no tweets are queued; the catalog cache and the type-ahead names move
+    to a new generation at the end and the search index picks the
+    products up on its next ``build_search_index`` run.
+
+    :param store: The store the products belong to.
+    :type store: Store
+    :param rows: ``(line number, row dict, parse error)`` tuples, as
+        produced by :func:`read_rows`.
+    :param chunk_size: Rows per upsert.
+    :type chunk_size: int
+    :param rejects: Where to record rejected rows, if anywhere.
+    :type rejects: RejectWriter
+    :return: How many rows were imported and rejected.
+    :rtype: ImportResult
+    """
+    imported = rejected = 0
+    chunk = {}
+    for line, row, error in rows:
+        if error is None:
+            form = ProductImportForm({field: row[field]
+                                      for field in IMPORT_FIELDS
+                                      if row.get(field) is not None})
+            if form.is_valid():
+                product = form.save(commit=False)
+                product.store = store
+                # A SKU repeated within a chunk keeps its last row, since
+                # one upsert statement cannot write the same row twice
+                chunk[product.sku] = product
+                if len(chunk) >= chunk_size:
+                    imported += _write_chunk(list(chunk.values()))
+                    chunk = {}
+                continue
+            error = _describe(form.errors)
+        rejected += 1
+        if rejects is not None:
+            rejects.write(line, row, error)
+    if chunk:
+        imported += _write_chunk(list(chunk.values()))
+    if imported:
+        bump_catalog_version()
+        bump_suggest_version()
+    return ImportResult(imported, rejected)
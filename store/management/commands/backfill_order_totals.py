@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+
+from store.models import Order, OrderItem
+
+
+class Command(BaseCommand):
+    """
+    Fills in ``Order.total`` for orders placed before totals were stored.
+
+    Orders are walked in primary-key batches. Each batch costs one query
+    for its ids, one grouped aggregate over its order items and one
+    ``bulk_update``, no matter how many items each order has.
+    """
+    help = "Backfill denormalized order totals from their order items."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Orders to total per aggregate query.")
+        parser.add_argument('--all', action='store_true',
+                            help="Recompute every order, not only those "
+                                 "without a total.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        orders = Order.objects.order_by('pk')
+        if not options['all']:
+            orders = orders.filter(total__isnull=True)
+
+        line_total = ExpressionWrapper(
+            F('price') * F('quantity'),
+            output_field=DecimalField(max_digits=12, decimal_places=2))
+        last_pk = 0
+        updated = 0
+        while True:
+            batch = list(orders.filter(pk__gt=last_pk)
+                         .values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                break
+            totals = dict(OrderItem.objects
+                          .filter(order_id__in=batch)
+                          .values('order_id')
+                          .annotate(total=Sum(line_total))
+                          .values_list('order_id', 'total'))
+            with transaction.atomic():
+                Order.objects.bulk_update(
+                    [Order(pk=pk, total=totals.get(pk) or 0)
+                     for pk in batch],
+                    ['total'], batch_size=batch_size)
+            updated += len(batch)
+            last_pk = batch[-1]
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfilled totals for {updated} orders."))
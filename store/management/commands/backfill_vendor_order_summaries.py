@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store.models import Order, VendorOrderSummary
+from store.rollups import summarise_orders
+
+
+class Command(BaseCommand):
+    """
+    Writes ``VendorOrderSummary`` rows for orders placed before the table
+    existed.
+
+    Orders are walked in primary-key batches. Each batch costs one query
+    for its ids, one grouped aggregate over its order items and one
+    ``bulk_create``. Summaries that already exist are left alone, so the
+    command can be re-run safely.
+    """
+    help = "Backfill the vendor order summaries from order items."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Orders to summarise per aggregate query.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        orders = Order.objects.order_by('pk')
+        last_pk = 0
+        summarised = 0
+        while True:
+            batch = list(orders.filter(pk__gt=last_pk)
+                         .values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                VendorOrderSummary.objects.bulk_create(
+                    summarise_orders(batch), ignore_conflicts=True)
+            summarised += len(batch)
+            last_pk = batch[-1]
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfilled vendor summaries for {summarised} orders."))
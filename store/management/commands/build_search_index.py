@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from store.search import build_index, index_path
+
+
+class Command(BaseCommand):
+    """
+    Builds the product search index and writes it to ``SEARCH_INDEX_PATH``.
+
+    Products are streamed from the database in chunks, so the build does
+    not hold the whole table in memory twice. Running web processes load
+    the new file on their next search. Re-run it after bulk imports, or
+    periodically when several processes serve the site, since each
+    process only applies the product changes it makes itself.
+    """
+    help = "Build the full-text product search index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help="Products to fetch per database round trip.")
+        parser.add_argument('--output', default=None,
+                            help="Where to write the index. Defaults to "
+                                 "SEARCH_INDEX_PATH.")
+
+    def handle(self, *args, **options):
+        index = build_index(chunk_size=options['chunk_size'])
+        path = options['output'] or index_path()
+        index.save(path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {len(index)} products ({len(index.terms)} terms) "
+            f"into {path}."))
@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from functions.tweet import CircuitOpenError, Tweet
+from store.cache import record_tweet_metrics
+from store.models import TweetOutbox, TwitterCredential
+from store.outbox import OutboxCommandMixin
+
+
+class Command(OutboxCommandMixin, BaseCommand):
+    """
+    Posts queued tweets from the ``TweetOutbox`` table.
+
+    Due rows are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED`` so
+    several workers can run side by side, then posted by a bounded thread
+    pool. Failures are rescheduled with exponential backoff until
+    ``--max-attempts`` is reached, after which the row is marked failed.
+    Rows turned away by the open circuit breaker of :class:`Tweet` were
+    never sent, so they are rescheduled without using up an attempt.
+    After every poll the client's counters are added to the totals served
+    by the ``twitter_metrics`` view.
+
+    Rows reference the vendor's :class:`TwitterCredential` rather than
+    carrying a token, and the reference is cleared once a row is sent or
+    failed for good.
+    """
+    help = "Post queued store and product announcements to Twitter."
+    model = TweetOutbox
+    deferred_errors = (CircuitOpenError,)
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help="Tweets to post in parallel.")
+
+    def post(self, row: TweetOutbox, token: str):
+        """Posts one tweet and returns the exception raised, if any."""
+        try:
+            if token is None:
+                raise ValueError("No Twitter credential for this tweet.")
+            Tweet().make_tweet({'text': row.text}, token)
+        except Exception as exc:
+            return exc
+        return None
+
+    def drain(self, options) -> int:
+        try:
+            return super().drain(options)
+        finally:
+            client = Tweet()
+            record_tweet_metrics(client.metrics.collect(),
+                                 client.breaker.state)
+
+    def deliver(self, rows: list, options) -> list:
+        # Tokens are read here, since the pool's threads would each open
+        # their own database connection
+        tokens = TwitterCredential.objects.in_bulk(
+            {row.credential_id for row in rows} - {None})
+        tokens = [tokens[row.credential_id].access_token
+                  if row.credential_id in tokens else None for row in rows]
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            return list(pool.map(self.post, rows, tokens))
+
+    def finish(self, rows: list):
+        done = [row.pk for row in rows if row.status != TweetOutbox.PENDING]
+        if done:
+            TweetOutbox.objects.filter(pk__in=done).update(credential=None)
+        # Tokens moved out of old rows belong to no vendor; drop them with
+        # their last tweet
+        TwitterCredential.objects.filter(user=None,
+                                         tweets__isnull=True).delete()
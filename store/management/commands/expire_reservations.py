@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.checkout import expire_reservations
+
+
+class Command(BaseCommand):
+    """
+    Deletes stock reservations whose hold has lapsed.
+
+    Expired reservations already stop counting against available stock,
+    so this only keeps the table small. Rows are deleted in primary key
+    batches; run it from cron, or keep it running with ``--loop``.
+    """
+    help = "Delete expired checkout stock reservations."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Reservations to delete per statement.")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep sweeping instead of exiting.")
+        parser.add_argument('--interval', type=float, default=60.0,
+                            help="Seconds to sleep between sweeps with "
+                                 "--loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = expire_reservations(options['batch_size'])
+            self.stdout.write(f"Expired {deleted} reservations.")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
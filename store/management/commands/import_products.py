@@ -0,0 +1,74 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.imports import (IMPORT_CHUNK_SIZE, IMPORT_FORMATS, RejectWriter,
+                           UNREADABLE_FILE_ERRORS, import_format,
+                           import_products, read_rows)
+from store.models import Store
+
+
+class Command(BaseCommand):
+    """
+    Creates or updates a store's products from a CSV or JSON lines file.
+
+    The file is read one row at a time and written in chunks (see
+    :func:`store.imports.import_products`), so any size of file can be
+    imported. Rows that fail validation are written, with their line
+    number and errors, to a side file next to the input.
+    """
+    help = "Import products into a store from a CSV or JSONL file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('store_id', type=int,
+                            help="The store to import into.")
+        parser.add_argument('path', help="The file to import.")
+        parser.add_argument('--format', choices=IMPORT_FORMATS,
+                            help="The file format. Defaults to jsonl for "
+                                 ".jsonl/.ndjson files and csv otherwise.")
+        parser.add_argument('--chunk-size', type=int,
+                            default=IMPORT_CHUNK_SIZE,
+                            help="Rows to write per statement.")
+        parser.add_argument('--rejects',
+                            help="Where to write rejected rows. Defaults "
+                                 "to <path>.rejects.<format>.")
+
+    def handle(self, *args, **options):
+        try:
+            store = Store.objects.get(pk=options['store_id'])
+        except Store.DoesNotExist:
+            raise CommandError(f"Store {options['store_id']} does not exist.")
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+        path = options['path']
+        fmt = options['format'] or import_format(path)
+        rejects_path = options['rejects'] or f'{path}.rejects.{fmt}'
+
+        started = time.perf_counter()
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as fh, \
+                    open(rejects_path, 'w', newline='',
+                         encoding='utf-8') as rejects_fh:
+                result = import_products(store, read_rows(fh, fmt),
+                                         options['chunk_size'],
+                                         RejectWriter(rejects_fh, fmt))
+        except OSError as exc:
+            raise CommandError(f"Could not open {exc.filename}: "
+                               f"{exc.strerror}.")
+        except UNREADABLE_FILE_ERRORS as exc:
+            raise CommandError(f"Could not read {path} ({exc}). Products "
+                               f"written before that point were kept; "
+                               f"rejected rows so far are in "
+                               f"{rejects_path}.")
+        elapsed = time.perf_counter() - started
+        if not result.rejected:
+            os.remove(rejects_path)
+
+        rate = (result.imported + result.rejected) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.imported} products into {store.name} "
+            f"({rate:.0f} rows/s)."))
+        if result.rejected:
+            self.stdout.write(self.style.WARNING(
+                f"Rejected {result.rejected} rows; see {rejects_path}."))
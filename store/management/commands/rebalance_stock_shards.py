@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.models import Product
+from store.stock import rebalance
+
+
+class Command(BaseCommand):
+    """
+    Evens out the stock shards of sharded products and refreshes their
+    ``Product.stock`` totals.
+
+    Random shard picks drift apart over a sale, and a line that no single
+    shard can cover has to lock all of them, so run this periodically
+    during a promotion. ``--shards`` turns sharding on for the given
+    products, changes their shard count, or with 0 turns it off.
+    """
+    help = "Rebalance sharded product stock, or turn sharding on or off."
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_ids', nargs='*', type=int,
+                            help="Products to rebalance. Defaults to every "
+                                 "sharded product.")
+        parser.add_argument('--shards', type=int, default=None,
+                            help="Set the number of shards; 0 turns "
+                                 "sharding off.")
+
+    def handle(self, *args, **options):
+        shards = options['shards']
+        if shards is not None and shards < 0:
+            raise CommandError("--shards must be 0 or more.")
+        if options['product_ids']:
+            products = Product.objects.filter(pk__in=options['product_ids'])
+        elif shards is None:
+            products = Product.objects.filter(stock_shards__gt=0)
+        else:
+            raise CommandError("Name the products to change --shards for.")
+        for product in products.only('pk', 'name'):
+            total = rebalance(product, shards)
+            self.stdout.write(f"{product.name}: {total} units.")
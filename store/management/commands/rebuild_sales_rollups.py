@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from store.models import Order
+from store.rollups import rebuild_daily_sales
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the ``DailyStoreSales`` rollup from order items.
+
+    The date range is walked in chunks of ``--chunk-days`` days. Each
+    chunk costs one grouped aggregate and replaces that chunk's rows in
+    its own transaction, so a long history never builds one huge query.
+    Without ``--from`` the rebuild starts at the first order.
+    """
+    help = "Rebuild daily store sales for a date range."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', type=date.fromisoformat,
+                            help="First day to rebuild (YYYY-MM-DD). "
+                                 "Defaults to the day of the first order.")
+        parser.add_argument('--to', dest='end', type=date.fromisoformat,
+                            help="Last day to rebuild (YYYY-MM-DD). "
+                                 "Defaults to today.")
+        parser.add_argument('--store', dest='stores', type=int,
+                            action='append',
+                            help="Only rebuild this store; may be repeated.")
+        parser.add_argument('--chunk-days', type=int, default=7,
+                            help="Days to aggregate per query.")
+
+    def handle(self, *args, **options):
+        end = options['end'] or timezone.localdate()
+        start = options['start']
+        if start is None:
+            first = Order.objects.aggregate(first=Min('created_at'))['first']
+            if first is None:
+                self.stdout.write("No orders to roll up.")
+                return
+            start = timezone.localdate(first)
+        if start > end:
+            raise CommandError("--from must not be after --to.")
+        if options['chunk_days'] < 1:
+            raise CommandError("--chunk-days must be at least 1.")
+
+        written = 0
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(chunk_start
+                            + timedelta(days=options['chunk_days'] - 1), end)
+            written += rebuild_daily_sales(chunk_start, chunk_end,
+                                           options['stores'])
+            chunk_start = chunk_end + timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {written} daily sales rows from {start} to {end}."))
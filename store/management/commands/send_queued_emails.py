@@ -0,0 +1,44 @@
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+
+from store.models import QueuedEmail
+from store.outbox import OutboxCommandMixin
+
+
+class Command(OutboxCommandMixin, BaseCommand):
+    """
+    Sends emails queued in the ``QueuedEmail`` table.
+
+    Each claimed batch is delivered over one mail connection opened with
+    ``get_connection()``, so a batch of invoices costs a single SMTP
+    handshake. Failures are rescheduled with exponential backoff until
+    ``--max-attempts`` is reached, after which the row is marked failed.
+    """
+    help = "Send queued emails such as checkout invoices."
+    model = QueuedEmail
+    default_batch_size = 100
+
+    def deliver(self, rows: list, options) -> list:
+        try:
+            connection = get_connection(fail_silently=False)
+            connection.open()
+        except Exception as exc:
+            return [exc] * len(rows)
+
+        errors = []
+        try:
+            for row in rows:
+                message = EmailMessage(subject=row.subject,
+                                       body=row.body,
+                                       from_email=row.from_email,
+                                       to=row.to,
+                                       connection=connection)
+                try:
+                    connection.send_messages([message])
+                except Exception as exc:
+                    errors.append(exc)
+                else:
+                    errors.append(None)
+        finally:
+            connection.close()
+        return errors
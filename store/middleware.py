@@ -0,0 +1,130 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .cart import merge_session_cart
+
+logger = logging.getLogger('store.queries')
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)|\((?:\s*\?\s*,)+\s*\?\s*\)')
+
+
+def sql_shape(sql: str) -> str:
+    """
+    Reduces a SQL statement to its shape by replacing literals and
+    parameter lists with placeholders, so ``WHERE id = 1`` and
+    ``WHERE id = 2`` count as the same statement.
+
+    :param sql: The SQL statement as sent to the database.
+    :type sql: str
+    :return: The normalised statement.
+    :rtype: str
+    """
+    shape = _LITERALS.sub('?', sql)
+    return _IN_LISTS.sub('(...)', shape)
+
+
+class QueryStats:
+    """
+    ``connection.execute_wrapper`` callable that counts queries and their
+    database time for one request.
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[sql_shape(sql)] += 1
+
+    @property
+    def duplicates(self) -> int:
+        """Queries that repeated an earlier statement shape."""
+        return sum(n - 1 for n in self.shapes.values())
+
+
+class QueryCountMiddleware:
+    """
+    Counts the SQL queries, database time and duplicate statements of
+    every request.
+
+    The numbers are sent back in a ``Server-Timing`` header (visible in
+    the browser's network panel) and written as one structured log line
+    to the ``store.queries`` logger. A statement shape that repeats more
+    than ``QUERY_N_PLUS_ONE_THRESHOLD`` times in one request is logged as
+    a warning with the URL name, which is how N+1 loops show up. The
+    threshold can be tuned per URL name with
+    ``QUERY_N_PLUS_ONE_THRESHOLDS``.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'QUERY_N_PLUS_ONE_THRESHOLD', 10)
+        self.thresholds = getattr(settings, 'QUERY_N_PLUS_ONE_THRESHOLDS', {})
+
+    def __call__(self, request):
+        stats = QueryStats()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(stats))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        response['Server-Timing'] = (
+            f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries", '
+            f'dup;desc="{stats.duplicates} duplicate queries", '
+            f'total;dur={total * 1000:.1f}')
+
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.view_name if match else request.path
+        fields = {
+            'url_name': url_name,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': stats.count,
+            'duplicate_queries': stats.duplicates,
+            'db_ms': round(stats.duration * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+        }
+        logger.info(' '.join(f'{key}=%s' for key in fields),
+                    *fields.values(), extra=fields)
+        threshold = self.thresholds.get(url_name, self.threshold)
+        for shape, count in stats.shapes.items():
+            if count > threshold:
+                logger.warning(
+                    'Possible N+1 in %s: statement ran %d times: %s',
+                    url_name, count, shape,
+                    extra={'url_name': url_name, 'repeats': count,
+                           'sql_shape': shape})
+        return response
+
+
+class SessionCartMiddleware:
+    """
+    Merges the session cart of a signed-in user into their stored cart.
+
+    Carts are merged when a user logs in (see :mod:`store.signals`), but
+    users who were already signed in when carts moved from the session to
+    :class:`store.models.CartLine` rows still carry one in their session.
+    It is merged on their first request, before any view reads the cart.
+    Must come after ``AuthenticationMiddleware``.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if 'cart' in request.session and request.user.is_authenticated:
+            merge_session_cart(request.user, request.session.pop('cart'))
+        return self.get_response(request)
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.2 on 2026-10-17 20:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_review_product_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['store', 'price', 'stock'], name='product_store_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', 'stock'], name='product_price_stock_idx'),
+        ),
+    ]
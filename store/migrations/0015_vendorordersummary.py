@@ -0,0 +1,33 @@
+# Generated by Django 5.2.2 on 2026-10-17 21:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_cart'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorOrderSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('buyer_name', models.CharField(max_length=150)),
+                ('item_count', models.PositiveIntegerField()),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('placed', 'Placed'), ('shipped', 'Shipped'), ('cancelled', 'Cancelled')], default='placed', max_length=10)),
+                ('created_at', models.DateTimeField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vendor_summaries', to='store.order')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='store.store')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vendor_order_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['vendor', '-order', '-store'], name='vendorsummary_vendor_idx')],
+                'constraints': [models.UniqueConstraint(fields=('store', 'order'), name='vendorsummary_store_order_uniq')],
+            },
+        ),
+    ]
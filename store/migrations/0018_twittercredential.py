@@ -0,0 +1,49 @@
+# Generated by Django 5.2.2 on 2026-10-17 21:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def move_pending_tokens(apps, schema_editor):
+    # Pending tweets keep their token through a credential of no vendor;
+    # the tokens of sent and failed tweets are dropped with the column
+    TweetOutbox = apps.get_model('store', 'TweetOutbox')
+    TwitterCredential = apps.get_model('store', 'TwitterCredential')
+    credentials = {}
+    for row in TweetOutbox.objects.filter(status='pending'):
+        credential = credentials.get(row.user_token)
+        if credential is None:
+            credential = credentials[row.user_token] = (
+                TwitterCredential.objects.create(access_token=row.user_token))
+        row.credential = credential
+        row.save(update_fields=['credential'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0017_product_sku'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TwitterCredential',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('access_token', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='twitter_credential', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='tweetoutbox',
+            name='credential',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tweets', to='store.twittercredential'),
+        ),
+        migrations.RunPython(move_pending_tokens, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='tweetoutbox',
+            name='user_token',
+        ),
+    ]
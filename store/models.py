@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
 
@@ -68,14 +69,104 @@ class Product(models.Model):
     :ivar description: An optional textual description of the product.
         It supports blank values.
     :type description: TextField
+    :ivar rating_count: The number of reviews of the product.
+    :type rating_count: PositiveIntegerField
+    :ivar rating_sum: The sum of all review ratings of the product.
+    :type rating_sum: PositiveIntegerField
+    :ivar rating_1: The number of one-star reviews; ``rating_2`` to
+        ``rating_5`` hold the rest of the star histogram. The rating
+        fields are kept up to date by the review signal handlers in
+        :mod:`store.signals` and can be recomputed with the
+        ``rebuild_product_ratings`` management command.
+    :type rating_1: PositiveIntegerField
+    :ivar stock_shards: The number of :class:`StockShard` rows the stock
+        is split across, or 0 to keep it in ``stock``. While a product is
+        sharded, checkout decrements the shards instead of ``stock``,
+        which then only holds the total as of the last rebalance (see
+        :mod:`store.stock`).
+    :type stock_shards: PositiveSmallIntegerField
+    :ivar sku: The vendor's own code for the product, unique within the
+        store. Bulk imports (see :mod:`store.imports`) match rows to
+        existing products by it.
+    :type sku: CharField
     """
-    store = models.ForeignKey(Store, on_delete=models.CASCADE)
+    store = models.ForeignKey(Store,
+                              on_delete=models.CASCADE,
+                              related_name='products')
     name = models.CharField(max_length=100)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField()
     image = models.ImageField(upload_to='products/', null=True, blank=True)
     description = models.TextField(blank=True)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    stock_shards = models.PositiveSmallIntegerField(default=0)
+    sku = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # NULLs never clash, so products without a SKU are unaffected
+            models.UniqueConstraint(fields=['store', 'sku'],
+                                    name='product_store_sku_uniq'),
+        ]
+        indexes = [
+            # Backs keyset pagination of the catalog sorted by price
+            models.Index(fields=['price', 'id'],
+                         name='product_price_id_idx'),
+            # Back the product API filters and its facet query: store and
+            # price range, with stock read from the index as well
+            models.Index(fields=['store', 'price', 'stock'],
+                         name='product_store_price_idx'),
+            models.Index(fields=['price', 'stock'],
+                         name='product_price_stock_idx'),
+        ]
+
+    @property
+    def average_rating(self):
+        """The mean review rating, or ``None`` if there are no reviews."""
+        if not self.rating_count:
+            return None
+        return round(self.rating_sum / self.rating_count, 1)
+
+    @property
+    def rating_histogram(self) -> dict:
+        """Maps each star rating from 1 to 5 to its number of reviews."""
+        return {stars: getattr(self, f'rating_{stars}')
+                for stars in range(1, 6)}
+
+
 
+class StockShard(models.Model):
+    """
+    One slice of a sharded product's stock.
+
+    Spreading a hot product's stock over several rows lets concurrent
+    checkouts decrement different rows instead of queueing on one row
+    lock. The product's stock is the sum of its shards.
+
+    :ivar product: The product the units belong to.
+    :type product: ForeignKey
+    :ivar index: The shard's number, from 0 to ``stock_shards - 1``.
+    :type index: PositiveSmallIntegerField
+    :ivar quantity: The units held by this shard.
+    :type quantity: PositiveIntegerField
+    """
+    product = models.ForeignKey(Product,
+                                on_delete=models.CASCADE,
+                                related_name='shards')
+    index = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'index'],
+                                    name='stockshard_product_index_uniq'),
+        ]
 
 class Order(models.Model):
     """
@@ -90,9 +181,31 @@ class Order(models.Model):
     :type user: ForeignKey
     :ivar created_at: The timestamp when the order was created.
     :type created_at: DateTimeField
+    :ivar total: The order total, denormalized from its items when the
+        order is placed so history pages never have to sum items. Orders
+        created before the field existed are filled in by the
+        ``backfill_order_totals`` management command.
+    :type total: DecimalField
+    :ivar status: The fulfilment status of the order.
+    :type status: CharField
     """
+    PENDING = 'pending'
+    PLACED = 'placed'
+    SHIPPED = 'shipped'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [(PENDING, 'Pending'),
+                      (PLACED, 'Placed'),
+                      (SHIPPED, 'Shipped'),
+                      (CANCELLED, 'Cancelled')]
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    total = models.DecimalField(max_digits=12,
+                                decimal_places=2,
+                                null=True,
+                                blank=True)
+    status = models.CharField(max_length=10,
+                              choices=STATUS_CHOICES,
+                              default=PLACED)
 
 
 class OrderItem(models.Model):
@@ -123,6 +236,197 @@ class OrderItem(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
 
+
+class VendorOrderSummary(models.Model):
+    """
+    One vendor store's share of an order, written when the order is
+    placed.
+
+    The vendor order list reads only this table, so it never joins the
+    order history to find which orders touch a vendor's stores. Rows are
+    unique per store and order; orders placed before the table existed
+    are filled in by the ``backfill_vendor_order_summaries`` command.
+
+    :ivar vendor: The owner of the store, so a vendor's orders are one
+        index range.
+    :type vendor: ForeignKey
+    :ivar store: The store whose products were bought.
+    :type store: ForeignKey
+    :ivar order: The order.
+    :type order: ForeignKey
+    :ivar buyer_name: The buyer's username when the order was placed.
+    :type buyer_name: CharField
+    :ivar item_count: The number of units bought from the store.
+    :type item_count: PositiveIntegerField
+    :ivar subtotal: What the buyer paid the store.
+    :type subtotal: DecimalField
+    :ivar status: The order's status, kept in step with ``Order.status``.
+    :type status: CharField
+    :ivar created_at: When the order was placed.
+    :type created_at: DateTimeField
+    """
+    vendor = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name='vendor_order_summaries')
+    store = models.ForeignKey(Store, on_delete=models.CASCADE)
+    order = models.ForeignKey(Order,
+                              on_delete=models.CASCADE,
+                              related_name='vendor_summaries')
+    buyer_name = models.CharField(max_length=150)
+    item_count = models.PositiveIntegerField()
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2)
+    status = models.CharField(max_length=10,
+                              choices=Order.STATUS_CHOICES,
+                              default=Order.PLACED)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['store', 'order'],
+                                    name='vendorsummary_store_order_uniq'),
+        ]
+        indexes = [
+            # Serves the newest-first keyset pages of one vendor
+            models.Index(fields=['vendor', '-order', '-store'],
+                         name='vendorsummary_vendor_idx'),
+        ]
+
+
+class DailyStoreSales(models.Model):
+    """
+    A store's sales on one day, maintained as orders are placed.
+
+    Checkout adds each order to its stores' rows for the day, so sales
+    reports read one row per store and day instead of aggregating order
+    items. The ``rebuild_sales_rollups`` command recomputes any date
+    range from the order items.
+
+    :ivar store: The store.
+    :type store: ForeignKey
+    :ivar date: The day, in the site's time zone.
+    :type date: DateField
+    :ivar units: Units sold.
+    :type units: PositiveIntegerField
+    :ivar revenue: What buyers paid the store.
+    :type revenue: DecimalField
+    :ivar orders: Orders that bought from the store.
+    :type orders: PositiveIntegerField
+    """
+    store = models.ForeignKey(Store,
+                              on_delete=models.CASCADE,
+                              related_name='daily_sales')
+    date = models.DateField()
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14,
+                                  decimal_places=2,
+                                  default=0)
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also serves the per-store date range reads
+            models.UniqueConstraint(fields=['store', 'date'],
+                                    name='dailysales_store_date_uniq'),
+        ]
+
+
+class StockReservation(models.Model):
+    """
+    Units of a product held for a buyer between starting checkout and
+    placing the order.
+
+    A product's available stock is its ``stock`` minus the quantities of
+    its live (unexpired) reservations. Placing the order deletes the
+    buyer's reservations in the same transaction that decrements stock;
+    abandoned ones stop counting at ``expires_at`` and are deleted by the
+    ``expire_reservations`` command.
+
+    :ivar product: The reserved product.
+    :type product: ForeignKey
+    :ivar user: The buyer holding the reservation.
+    :type user: ForeignKey
+    :ivar quantity: The number of units held.
+    :type quantity: PositiveIntegerField
+    :ivar expires_at: When the hold lapses.
+    :type expires_at: DateTimeField
+    :ivar created_at: The timestamp when the reservation was made.
+    :type created_at: DateTimeField
+    """
+    product = models.ForeignKey(Product,
+                                on_delete=models.CASCADE,
+                                related_name='reservations')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Sums a product's live holds without touching expired rows
+            models.Index(fields=['product', 'expires_at', 'quantity'],
+                         name='reservation_live_idx'),
+            # Lets the sweeper find expired rows in order
+            models.Index(fields=['expires_at'],
+                         name='reservation_expiry_idx'),
+        ]
+
+class Cart(models.Model):
+    """
+    A signed-in buyer's shopping cart.
+
+    The cart shares its primary key with the user, so cart lines can be
+    written knowing only who is signed in. Anonymous visitors keep their
+    cart in the session; it is merged into this table when they log in
+    (see :func:`store.cart.merge_session_cart`).
+
+    :ivar user: The buyer the cart belongs to.
+    :type user: OneToOneField
+    :ivar created_at: The timestamp when the cart was created.
+    :type created_at: DateTimeField
+    """
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='cart')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class CartLine(models.Model):
+    """
+    One product in a cart.
+
+    Each line is its own row, so changing a quantity writes that row
+    alone. Lines are unique per cart and product, which lets additions be
+    written as upserts.
+
+    :ivar cart: The cart the line belongs to.
+    :type cart: ForeignKey
+    :ivar product: The product in the cart.
+    :type product: ForeignKey
+    :ivar quantity: The number of units wanted.
+    :type quantity: PositiveIntegerField
+    :ivar updated_at: When the line was last added to or changed, for
+        finding abandoned carts.
+    :type updated_at: DateTimeField
+    """
+    cart = models.ForeignKey(Cart,
+                             on_delete=models.CASCADE,
+                             related_name='lines')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'],
+                                    name='cartline_cart_product_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['updated_at'],
+                         name='cartline_updated_idx'),
+        ]
+
+
 class Review(models.Model):
     """
     Represents a review given by a user for a specific product.
@@ -145,10 +449,144 @@ class Review(models.Model):
         verified purchase.
     :type verified_purchase: BooleanField
     """
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product,
+                                on_delete=models.CASCADE,
+                                related_name='reviews')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     rating = models.PositiveIntegerField(
         choices=[(i, i) for i in range(1, 6)])
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     verified_purchase = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Backs the newest-first keyset pagination of a product's
+            # reviews on the product detail page
+            models.Index(fields=['product', 'created_at', 'id'],
+                         name='review_product_created_idx'),
+        ]
+
+
+class QueuedMessage(models.Model):
+    """
+    Abstract base for messages delivered by a background worker.
+
+    Rows are written in the same transaction as the change they report
+    on, so a message is queued if and only if that change was committed.
+    Workers claim due rows, deliver them and reschedule failures with
+    exponential backoff through :mod:`store.outbox`.
+
+    :ivar status: Whether the message is pending, sent or has failed for
+        good.
+    :type status: CharField
+    :ivar attempts: How many times delivery has been attempted.
+    :type attempts: PositiveIntegerField
+    :ivar next_attempt_at: When a worker may next try to deliver it.
+    :type next_attempt_at: DateTimeField
+    :ivar last_error: The error of the most recent failed attempt.
+    :type last_error: TextField
+    :ivar created_at: The timestamp when the message was queued.
+    :type created_at: DateTimeField
+    :ivar sent_at: The timestamp when the message was delivered.
+    :type sent_at: DateTimeField
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'),
+                      (SENT, 'Sent'),
+                      (FAILED, 'Failed')]
+    status = models.CharField(max_length=10,
+                              choices=STATUS_CHOICES,
+                              default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+
+class TwitterCredential(models.Model):
+    """
+    A vendor's Twitter OAuth 2.0 access token, stored once for the tweets
+    queued on their behalf rather than copied into every outbox row.
+
+    :ivar user: The vendor. ``None`` for tokens moved out of rows queued
+        before credentials were stored on their own; those are deleted
+        once their tweets are done.
+    :type user: OneToOneField
+    :ivar access_token: The access token.
+    :type access_token: TextField
+    :ivar updated_at: When the token was last stored.
+    :type updated_at: DateTimeField
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, null=True,
+                                related_name='twitter_credential')
+    access_token = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def store(cls, user, access_token: str) -> 'TwitterCredential':
+        """Stores ``user``'s current token, replacing an older one."""
+        credential, _ = cls.objects.update_or_create(
+            user=user, defaults={'access_token': access_token})
+        return credential
+
+
+class TweetOutbox(QueuedMessage):
+    """
+    Represents a tweet waiting to be posted by the outbox worker.
+
+    Rows are written in the same transaction as the store or product they
+    announce. The ``drain_tweet_outbox`` management command posts them
+    and clears their credential once they are sent or given up on.
+
+    :ivar text: The tweet text.
+    :type text: TextField
+    :ivar credential: The token to post with, ``None`` once done.
+    :type credential: ForeignKey
+    """
+    text = models.TextField()
+    credential = models.ForeignKey(TwitterCredential,
+                                   on_delete=models.SET_NULL, null=True,
+                                   blank=True, related_name='tweets')
+
+    class Meta:
+        indexes = [
+            # Lets the worker find due rows without scanning sent ones
+            models.Index(fields=['status', 'next_attempt_at'],
+                         name='tweetoutbox_due_idx'),
+        ]
+
+
+class QueuedEmail(QueuedMessage):
+    """
+    Represents an email waiting to be sent by the email worker.
+
+    Checkout queues the invoice in the same transaction as the order, and
+    the ``send_queued_emails`` management command delivers queued emails
+    in batches over a single SMTP connection.
+
+    :ivar subject: The email subject.
+    :type subject: CharField
+    :ivar body: The plain-text email body.
+    :type body: TextField
+    :ivar from_email: The sender address.
+    :type from_email: CharField
+    :ivar to: The recipient addresses.
+    :type to: JSONField
+    """
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'],
+                         name='queuedemail_due_idx'),
+        ]
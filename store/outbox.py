@@ -0,0 +1,166 @@
+import random
+import time
+from abc import ABC, abstractmethod
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+
+def backoff_delay(attempts: int, base: float = 30.0,
+                  cap: float = 3600.0) -> float:
+    """
+    Returns the delay in seconds before retry number ``attempts``.
+
+    The delay doubles with every failed attempt up to ``cap``. Half of it
+    is randomised so a burst of failures does not retry in lock-step.
+
+    :param attempts: How many attempts have failed so far.
+    :type attempts: int
+    :param base: The delay after the first failure.
+    :type base: float
+    :param cap: The longest delay.
+    :type cap: float
+    :return: The delay in seconds.
+    :rtype: float
+    """
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def claim_due(model, batch_size: int, lease: int) -> list:
+    """
+    Claims up to ``batch_size`` due pending rows of a
+    :class:`store.models.QueuedMessage` subclass.
+
+    Rows are selected with ``SELECT ... FOR UPDATE SKIP LOCKED`` so
+    several workers can run side by side, and claimed by pushing their
+    ``next_attempt_at`` past the lease. Rows of a worker that crashes
+    mid-batch become due again once the lease expires.
+
+    :param model: The queued message model.
+    :param batch_size: The maximum number of rows to claim.
+    :type batch_size: int
+    :param lease: Seconds the claimed rows are hidden from other workers.
+    :type lease: int
+    :return: The claimed rows.
+    :rtype: list
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(model.objects
+                    .select_for_update(skip_locked=True)
+                    .filter(status=model.PENDING, next_attempt_at__lte=now)
+                    .order_by('next_attempt_at')[:batch_size])
+        if rows:
+            model.objects.filter(
+                pk__in=[row.pk for row in rows]
+            ).update(next_attempt_at=now + timedelta(seconds=lease))
+    return rows
+
+
+def record_results(model, rows: list, errors: list, max_attempts: int,
+                   deferred: tuple = ()) -> int:
+    """
+    Stores the outcome of one delivery attempt per row with a single
+    ``bulk_update``.
+
+    Delivered rows are marked sent. Failed rows are rescheduled with
+    :func:`backoff_delay`, or marked failed once ``max_attempts`` is
+    reached. Rows whose error is one of the ``deferred`` types were never
+    attempted (the receiving service was known to be down), so they are
+    rescheduled after the shortest delay without counting an attempt.
+
+    :param model: The queued message model.
+    :param rows: The rows that were attempted.
+    :type rows: list
+    :param errors: The exception raised for each row, or ``None`` for
+        rows that were delivered.
+    :type errors: list
+    :param max_attempts: Attempts after which a row is given up on.
+    :type max_attempts: int
+    :param deferred: Exception types that mean the row was not attempted.
+    :type deferred: tuple
+    :return: The number of rows delivered.
+    :rtype: int
+    """
+    now = timezone.now()
+    for row, error in zip(rows, errors):
+        if isinstance(error, deferred):
+            row.next_attempt_at = now + timedelta(seconds=backoff_delay(1))
+            row.last_error = str(error)
+            continue
+        row.attempts += 1
+        if error is None:
+            row.status = model.SENT
+            row.sent_at = now
+            row.last_error = ''
+        elif row.attempts >= max_attempts:
+            row.status = model.FAILED
+            row.last_error = str(error)
+        else:
+            row.next_attempt_at = now + timedelta(
+                seconds=backoff_delay(row.attempts))
+            row.last_error = str(error)
+    model.objects.bulk_update(
+        rows, ['status', 'attempts', 'next_attempt_at', 'last_error',
+               'sent_at'])
+    return sum(error is None for error in errors)
+
+
+class OutboxCommandMixin(ABC):
+    """
+    Shared options and polling loop for the outbox worker commands.
+
+    Subclasses implement :meth:`deliver`, which attempts a claimed batch
+    and returns one exception or ``None`` per row, and may list in
+    ``deferred_errors`` the exceptions that mean a row was not attempted
+    at all (see :func:`record_results`). :meth:`finish` runs after the
+    outcome is recorded, e.g. to drop data only needed for delivery.
+    """
+    model = None
+    default_batch_size = 50
+    deferred_errors = ()
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=self.default_batch_size,
+                            help="Rows to claim per batch.")
+        parser.add_argument('--max-attempts', type=int, default=8,
+                            help="Attempts before a row is marked failed.")
+        parser.add_argument('--lease', type=int, default=300,
+                            help="Seconds a claimed row is hidden from "
+                                 "other workers.")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep polling instead of exiting when the "
+                                 "outbox is empty.")
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help="Seconds to sleep between polls with "
+                                 "--loop.")
+
+    @abstractmethod
+    def deliver(self, rows: list, options) -> list:
+        """Attempts a batch, returning an exception or ``None`` per row."""
+
+    def finish(self, rows: list):
+        """Called with a batch's rows once their outcome is recorded."""
+
+    def drain(self, options) -> int:
+        rows = claim_due(self.model, options['batch_size'], options['lease'])
+        if not rows:
+            return 0
+        errors = self.deliver(rows, options)
+        sent = record_results(self.model, rows, errors,
+                              options['max_attempts'], self.deferred_errors)
+        self.finish(rows)
+        self.stdout.write(f"Delivered {sent} of {len(rows)} "
+                          f"{self.model._meta.verbose_name_plural}.")
+        return len(rows)
+
+    def handle(self, *args, **options):
+        while True:
+            if self.drain(options):
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,146 @@
+import base64
+import json
+from typing import NamedTuple
+
+from django.db.models import Q
+from rest_framework.pagination import CursorPagination
+
+
+class InvalidCursor(ValueError):
+    """
+    Raised when a cursor cannot be decoded for the requested ordering.
+    """
+
+
+class KeysetPage(NamedTuple):
+    """
+    One page of a keyset-paginated queryset.
+
+    :ivar object_list: The objects on this page.
+    :type object_list: list
+    :ivar next_cursor: The opaque cursor for the following page, or
+        ``None`` on the last page.
+    :type next_cursor: str
+    """
+    object_list: list
+    next_cursor: str
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+
+def encode_cursor(obj, ordering) -> str:
+    """
+    Encodes the ordering key of ``obj`` as an opaque, URL-safe cursor.
+
+    :param obj: The last object of a page.
+    :param ordering: The field names the page is ordered by, optionally
+        prefixed with ``-`` for descending order.
+    :type ordering: tuple
+    :return: The cursor string.
+    :rtype: str
+    """
+    values = [str(getattr(obj, field.lstrip('-'))) for field in ordering]
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, model, ordering) -> list:
+    """
+    Decodes a cursor produced by :func:`encode_cursor` back into typed
+    field values.
+
+    :param cursor: The cursor string.
+    :type cursor: str
+    :param model: The model whose fields the cursor refers to.
+    :param ordering: The ordering the cursor was produced for.
+    :type ordering: tuple
+    :return: One Python value per ordering field.
+    :rtype: list
+    :raises InvalidCursor: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise ValueError(cursor)
+        return [model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(ordering, values)]
+    except Exception as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+def keyset_filter(ordering, values) -> Q:
+    """
+    Builds the ``WHERE`` clause selecting rows strictly after ``values``
+    in ``ordering``.
+
+    For ``('price', 'id')`` this is
+    ``price > p OR (price = p AND id > i)``, which a composite index on
+    ``(price, id)`` answers with a range seek.
+
+    :param ordering: The field names, optionally prefixed with ``-``.
+    :type ordering: tuple
+    :param values: The ordering key of the last row already seen.
+    :type values: list
+    :return: The filter expression.
+    :rtype: Q
+    """
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        equal = {ordering[j].lstrip('-'): values[j] for j in range(i)}
+        condition |= Q(**equal, **{f'{name}__{lookup}': values[i]})
+    return condition
+
+
+def keyset_page(queryset, ordering, cursor: str = None,
+                page_size: int = 24) -> KeysetPage:
+    """
+    Returns the page of ``queryset`` that follows ``cursor``.
+
+    Unlike ``OFFSET`` paging, the database seeks straight to the cursor
+    position through the ordering index, so a deep page costs the same
+    as the first. The last field of ``ordering`` must be unique (usually
+    ``id``) so the order is total.
+
+    :param queryset: The queryset to paginate. Any existing ordering is
+        replaced.
+    :type queryset: QuerySet
+    :param ordering: The field names to order by, optionally prefixed
+        with ``-``.
+    :type ordering: tuple
+    :param cursor: The cursor returned with the previous page, or
+        ``None`` for the first page.
+    :type cursor: str
+    :param page_size: The maximum number of objects per page.
+    :type page_size: int
+    :return: The page and the cursor of the next one.
+    :rtype: KeysetPage
+    :raises InvalidCursor: If ``cursor`` is malformed.
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = decode_cursor(cursor, queryset.model, ordering)
+        queryset = queryset.filter(keyset_filter(ordering, values))
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1], ordering)
+    return KeysetPage(rows, next_cursor)
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Default cursor pagination for the REST API.
+
+    Orders by primary key, which every model has indexed, so each page is
+    a range seek rather than an ``OFFSET`` scan. Clients may lower or
+    raise the page size with ``?page_size=`` up to ``max_page_size``.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -0,0 +1,119 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def nested_serializer(field):
+    """
+    Returns the model serializer that renders ``field`` as nested
+    objects, or ``None`` if ``field`` is not a nested relation.
+
+    :param field: A serializer field.
+    :return: The nested ``ModelSerializer`` instance, if any.
+    """
+    if (isinstance(field, serializers.ListSerializer)
+            and isinstance(field.child, serializers.ModelSerializer)):
+        return field.child
+    if isinstance(field, serializers.ModelSerializer):
+        return field
+    return None
+
+
+def _plan(serializer, prefix: str = ''):
+    """
+    Walks a serializer's fields and collects the relations and columns it
+    renders.
+
+    :param serializer: The serializer instance to inspect.
+    :param prefix: The lookup path of ``serializer`` from the root model.
+    :type prefix: str
+    :return: A ``(select_related, prefetch_related, only)`` triple. ``only``
+        is ``None`` when a field reads something other than a model field
+        (e.g. a method or property), in which case no columns may be
+        deferred safely. A field that reads more columns of its model than
+        its ``source`` lists them in an ``extra_sources`` attribute.
+    :rtype: tuple
+    """
+    model = serializer.Meta.model
+    select, prefetch, only = [], [], [prefix + model._meta.pk.name]
+    for field in serializer.fields.values():
+        if field.source == '*' or '.' in field.source:
+            only = None
+            continue
+        lookup = prefix + field.source
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            only = None
+            continue
+        child = nested_serializer(field)
+        if isinstance(field, serializers.ListSerializer) and child:
+            # Reverse FK or M2M rendered as nested objects: prefetch with a
+            # queryset that is itself optimised for the child serializer.
+            # A reverse FK also needs its column back to this model.
+            remote = getattr(model_field, 'field', None)
+            required = [remote.name] if model_field.one_to_many else []
+            queryset = optimise_queryset(
+                child.Meta.model._default_manager.all(), child, required)
+            prefetch.append(Prefetch(lookup, queryset=queryset))
+        elif child:
+            # Forward FK or one-to-one rendered as a nested object
+            select.append(lookup)
+            child_select, child_prefetch, child_only = _plan(child,
+                                                             lookup + '__')
+            select.extend(child_select)
+            prefetch.extend(child_prefetch)
+            if only is not None and child_only is not None:
+                only.extend(child_only)
+            else:
+                only = None
+        elif isinstance(field, serializers.ManyRelatedField):
+            # Many primary keys or hyperlinks, e.g. an M2M field
+            prefetch.append(lookup)
+        elif only is not None and model_field.concrete:
+            only.append(lookup)
+            only.extend(prefix + name
+                        for name in getattr(field, 'extra_sources', ()))
+    return select, prefetch, only
+
+
+def optimise_queryset(queryset, serializer, required=()):
+    """
+    Adds the ``select_related``/``prefetch_related`` calls that
+    ``serializer`` needs to render ``queryset`` without per-row queries,
+    and restricts the ``SELECT`` to the columns it actually renders.
+
+    The plan is derived from the serializer tree itself, so nested
+    serializers of any depth cost one query per level instead of one
+    query per parent object, and fields trimmed from the serializer are
+    left out of the SQL as well.
+
+    :param queryset: The queryset the serializer will render.
+    :type queryset: QuerySet
+    :param serializer: The serializer instance that will render it.
+    :param required: Extra field names that must be loaded, e.g. the
+        foreign key a prefetch joins on.
+    :type required: list
+    :return: The optimised queryset.
+    :rtype: QuerySet
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    select, prefetch, only = _plan(serializer)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    if only is not None:
+        queryset = queryset.only(*dict.fromkeys([*only, *required]))
+    return queryset
+
+
+class PrefetchPlanMixin:
+    """
+    Viewset mixin that optimises ``get_queryset()`` for the viewset's
+    serializer with :func:`optimise_queryset`.
+    """
+    def get_queryset(self):
+        return optimise_queryset(super().get_queryset(),
+                                 self.get_serializer())
@@ -0,0 +1,61 @@
+from django.db.models import Count, F, Q, Sum
+
+from .models import Product, Review
+
+
+def apply_rating_change(product_id: int, added: int = None,
+                        removed: int = None):
+    """
+    Adjusts a product's rating aggregates for one review change with a
+    single ``UPDATE ... SET x = x + 1`` statement.
+
+    The arithmetic happens in the database through ``F()`` expressions,
+    so concurrent reviews of the same product never overwrite each other's
+    counts.
+
+    :param product_id: The reviewed product.
+    :type product_id: int
+    :param added: The rating of a review that was created or the new
+        rating of one that was edited.
+    :type added: int
+    :param removed: The rating of a review that was deleted or the old
+        rating of one that was edited.
+    :type removed: int
+    """
+    if added == removed:
+        return
+    changes = {}
+    if added is not None:
+        changes[f'rating_{added}'] = F(f'rating_{added}') + 1
+    if removed is not None:
+        changes[f'rating_{removed}'] = F(f'rating_{removed}') - 1
+    count_delta = (added is not None) - (removed is not None)
+    if count_delta:
+        changes['rating_count'] = F('rating_count') + count_delta
+    sum_delta = (added or 0) - (removed or 0)
+    changes['rating_sum'] = F('rating_sum') + sum_delta
+    Product.objects.filter(pk=product_id).update(**changes)
+
+
+def rating_aggregates(product_ids=None):
+    """
+    Computes the rating aggregates of products from their reviews with a
+    single grouped query.
+
+    :param product_ids: Restrict the aggregate to these products, or
+        ``None`` for every reviewed product.
+    :type product_ids: list
+    :return: Maps product id to a dict of rating field values.
+    :rtype: dict
+    """
+    reviews = Review.objects.all()
+    if product_ids is not None:
+        reviews = reviews.filter(product_id__in=product_ids)
+    histogram = {f'rating_{stars}': Count('id', filter=Q(rating=stars))
+                 for stars in range(1, 6)}
+    rows = (reviews.order_by()
+            .values('product_id')
+            .annotate(rating_count=Count('id'),
+                      rating_sum=Sum('rating'),
+                      **histogram))
+    return {row.pop('product_id'): row for row in rows}
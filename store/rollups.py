@@ -0,0 +1,218 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (Case, Count, DecimalField, ExpressionWrapper, F,
+                              Sum, Value, When)
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .bulk import bulk_upsert
+from .models import DailyStoreSales, OrderItem, Store, VendorOrderSummary
+
+
+def _line_total():
+    return ExpressionWrapper(
+        F('price') * F('quantity'),
+        output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def record_vendor_summaries(order, buyer, lines: list) -> list:
+    """
+    Writes the :class:`store.models.VendorOrderSummary` rows of a newly
+    placed order, one per store it buys from.
+
+    Costs one query for the store owners and one ``bulk_create``, however
+    many lines or stores the order has. Must run inside the transaction
+    that places the order.
+
+    :param order: The order just created.
+    :type order: Order
+    :param buyer: The buyer who placed it.
+    :type buyer: User
+    :param lines: The priced cart lines (see
+        :class:`store.cart.PricedCart`).
+    :type lines: list
+    :return: The summaries written.
+    :rtype: list
+    """
+    totals = {}
+    for line in lines:
+        store_id = line['product'].store_id
+        count, subtotal = totals.get(store_id, (0, Decimal('0.00')))
+        totals[store_id] = (count + line['quantity'],
+                            subtotal + line['subtotal'])
+    owners = dict(Store.objects.filter(pk__in=list(totals))
+                  .values_list('id', 'owner_id'))
+    return VendorOrderSummary.objects.bulk_create([
+        VendorOrderSummary(vendor_id=owners[store_id],
+                           store_id=store_id,
+                           order=order,
+                           buyer_name=buyer.username,
+                           item_count=count,
+                           subtotal=subtotal,
+                           status=order.status,
+                           created_at=order.created_at)
+        for store_id, (count, subtotal) in totals.items()
+    ])
+
+
+def summarise_orders(order_ids) -> list:
+    """
+    Computes the vendor summaries of existing orders from their items with
+    one grouped aggregate.
+
+    :param order_ids: The orders to summarise.
+    :return: Unsaved :class:`store.models.VendorOrderSummary` objects.
+    :rtype: list
+    """
+    rows = (OrderItem.objects
+            .filter(order_id__in=order_ids)
+            .order_by()
+            .values('order_id', 'product__store_id',
+                    'product__store__owner_id', 'order__user__username',
+                    'order__status', 'order__created_at')
+            .annotate(item_count=Sum('quantity'),
+                      subtotal=Sum(_line_total())))
+    return [VendorOrderSummary(vendor_id=row['product__store__owner_id'],
+                               store_id=row['product__store_id'],
+                               order_id=row['order_id'],
+                               buyer_name=row['order__user__username'],
+                               item_count=row['item_count'],
+                               subtotal=row['subtotal'],
+                               status=row['order__status'],
+                               created_at=row['order__created_at'])
+            for row in rows]
+
+
+def record_daily_sales(summaries: list):
+    """
+    Adds a newly placed order to the :class:`store.models.DailyStoreSales`
+    rows of its stores.
+
+    Missing rows for the day are inserted empty with one
+    ``bulk_create(ignore_conflicts=True)``, then every store's row is
+    incremented by one ``UPDATE``, so concurrent checkouts add up instead
+    of overwriting each other. Must run inside the transaction that
+    places the order.
+
+    :param summaries: The order's vendor summaries, as returned by
+        :func:`record_vendor_summaries`.
+    :type summaries: list
+    """
+    if not summaries:
+        return
+    day = timezone.localdate(summaries[0].created_at)
+    store_ids = [summary.store_id for summary in summaries]
+    DailyStoreSales.objects.bulk_create(
+        [DailyStoreSales(store_id=store_id, date=day)
+         for store_id in store_ids],
+        ignore_conflicts=True)
+
+    def per_store(field, zero):
+        return Case(*[When(store_id=summary.store_id,
+                           then=Value(getattr(summary, field)))
+                      for summary in summaries],
+                    default=Value(zero))
+
+    DailyStoreSales.objects.filter(store_id__in=store_ids, date=day).update(
+        units=F('units') + per_store('item_count', 0),
+        revenue=F('revenue') + per_store('subtotal', Decimal('0.00')),
+        orders=F('orders') + 1)
+
+
+def _day_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def rebuild_daily_sales(start: date, end: date, store_ids=None) -> int:
+    """
+    Recomputes the daily sales rows of a date range from the order items
+    with one grouped aggregate, replacing the values already there.
+
+    The range's rows are locked before the order items are read, so an
+    order placed meanwhile waits to add itself to the rebuilt row instead
+    of being counted twice or overwritten. Rows are zeroed rather than
+    deleted, since a waiting order updates the row it found. If the range
+    includes today, every store gets a row for today first, as a new
+    store-day row would otherwise escape the lock.
+
+    :param start: The first day to rebuild.
+    :type start: date
+    :param end: The last day to rebuild, inclusive.
+    :type end: date
+    :param store_ids: Only rebuild these stores. Defaults to all.
+    :return: The number of store-days with sales.
+    :rtype: int
+    """
+    items = OrderItem.objects.filter(
+        order__created_at__gte=_day_start(start),
+        order__created_at__lt=_day_start(end + timedelta(days=1)))
+    existing = DailyStoreSales.objects.filter(date__range=(start, end))
+    if store_ids is not None:
+        items = items.filter(product__store_id__in=store_ids)
+        existing = existing.filter(store_id__in=store_ids)
+    today = timezone.localdate()
+    with transaction.atomic():
+        if start <= today <= end:
+            DailyStoreSales.objects.bulk_create(
+                [DailyStoreSales(store_id=store_id, date=today)
+                 for store_id in (store_ids if store_ids is not None else
+                                  Store.objects.values_list('pk',
+                                                            flat=True))],
+                ignore_conflicts=True)
+        rows = {(row.store_id, row.date): row
+                for row in existing.select_for_update()}
+        for row in rows.values():
+            row.units, row.revenue, row.orders = 0, Decimal('0.00'), 0
+        new = []
+        totals = (items
+                  .annotate(day=TruncDate('order__created_at'))
+                  .order_by()
+                  .values('product__store_id', 'day')
+                  .annotate(units=Sum('quantity'),
+                            revenue=Sum(_line_total()),
+                            orders=Count('order_id', distinct=True)))
+        for total in totals:
+            key = (total['product__store_id'], total['day'])
+            row = rows.get(key)
+            if row is None:
+                row = DailyStoreSales(store_id=key[0], date=key[1])
+                new.append(row)
+            row.units = total['units']
+            row.revenue = total['revenue']
+            row.orders = total['orders']
+        DailyStoreSales.objects.bulk_update(rows.values(),
+                                            ['units', 'revenue', 'orders'])
+        bulk_upsert(DailyStoreSales, new, ['store', 'date'],
+                    ['units', 'revenue', 'orders'])
+    return sum(1 for row in [*rows.values(), *new] if row.orders)
+
+
+def sales_series(store_id: int, start: date, end: date) -> list:
+    """
+    Returns a store's daily sales between two days, read from the rollup
+    with one index range query. Days without sales are filled with zeros.
+
+    :param store_id: The store.
+    :type store_id: int
+    :param start: The first day.
+    :type start: date
+    :param end: The last day, inclusive.
+    :type end: date
+    :return: ``{'date', 'units', 'revenue', 'orders'}`` dicts, one per
+        day, oldest first.
+    :rtype: list
+    """
+    rows = {row['date']: row for row in
+            DailyStoreSales.objects
+            .filter(store_id=store_id, date__range=(start, end))
+            .values('date', 'units', 'revenue', 'orders')}
+    series = []
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        row = rows.get(day, {'units': 0, 'revenue': Decimal('0.00'),
+                             'orders': 0})
+        series.append({'date': day, 'units': row['units'],
+                       'revenue': row['revenue'], 'orders': row['orders']})
+    return series
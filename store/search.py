@@ -0,0 +1,443 @@
+import bisect
+import heapq
+import logging
+import math
+import os
+import pickle
+import re
+import threading
+from array import array
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r'[^\W_]+')
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from in is it of on or the to with'.split())
+# Term frequencies are stored as unsigned shorts
+MAX_TF = 0xFFFF
+
+
+def tokenize(text: str) -> list:
+    """
+    Splits text into lower-case word tokens, dropping stop words.
+
+    :param text: The text to tokenize.
+    :type text: str
+    :return: The tokens in order of appearance.
+    :rtype: list
+    """
+    return [token for token in _TOKEN.findall((text or '').lower())
+            if token not in STOP_WORDS]
+
+
+def product_tokens(name: str, description: str) -> list:
+    return tokenize(name) + tokenize(description)
+
+
+class SearchIndex:
+    """
+    In-memory inverted index over product names and descriptions, ranked
+    with BM25.
+
+    Every indexed version of a product gets a new slot number. A term's
+    posting list is a pair of parallel arrays: the slots containing it
+    (``array('I')``) and the term frequency in each (``array('H')``).
+    Slots only ever grow, so appending keeps posting lists sorted.
+    Re-indexing or removing a product retires its old slot instead of
+    editing posting lists; retired slots are skipped at query time and
+    dropped by :meth:`compact` once they make up half the index.
+
+    Terms found in more than ``champion_size`` products are not scanned
+    in full. Each gets a champion list, its ``champion_size`` postings
+    with the highest BM25 weight, picked on first use and extended as
+    products are added. Candidates come from the champion lists, and the
+    best of them are then rescored exactly against the full posting
+    lists. The last query term, matched as a prefix, is expanded to at
+    most ``prefix_expansions`` words, which share one term's worth of
+    champions between them.
+
+    :ivar k1: BM25 term frequency saturation.
+    :type k1: float
+    :ivar b: BM25 document length normalisation.
+    :type b: float
+    :ivar champion_size: Posting list length above which a term is
+        searched through its champion list.
+    :type champion_size: int
+    :ivar prefix_expansions: Words a prefix is expanded to at most.
+    :type prefix_expansions: int
+    :ivar prefix_scan: Words starting with a prefix that are looked at to
+        pick its expansions.
+    :type prefix_scan: int
+    """
+    k1 = 1.2
+    b = 0.75
+    champion_size = 1000
+    prefix_expansions = 8
+    prefix_scan = 256
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.postings = {}
+        self.champions = {}
+        self.champions_picked = {}
+        self.terms = []
+        self.slot_products = array('I')
+        self.slot_lengths = array('I')
+        self.slot_retired = bytearray()
+        self.product_slots = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.product_slots)
+
+    def add(self, product_id: int, name: str, description: str):
+        """
+        Indexes a product, replacing any earlier version of it.
+
+        :param product_id: The product's primary key.
+        :type product_id: int
+        :param name: The product name.
+        :type name: str
+        :param description: The product description.
+        :type description: str
+        """
+        tokens = product_tokens(name, description)
+        with self._lock:
+            self._retire(product_id)
+            slot = len(self.slot_products)
+            self.slot_products.append(product_id)
+            self.slot_lengths.append(len(tokens))
+            self.slot_retired.append(0)
+            self.product_slots[product_id] = slot
+            self.total_length += len(tokens)
+            for term, tf in Counter(tokens).items():
+                tf = min(tf, MAX_TF)
+                posting = self.postings.get(term)
+                if posting is None:
+                    posting = self.postings[term] = (array('I'), array('H'))
+                    bisect.insort(self.terms, term)
+                posting[0].append(slot)
+                posting[1].append(tf)
+                # New products are always candidates, so an update shows
+                # up without re-picking the champions from scratch
+                champions = self.champions.get(term)
+                if champions is not None:
+                    champions[0].append(slot)
+                    champions[1].append(tf)
+            self._compact_if_sparse()
+
+    def remove(self, product_id: int):
+        """Removes a product from the index, if it is indexed."""
+        with self._lock:
+            self._retire(product_id)
+            self._compact_if_sparse()
+
+    def _retire(self, product_id: int):
+        slot = self.product_slots.pop(product_id, None)
+        if slot is not None:
+            self.slot_retired[slot] = 1
+            self.total_length -= self.slot_lengths[slot]
+
+    def _compact_if_sparse(self):
+        if len(self.slot_products) > 2 * max(len(self.product_slots), 1024):
+            self.compact()
+
+    def compact(self):
+        """
+        Rebuilds the posting lists without retired slots, renumbering the
+        live ones.
+        """
+        with self._lock:
+            live = sorted(self.product_slots.values())
+            renumber = {old: new for new, old in enumerate(live)}
+            postings = {}
+            for term, (slots, tfs) in self.postings.items():
+                kept = [(renumber[slot], tf) for slot, tf in zip(slots, tfs)
+                        if slot in renumber]
+                if kept:
+                    postings[term] = (array('I', (s for s, _ in kept)),
+                                      array('H', (tf for _, tf in kept)))
+            self.postings = postings
+            self.champions = {}
+            self.champions_picked = {}
+            self.terms = sorted(postings)
+            self.slot_products = array('I', (self.slot_products[s]
+                                             for s in live))
+            self.slot_lengths = array('I', (self.slot_lengths[s]
+                                            for s in live))
+            self.slot_retired = bytearray(len(live))
+            self.product_slots = {product_id: slot for slot, product_id
+                                  in enumerate(self.slot_products)}
+
+    def expand(self, prefix: str, limit: int = None) -> list:
+        """
+        Returns up to ``limit`` (default :attr:`prefix_expansions`)
+        indexed terms starting with ``prefix``: the prefix itself if it is
+        a term, then those found in the most products among the first
+        :attr:`prefix_scan` in alphabetical order. Every expansion costs a
+        posting list scan, so a short prefix is not expanded to every
+        word it starts.
+        """
+        limit = self.prefix_expansions if limit is None else limit
+        with self._lock:
+            start = bisect.bisect_left(self.terms, prefix)
+            matches = []
+            for term in self.terms[start:start + self.prefix_scan]:
+                if not term.startswith(prefix):
+                    break
+                matches.append(term)
+            if prefix in self.postings:
+                matches.remove(prefix)
+                limit -= 1
+                best = [prefix]
+            else:
+                best = []
+            return best + heapq.nlargest(
+                limit, matches, key=lambda term: len(self.postings[term][0]))
+
+    def search(self, query: str, limit: int = 20, prefix: bool = True) -> list:
+        """
+        Ranks products against a free-text query with BM25.
+
+        Every query term adds its BM25 score to the products containing
+        it, so products matching more terms rank higher. With ``prefix``
+        set, the last term also matches longer words starting with it
+        (``"blu"`` finds ``"bluetooth"``), scored by its best expansion.
+
+        :param query: The search text.
+        :type query: str
+        :param limit: The maximum number of results.
+        :type limit: int
+        :param prefix: Whether the last term is matched as a prefix.
+        :type prefix: bool
+        :return: ``(product_id, score)`` pairs, best first.
+        :rtype: list
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        with self._lock:
+            if not self.total_length:
+                return []
+            groups = []
+            for i, token in enumerate(tokens):
+                if prefix and i == len(tokens) - 1:
+                    groups.append(self.expand(token))
+                else:
+                    groups.append([token] if token in self.postings else [])
+            weigh = self._weigher()
+            lengths, retired = self.slot_lengths, self.slot_retired
+
+            scores = defaultdict(float)
+            pruned = False
+            for terms in groups:
+                best = {}
+                # The expansions of a prefix share one term's budget of
+                # champions, taking the best of each
+                budget = self.champion_size // max(len(terms), 1)
+                for term in terms:
+                    idf = self._idf(term)
+                    slots, tfs = self.postings[term]
+                    if len(slots) > budget:
+                        slots, tfs = self._champions(term, weigh)
+                        # Picked champions come best first; products
+                        # added since then follow and are always kept
+                        picked = self.champions_picked.get(term,
+                                                           len(slots))
+                        if picked > budget:
+                            slots = slots[:budget] + slots[picked:]
+                            tfs = tfs[:budget] + tfs[picked:]
+                        pruned = True
+                    for slot, tf in zip(slots, tfs):
+                        if retired[slot]:
+                            continue
+                        score = idf * weigh(tf, lengths[slot])
+                        if score > best.get(slot, 0.0):
+                            best[slot] = score
+                for slot, score in best.items():
+                    scores[slot] += score
+
+            key = itemgetter(1)
+            if not pruned:
+                top = heapq.nlargest(limit, scores.items(), key=key)
+            else:
+                # A candidate may contain a term outside that term's
+                # champion list, so its score so far is only a lower bound
+                shortlist = heapq.nlargest(limit * 4, scores, key=scores.get)
+                top = heapq.nlargest(
+                    limit, ((slot, self._exact_score(slot, groups, weigh))
+                            for slot in shortlist), key=key)
+            return [(self.slot_products[slot], score) for slot, score in top]
+
+    def _idf(self, term: str) -> float:
+        # Document frequency counts retired slots as well; compaction keeps
+        # them under half the index, which bounds the skew
+        count = len(self.product_slots)
+        df = len(self.postings[term][0])
+        return (self.k1 + 1) * math.log(1 + (count - df + 0.5) / (df + 0.5))
+
+    def _weigher(self):
+        """
+        Returns the BM25 term weight as a function of term frequency and
+        document length, with the length normalisation folded into two
+        constants since it runs once per posting.
+        """
+        base = self.k1 * (1 - self.b)
+        per_token = (self.k1 * self.b * len(self.product_slots)
+                     / self.total_length)
+        return lambda tf, length: tf / (tf + base + per_token * length)
+
+    def pick_champions(self):
+        """
+        Picks the champion list of every long posting list up front, so
+        the first search for a common term does not pay for it.
+        """
+        with self._lock:
+            if not self.total_length:
+                return
+            weigh = self._weigher()
+            for term, (slots, _) in self.postings.items():
+                if len(slots) > self.champion_size:
+                    self.champions.pop(term, None)
+                    self._champions(term, weigh)
+
+    def _champions(self, term: str, weigh) -> tuple:
+        champions = self.champions.get(term)
+        if champions is None:
+            slots, tfs = self.postings[term]
+            lengths = self.slot_lengths
+            top = heapq.nlargest(
+                self.champion_size, zip(slots, tfs),
+                key=lambda posting: weigh(posting[1], lengths[posting[0]]))
+            champions = self.champions[term] = (
+                array('I', (slot for slot, _ in top)),
+                array('H', (tf for _, tf in top)))
+            self.champions_picked[term] = len(top)
+        return champions
+
+    def _exact_score(self, slot: int, groups: list, weigh) -> float:
+        length = self.slot_lengths[slot]
+        total = 0.0
+        for terms in groups:
+            best = 0.0
+            for term in terms:
+                slots, tfs = self.postings[term]
+                i = bisect.bisect_left(slots, slot)
+                if i < len(slots) and slots[i] == slot:
+                    best = max(best, self._idf(term) * weigh(tfs[i], length))
+            total += best
+        return total
+
+    @classmethod
+    def build(cls, rows) -> 'SearchIndex':
+        """
+        Builds an index from ``(id, name, description)`` rows.
+        """
+        index = cls()
+        for product_id, name, description in rows:
+            index.add(product_id, name, description)
+        index.pick_champions()
+        return index
+
+    def save(self, path: str):
+        """Writes the index to ``path``, replacing it atomically."""
+        with self._lock:
+            state = {key: value for key, value in self.__dict__.items()
+                     if key != '_lock'}
+            tmp = f'{path}.tmp'
+            with open(tmp, 'wb') as fh:
+                pickle.dump(state, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'SearchIndex':
+        index = cls()
+        with open(path, 'rb') as fh:
+            index.__dict__.update(pickle.load(fh))
+        return index
+
+
+_index = None
+_index_mtime = None
+_index_lock = threading.Lock()
+
+
+def index_path() -> str:
+    return str(getattr(settings, 'SEARCH_INDEX_PATH',
+                       settings.BASE_DIR / 'search_index.pickle'))
+
+
+def build_index(chunk_size: int = 2000) -> SearchIndex:
+    """Builds an index of every product from the database."""
+    from .models import Product
+    rows = (Product.objects.order_by()
+            .values_list('id', 'name', 'description')
+            .iterator(chunk_size=chunk_size))
+    return SearchIndex.build(rows)
+
+
+def get_index() -> SearchIndex:
+    """
+    Returns this process's search index.
+
+    The index is loaded from the file written by the ``build_search_index``
+    command, and reloaded when that file is rebuilt. Until the file exists
+    the index is empty, since building it from the database takes far too
+    long for a request. Changes made in this process are applied
+    incrementally by :mod:`store.signals`; changes made by other processes
+    arrive with the next rebuild of the file.
+    """
+    global _index, _index_mtime
+    path = index_path()
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        mtime = None
+    if _index is not None and mtime == _index_mtime:
+        return _index
+    with _index_lock:
+        if _index is None or mtime != _index_mtime:
+            if mtime is None:
+                logger.warning("No search index at %s; searches find "
+                               "nothing until build_search_index has run.",
+                               path)
+                _index = SearchIndex()
+            else:
+                _index = SearchIndex.load(path)
+            _index_mtime = mtime
+    return _index
+
+
+def loaded_index():
+    """Returns this process's index if it has been loaded, else ``None``."""
+    return _index
+
+
+def reset_index():
+    """Drops this process's index so the next search loads it again."""
+    global _index, _index_mtime
+    with _index_lock:
+        _index = None
+        _index_mtime = None
+
+
+def search_products(query: str, limit: int = 20) -> list:
+    """
+    Returns the products best matching ``query``, best first.
+
+    :param query: The search text.
+    :type query: str
+    :param limit: The maximum number of products.
+    :type limit: int
+    :return: The matching :class:`store.models.Product` objects.
+    :rtype: list
+    """
+    from .models import Product
+    ids = [product_id for product_id, _ in get_index().search(query, limit)]
+    products = Product.objects.in_bulk(ids)
+    return [products[product_id] for product_id in ids
+            if product_id in products]
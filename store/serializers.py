@@ -1,17 +1,99 @@
 # store/serializers.py
+from django.db import transaction
 from rest_framework import serializers
 from .models import Store, Product, Review
+from .stock import shard_totals, sync_shards
 
 class ReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = Review
         fields = ['id', 'product', 'user', 'rating', 'comment', 'created_at', 'verified_purchase']
 
+class StockField(serializers.IntegerField):
+    """
+    ``Product.stock``, read as the sum of the shards while the product is
+    sharded (see :mod:`store.stock`), which costs a query per sharded
+    product.
+    """
+    extra_sources = ('stock_shards',)  # see store.prefetch
+
+    def get_attribute(self, instance):
+        if instance.stock_shards:
+            return shard_totals([instance.pk]).get(instance.pk, 0)
+        return instance.stock
+
 class ProductSerializer(serializers.ModelSerializer):
     reviews = ReviewSerializer(many=True, read_only=True)  # Shows reviews for each product
+    stock = StockField(min_value=0)
+
+    class Meta:
+        model = Product
+        fields = ['id', 'store', 'sku', 'name', 'price', 'stock', 'image', 'description', 'reviews']
+        # Two blank SKUs in one store would break the (store, sku) constraint
+        extra_kwargs = {'sku': {'allow_blank': False}}
+
+    def update(self, instance, validated_data):
+        # A sharded product's stock is its shards, so a new level is
+        # spread over them as well
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if 'stock' in validated_data:
+                sync_shards(instance.pk)
+        return instance
+
+class UniqueItemsListSerializer(serializers.ListSerializer):
+    """
+    A list serializer that rejects items repeating the key of an earlier
+    item, since one bulk statement cannot write the same row twice. The
+    child's ``Meta.bulk_key`` names the validated fields that make up the
+    key. Errors are reported per item, like the child's own.
+    """
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        key_fields = self.child.Meta.bulk_key
+        seen = set()
+        errors = []
+        for item in items:
+            key = tuple(item[field] for field in key_fields)
+            errors.append({key_fields[-1]: ["Repeats an earlier item."]}
+                          if key in seen else {})
+            seen.add(key)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+class BulkProductSerializer(serializers.ModelSerializer):
+    """
+    One item of ``POST /api/products/bulk/``: a product created, or
+    updated if its store already has one with the SKU. The store must be
+    one of the ``stores`` ids in the serializer context.
+    """
+    store = serializers.IntegerField(source='store_id')
+    sku = serializers.CharField(max_length=64)
+
+    class Meta:
+        model = Product
+        fields = ['store', 'sku', 'name', 'price', 'stock', 'description']
+        # Matching on the SKU is the point, so existing (store, sku)
+        # pairs are not a validation error
+        validators = []
+        list_serializer_class = UniqueItemsListSerializer
+        bulk_key = ('store_id', 'sku')
+
+    def validate_store(self, value):
+        if value not in self.context['stores']:
+            raise serializers.ValidationError("Not one of your stores.")
+        return value
+
+class StockLevelSerializer(serializers.ModelSerializer):
+    """One item of ``PATCH /api/products/bulk-stock/``."""
+    id = serializers.IntegerField()
+
     class Meta:
         model = Product
-        fields = ['id', 'store', 'name', 'price', 'stock', 'image', 'description', 'reviews']
+        fields = ['id', 'stock']
+        list_serializer_class = UniqueItemsListSerializer
+        bulk_key = ('id',)
 
 class StoreSerializer(serializers.ModelSerializer):
     products = ProductSerializer(many=True, read_only=True)  # Shows products for each store
@@ -0,0 +1,152 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import (bump_catalog_version, bump_suggest_version,
+                    invalidate_product)
+from .cart import merge_session_cart
+from .models import (Order, Product, Review, Store, User,
+                     VendorOrderSummary)
+from .ratings import apply_rating_change
+from .search import loaded_index
+
+
+def invalidate_product_on_commit(product_id: int):
+    # Invalidating before commit would let a concurrent reader re-cache
+    # the old rows. Listing cards show the same fields, so the catalog
+    # moves to a new generation as well
+    def invalidate():
+        invalidate_product(product_id)
+        bump_catalog_version()
+    transaction.on_commit(invalidate)
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, **kwargs):
+    # Edits need the old rating and product to move the aggregates
+    instance._previous = None
+    if instance.pk:
+        instance._previous = (Review.objects
+                              .filter(pk=instance.pk)
+                              .values_list('product_id', 'rating')
+                              .first())
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    if created or previous is None:
+        apply_rating_change(instance.product_id, added=instance.rating)
+    elif previous[0] != instance.product_id:
+        apply_rating_change(previous[0], removed=previous[1])
+        apply_rating_change(instance.product_id, added=instance.rating)
+        invalidate_product_on_commit(previous[0])
+    else:
+        apply_rating_change(instance.product_id, added=instance.rating,
+                            removed=previous[1])
+    invalidate_product_on_commit(instance.product_id)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    apply_rating_change(instance.product_id, removed=instance.rating)
+    invalidate_product_on_commit(instance.product_id)
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_username(sender, instance, update_fields=None,
+                               **kwargs):
+    # Cached review blocks show reviewers' names; logins only write
+    # last_login and skip the lookup
+    instance._previous_username = None
+    if instance.pk and (update_fields is None
+                        or 'username' in update_fields):
+        instance._previous_username = (User.objects
+                                       .filter(pk=instance.pk)
+                                       .values_list('username', flat=True)
+                                       .first())
+
+
+@receiver(post_save, sender=User)
+def invalidate_reviewed_products(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_username', None)
+    if created or previous is None or previous == instance.username:
+        return
+    product_ids = list(Review.objects
+                       .filter(user=instance)
+                       .order_by()
+                       .values_list('product_id', flat=True)
+                       .distinct())
+
+    def invalidate():
+        for product_id in product_ids:
+            invalidate_product(product_id)
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    invalidate_product_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    index = loaded_index()
+    if index is not None:
+        product_id, name = instance.pk, instance.name
+        description = instance.description
+        transaction.on_commit(
+            lambda: index.add(product_id, name, description))
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_name(sender, instance, update_fields=None, **kwargs):
+    # Only a new, renamed or deleted product moves the type-ahead index
+    instance._previous_name = None
+    if instance.pk and (update_fields is None or 'name' in update_fields):
+        instance._previous_name = (Product.objects
+                                   .filter(pk=instance.pk)
+                                   .values_list('name', flat=True)
+                                   .first())
+
+
+@receiver(post_save, sender=Product)
+def refresh_suggestions(sender, instance, created, **kwargs):
+    if created or getattr(instance, '_previous_name',
+                          instance.name) != instance.name:
+        transaction.on_commit(bump_suggest_version)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    index = loaded_index()
+    if index is not None:
+        product_id = instance.pk
+        transaction.on_commit(lambda: index.remove(product_id))
+    transaction.on_commit(bump_suggest_version)
+
+
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    # Whatever was added while browsing anonymously joins the stored cart
+    session_cart = request.session.pop('cart', None) if request else None
+    if session_cart:
+        merge_session_cart(user, session_cart)
+
+
+@receiver(post_save, sender=Order)
+def sync_vendor_summary_status(sender, instance, created, **kwargs):
+    # Summaries are written with the order; later status changes follow it
+    if not created:
+        (VendorOrderSummary.objects
+         .filter(order_id=instance.pk)
+         .exclude(status=instance.status)
+         .update(status=instance.status))
@@ -0,0 +1,211 @@
+import random
+from functools import partial
+
+from django.db import transaction
+from django.db.models import (Case, F, IntegerField, OuterRef, Subquery,
+                              Sum, When)
+from django.db.models.functions import Coalesce
+
+from .cache import invalidate_product
+from .models import Product, StockShard
+
+
+def shard_totals(product_ids, lock: bool = False) -> dict:
+    """
+    Sums the shards of some products with one grouped query.
+
+    :param product_ids: The products to look at.
+    :param lock: Whether to lock every shard of the products with
+        ``SELECT ... FOR UPDATE`` first, which holds off checkouts of
+        them until the transaction ends. Used to check reservations
+        against a total that cannot change underneath (see
+        :func:`store.checkout.reserve_cart`).
+    :type lock: bool
+    :return: ``{product_id: units}`` for products that have shards.
+    :rtype: dict
+    """
+    if lock:
+        totals = {}
+        for product_id, quantity in (StockShard.objects.select_for_update()
+                                     .filter(product_id__in=product_ids)
+                                     .order_by('product_id', 'index')
+                                     .values_list('product_id', 'quantity')):
+            totals[product_id] = totals.get(product_id, 0) + quantity
+        return totals
+    return dict(StockShard.objects
+                .filter(product_id__in=product_ids)
+                .order_by()
+                .values('product_id')
+                .annotate(total=Sum('quantity'))
+                .values_list('product_id', 'total'))
+
+
+def current_stock():
+    """
+    Returns an annotation for a product's stock: the sum of its shards
+    while it is sharded, else ``Product.stock``. Checkout only decrements
+    the shards, so ``Product.stock`` of a sharded product is the total as
+    of its last rebalance or stock write.
+    """
+    totals = (StockShard.objects
+              .filter(product=OuterRef('pk'))
+              .order_by()
+              .values('product')
+              .annotate(total=Sum('quantity'))
+              .values('total'))
+    return Case(When(stock_shards__gt=0,
+                     then=Coalesce(Subquery(totals), 0,
+                                   output_field=IntegerField())),
+                default=F('stock'), output_field=IntegerField())
+
+
+def take_from_shards(product: Product, quantity: int) -> bool:
+    """
+    Removes ``quantity`` units from a sharded product's stock.
+
+    Shards are tried in random order with a conditional ``UPDATE`` each,
+    so concurrent buyers spread over different rows and the usual cost
+    is a single statement. When no one shard can cover the line, the
+    product's shards are locked together and drained in order.
+
+    Must run inside the transaction that records the sale.
+
+    :param product: The product, with ``stock_shards`` loaded.
+    :type product: Product
+    :param quantity: The units to take.
+    :type quantity: int
+    :return: ``False`` if the shards together hold fewer units.
+    :rtype: bool
+    """
+    shards = StockShard.objects.filter(product_id=product.pk)
+    for index in random.sample(range(product.stock_shards),
+                               product.stock_shards):
+        if shards.filter(index=index, quantity__gte=quantity).update(
+                quantity=F('quantity') - quantity):
+            return True
+
+    locked = list(shards.select_for_update()
+                  .filter(quantity__gt=0).order_by('index'))
+    if sum(shard.quantity for shard in locked) < quantity:
+        return False
+    remaining = quantity
+    for shard in locked:
+        taken = min(shard.quantity, remaining)
+        shard.quantity -= taken
+        remaining -= taken
+        if not remaining:
+            break
+    StockShard.objects.bulk_update(locked, ['quantity'])
+    return True
+
+
+def _spread(total: int, shards: int) -> list:
+    share, extra = divmod(total, shards)
+    return [share + (index < extra) for index in range(shards)]
+
+
+def rebalance(product: Product, shards: int = None) -> int:
+    """
+    Spreads a product's stock evenly over its shards, optionally changing
+    how many there are.
+
+    The product row and its shards are locked while their total is
+    recomputed and rewritten, and ``Product.stock`` is refreshed with the
+    total. ``shards=0`` turns sharding off and moves the total back into
+    ``Product.stock``; a positive value on an unsharded product turns it
+    on.
+
+    :param product: The product to rebalance.
+    :type product: Product
+    :param shards: The new number of shards. Defaults to the current one.
+    :type shards: int
+    :return: The product's total stock.
+    :rtype: int
+    """
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(pk=product.pk)
+        existing = list(StockShard.objects.select_for_update()
+                        .filter(product=product).order_by('index'))
+        total = (sum(shard.quantity for shard in existing)
+                 if product.stock_shards else product.stock)
+        shards = product.stock_shards if shards is None else shards
+
+        StockShard.objects.filter(product=product,
+                                  index__gte=shards).delete()
+        if shards:
+            quantities = _spread(total, shards)
+            kept = existing[:shards]
+            for shard in kept:
+                shard.quantity = quantities[shard.index]
+            StockShard.objects.bulk_update(kept, ['quantity'])
+            StockShard.objects.bulk_create([
+                StockShard(product=product, index=index,
+                           quantity=quantities[index])
+                for index in range(len(kept), shards)
+            ])
+        Product.objects.filter(pk=product.pk).update(stock=total,
+                                                     stock_shards=shards)
+        transaction.on_commit(lambda: invalidate_product(product.pk))
+    return total
+
+
+def respread(products) -> None:
+    """
+    Replaces what the shards of sharded products hold with an even split
+    of their ``stock``, after new totals were written to ``stock`` by a
+    bulk update that bypassed the shards. Unsharded products are skipped.
+
+    Must run inside the transaction that wrote the totals.
+
+    :param products: The products, with ``stock`` and ``stock_shards``
+        loaded.
+    """
+    totals = {product.pk: product.stock
+              for product in products if product.stock_shards}
+    if not totals:
+        return
+    shards = {}
+    for shard in (StockShard.objects.select_for_update()
+                  .filter(product_id__in=totals).order_by('index')):
+        shards.setdefault(shard.product_id, []).append(shard)
+    for product_id, product_shards in shards.items():
+        quantities = _spread(totals[product_id], len(product_shards))
+        for shard, quantity in zip(product_shards, quantities):
+            shard.quantity = quantity
+    StockShard.objects.bulk_update(
+        [shard for product_shards in shards.values()
+         for shard in product_shards], ['quantity'])
+
+
+def sync_shards(product_id: int) -> None:
+    """
+    Spreads the ``stock`` just saved for one product over its shards, if
+    it has any, after an edit (through the API or the admin) wrote the
+    new level to ``stock`` alone.
+
+    Must run inside the transaction that saved the product.
+
+    :param product_id: The product.
+    :type product_id: int
+    """
+    respread([Product.objects.select_for_update()
+              .only('stock', 'stock_shards').get(pk=product_id)])
+
+
+def set_stock_levels(products) -> None:
+    """
+    Writes new stock levels for many products with one bulk ``UPDATE``.
+
+    Sharded products get the level as their total, split evenly over
+    their shards (see :func:`respread`). Product signals do not fire;
+    cached detail pages are invalidated once the transaction commits.
+
+    Must run inside a transaction that holds the products' row locks.
+
+    :param products: The products, with ``stock`` set to the new level
+        and ``stock_shards`` loaded.
+    """
+    Product.objects.bulk_update(products, ['stock'])
+    respread(products)
+    for product in products:
+        transaction.on_commit(partial(invalidate_product, product.pk))
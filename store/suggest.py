@@ -0,0 +1,198 @@
+import bisect
+import heapq
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.db.models import Sum
+
+from .cache import suggest_version
+from .models import OrderItem, Product
+
+# Sorts after every character, so prefix + END bounds the prefix's range
+END = chr(0x10FFFF)
+
+
+class Suggester:
+    """
+    Type-ahead index of product names, ranked by popularity.
+
+    Names are kept lower-cased in a sorted list, so the names starting
+    with a prefix form one contiguous range found with two bisections.
+    A segment tree over that list stores, for every node, the position
+    of the most popular name below it; the top ``k`` names of any range
+    are then pulled out with a heap in ``O(k log n)``, however many names
+    share the prefix.
+
+    :ivar keys: Lower-cased names, sorted.
+    :type keys: list
+    :ivar names: The display name for each key.
+    :type names: list
+    :ivar ids: The product id for each key.
+    :type ids: array
+    :ivar weights: The popularity of each key.
+    :type weights: array
+    """
+    def __init__(self, entries):
+        """
+        :param entries: ``(product_id, name, weight)`` tuples. Products
+            with the same name (ignoring case) are suggested once, under
+            the most popular of them, with their weights added up.
+        """
+        merged = {}
+        for product_id, name, weight in entries:
+            key = ' '.join(name.lower().split())
+            if not key:
+                continue
+            current = merged.get(key)
+            if current is None:
+                merged[key] = [weight, weight, product_id, name]
+            else:
+                current[0] += weight
+                if weight > current[1]:
+                    current[1:] = [weight, product_id, name]
+        self.keys = sorted(merged)
+        self.names = [merged[key][3] for key in self.keys]
+        self.ids = array('I', (merged[key][2] for key in self.keys))
+        self.weights = array('d', (merged[key][0] for key in self.keys))
+        self._build_tree()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _build_tree(self):
+        size = 1
+        while size < len(self.keys):
+            size *= 2
+        self.size = size
+        # Leaves past the end point at -1, which never wins
+        tree = array('i', [-1]) * (2 * size)
+        tree[size:size + len(self.keys)] = array('i', range(len(self.keys)))
+        weights = self.weights
+        for node in range(size - 1, 0, -1):
+            left, right = tree[2 * node], tree[2 * node + 1]
+            if right < 0 or (left >= 0 and weights[left] >= weights[right]):
+                tree[node] = left
+            else:
+                tree[node] = right
+        self.tree = tree
+
+    def _best(self, lo: int, hi: int) -> int:
+        """Returns the position of the heaviest key in ``[lo, hi)``."""
+        tree, weights = self.tree, self.weights
+        best = -1
+        lo += self.size
+        hi += self.size
+        while lo < hi:
+            if lo & 1:
+                candidate = tree[lo]
+                if best < 0 or weights[candidate] > weights[best]:
+                    best = candidate
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                candidate = tree[hi]
+                if best < 0 or weights[candidate] > weights[best]:
+                    best = candidate
+            lo >>= 1
+            hi >>= 1
+        return best
+
+    def suggest(self, prefix: str, limit: int = 10) -> list:
+        """
+        Returns the most popular names starting with ``prefix``.
+
+        :param prefix: What the shopper has typed so far.
+        :type prefix: str
+        :param limit: The maximum number of suggestions.
+        :type limit: int
+        :return: ``{'id', 'name'}`` dicts, most popular first.
+        :rtype: list
+        """
+        prefix = ' '.join(prefix.lower().split())
+        if not prefix:
+            return []
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + END, lo)
+        heap = []
+
+        def push(start, stop):
+            if start < stop:
+                best = self._best(start, stop)
+                heapq.heappush(heap, (-self.weights[best], best, start, stop))
+
+        push(lo, hi)
+        results = []
+        while heap and len(results) < limit:
+            _, best, start, stop = heapq.heappop(heap)
+            results.append({'id': self.ids[best], 'name': self.names[best]})
+            push(start, best)
+            push(best + 1, stop)
+        return results
+
+
+def popularity_entries() -> list:
+    """
+    Returns ``(product_id, name, weight)`` for every product, where the
+    weight is the number of units sold plus the number of reviews.
+    """
+    sold = dict(OrderItem.objects.order_by()
+                .values('product_id')
+                .annotate(units=Sum('quantity'))
+                .values_list('product_id', 'units'))
+    return [(product_id, name, sold.get(product_id, 0) + rating_count)
+            for product_id, name, rating_count in
+            Product.objects.order_by().values_list('id', 'name',
+                                                   'rating_count')]
+
+
+_suggester = None
+_suggester_version = None
+_suggester_built = None
+_rebuild_lock = threading.Lock()
+
+
+def refresh_interval() -> float:
+    """Seconds a suggester serves before its popularity is re-read."""
+    return getattr(settings, 'SUGGEST_REFRESH_SECONDS', 3600)
+
+
+def get_suggester() -> Suggester:
+    """
+    Returns this process's suggester, rebuilding it when the product names
+    have changed (see :func:`store.cache.suggest_version`) or it is older
+    than ``SUGGEST_REFRESH_SECONDS``. Sales and reviews only move the
+    ranking, so they are picked up by the periodic rebuild rather than
+    each triggering one.
+
+    One thread rebuilds while the others keep answering from the previous
+    structure; only the very first build makes callers wait.
+    """
+    global _suggester, _suggester_version, _suggester_built
+    version = suggest_version()
+
+    def current():
+        return (_suggester is not None and _suggester_version == version
+                and time.monotonic() - _suggester_built < refresh_interval())
+
+    if current():
+        return _suggester
+    if _rebuild_lock.acquire(blocking=_suggester is None):
+        try:
+            if not current():
+                _suggester = Suggester(popularity_entries())
+                _suggester_version = version
+                _suggester_built = time.monotonic()
+        finally:
+            _rebuild_lock.release()
+    return _suggester
+
+
+def reset_suggester():
+    """Drops this process's suggester so the next call rebuilds it."""
+    global _suggester, _suggester_version, _suggester_built
+    with _rebuild_lock:
+        _suggester = None
+        _suggester_version = None
+        _suggester_built = None
@@ -0,0 +1,237 @@
+# python manage.py test store
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from store.models import User, Store, Product, Review
+from store.stock import rebalance, shard_totals
+
+
+class ApiTestCase(TestCase):
+    def make_stores(self, count):
+        vendor = User.objects.create_user(username=f'vendor{count}',
+                                          role=User.VENDOR)
+        buyer = User.objects.create_user(username=f'buyer{count}')
+        for i in range(count):
+            store = Store.objects.create(owner=vendor, name=f'Store {i}')
+            for j in range(3):
+                product = Product.objects.create(store=store,
+                                                 name=f'P{i}-{j}',
+                                                 price=1, stock=1)
+                Review.objects.create(product=product, user=buyer,
+                                      rating=4, comment='ok')
+
+
+class NestedApiQueryTests(ApiTestCase):
+    def test_store_list_query_count_is_constant(self):
+        self.make_stores(1)
+        with self.assertNumQueries(3):  # stores, products, reviews
+            self.client.get('/api/stores/')
+        self.make_stores(5)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/stores/')
+        stores = response.json()['results']
+        self.assertEqual(len(stores), 6)
+        self.assertEqual(len(stores[0]['products']), 3)
+        self.assertEqual(len(stores[0]['products'][0]['reviews']), 1)
+
+    def test_product_list_query_count_is_constant(self):
+        self.make_stores(4)
+        with self.assertNumQueries(3):  # products, reviews, facets
+            response = self.client.get('/api/products/')
+        self.assertEqual(len(response.json()['results']), 12)
+
+
+class PaginationFieldsetTests(ApiTestCase):
+    def test_products_are_cursor_paginated(self):
+        self.make_stores(2)
+        response = self.client.get('/api/products/', {'page_size': 4})
+        body = response.json()
+        self.assertEqual(len(body['results']), 4)
+        self.assertIn('cursor=', body['next'])
+        response = self.client.get(body['next'])
+        self.assertEqual([p['name'] for p in response.json()['results']],
+                         ['P1-1', 'P1-2'])
+
+    def test_fields_trim_output_and_select(self):
+        self.make_stores(1)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/products/',
+                                       {'fields': 'id,name,price'})
+        product = response.json()['results'][0]
+        self.assertEqual(set(product), {'id', 'name', 'price'})
+        self.assertEqual(len(ctx), 2)  # products and facets, no reviews
+        self.assertNotIn('description', ctx[0]['sql'])
+
+    def test_expand_selects_nested_relations(self):
+        self.make_stores(1)
+        response = self.client.get('/api/stores/', {'expand': 'products'})
+        product = response.json()['results'][0]['products'][0]
+        self.assertIn('name', product)
+        self.assertNotIn('reviews', product)
+        response = self.client.get('/api/stores/',
+                                   {'fields': 'id,products.name',
+                                    'expand': 'products.reviews'})
+        store = response.json()['results'][0]
+        self.assertEqual(set(store), {'id', 'products'})
+        self.assertEqual(set(store['products'][0]), {'name', 'reviews'})
+
+
+class ProductFilterFacetTests(ApiTestCase):
+    def setUp(self):
+        vendor = User.objects.create_user(username='vendor',
+                                          role=User.VENDOR)
+        self.cheap = Store.objects.create(owner=vendor, name='Cheap')
+        self.fancy = Store.objects.create(owner=vendor, name='Fancy')
+        for name, store, price, stock in (('A', self.cheap, 5, 1),
+                                          ('B', self.cheap, 20, 0),
+                                          ('C', self.fancy, 30, 2),
+                                          ('D', self.fancy, 300, 1)):
+            Product.objects.create(store=store, name=name, price=price,
+                                   stock=stock)
+
+    def get(self, **params):
+        response = self.client.get('/api/products/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def names(self, **params):
+        return [p['name'] for p in self.get(**params)['results']]
+
+    def test_filters(self):
+        self.assertEqual(self.names(store=self.cheap.id), ['A', 'B'])
+        self.assertEqual(self.names(min_price=10, max_price=30), ['B', 'C'])
+        self.assertEqual(self.names(in_stock='true'), ['A', 'C', 'D'])
+        Product.objects.filter(name='C').update(rating_count=2, rating_sum=9)
+        Product.objects.filter(name='D').update(rating_count=2, rating_sum=8)
+        self.assertEqual(self.names(min_rating='4.5'), ['C'])
+
+    def test_invalid_filter_is_400(self):
+        response = self.client.get('/api/products/', {'min_price': 'cheap'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_facets_ignore_their_own_filter(self):
+        facets = self.get(store=self.cheap.id, max_price=25)['facets']
+        self.assertEqual([(s['name'], s['count']) for s in facets['store']],
+                         [('Cheap', 2)])
+        self.assertEqual([b['count'] for b in facets['price']],
+                         [1, 1, 0, 0, 0, 0])
+        facets = self.get(in_stock='true')['facets']
+        self.assertEqual([(s['name'], s['count']) for s in facets['store']],
+                         [('Fancy', 2), ('Cheap', 1)])
+        self.assertEqual(facets['price'][-1],
+                         {'bucket': '250+', 'count': 1})
+
+
+class BulkProductApiTests(TestCase):
+    def setUp(self):
+        self.vendor = User.objects.create_user('bulkvendor', password='pw',
+                                               role=User.VENDOR)
+        self.store = Store.objects.create(owner=self.vendor, name='Mine')
+        other = User.objects.create_user('othervendor', role=User.VENDOR)
+        self.other_store = Store.objects.create(owner=other, name='Theirs')
+        self.product = Product.objects.create(store=self.store, sku='A',
+                                              name='Old', price=1, stock=1)
+        self.client.login(username='bulkvendor', password='pw')
+
+    def send(self, method, path, items):
+        return getattr(self.client, method)(
+            f'/api/products/{path}/', items, content_type='application/json')
+
+    def item(self, sku, **fields):
+        return {'store': self.store.id, 'sku': sku, 'name': sku,
+                'price': '2.50', 'stock': 3, **fields}
+
+    def test_bulk_creates_and_updates_by_sku(self):
+        response = self.send('post', 'bulk', [
+            self.item('B'), self.item('A', name='New', stock=9)])
+        self.assertEqual(response.status_code, 200, response.content)
+        results = response.json()['results']
+        self.assertEqual([(r['sku'], r['created']) for r in results],
+                         [('B', True), ('A', False)])
+        self.assertEqual(results[1]['id'], self.product.id)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.name, self.product.stock), ('New', 9))
+        self.assertTrue(Product.objects.filter(pk=results[0]['id'],
+                                               sku='B').exists())
+
+    def test_bulk_keeps_omitted_description(self):
+        self.product.description = 'Kept'
+        self.product.save()
+        self.send('post', 'bulk', [self.item('A'), self.item('N')])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.description, 'Kept')
+        self.assertEqual(Product.objects.get(sku='N').description, '')
+        self.send('post', 'bulk', [self.item('A', description='')])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.description, '')
+
+    def test_product_api_rejects_blank_sku(self):
+        response = self.client.post('/api/products/', {
+            'store': self.store.id, 'sku': '', 'name': 'Blank',
+            'price': '1.00', 'stock': 1}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('sku', response.json())
+
+    def test_bulk_writes_in_a_constant_number_of_queries(self):
+        # Small enough for sqlite to take the upsert in one statement
+        items = [self.item(f'S{i}') for i in range(40)]
+        # session, user, stores, savepoint, existing SKUs (locked),
+        # upsert, written ids, release
+        with self.assertNumQueries(8):
+            response = self.send('post', 'bulk', items)
+        self.assertEqual(len(response.json()['results']), 40)
+
+    def test_bulk_reports_errors_per_item_and_writes_nothing(self):
+        response = self.send('post', 'bulk', [
+            self.item('C'),
+            self.item('D', store=self.other_store.id),
+            self.item('C', price='free')])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertIn('store', errors[1])
+        self.assertIn('price', errors[2])
+        response = self.send('post', 'bulk', [self.item('C'), self.item('C')])
+        self.assertEqual(response.json(),
+                         [{}, {'sku': ['Repeats an earlier item.']}])
+        self.assertFalse(Product.objects.filter(sku='C').exists())
+
+    @override_settings(PRODUCT_BULK_MAX_ITEMS=2)
+    def test_bulk_limits_items(self):
+        response = self.send('post', 'bulk', [self.item(str(i))
+                                              for i in range(3)])
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_stock_sets_levels_and_respreads_shards(self):
+        sharded = Product.objects.create(store=self.store, name='Hot',
+                                         price=1, stock=8)
+        rebalance(sharded, 4)
+        response = self.send('patch', 'bulk-stock', [
+            {'id': self.product.id, 'stock': 0},
+            {'id': sharded.id, 'stock': 10}])
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['results'][1],
+                         {'id': sharded.id, 'stock': 10})
+        self.product.refresh_from_db()
+        sharded.refresh_from_db()
+        self.assertEqual((self.product.stock, sharded.stock), (0, 10))
+        self.assertEqual(shard_totals([sharded.id]), {sharded.id: 10})
+
+    def test_bulk_stock_rejects_products_of_other_stores(self):
+        theirs = Product.objects.create(store=self.other_store, name='X',
+                                        price=1, stock=5)
+        response = self.send('patch', 'bulk-stock', [
+            {'id': self.product.id, 'stock': 7},
+            {'id': theirs.id, 'stock': 0}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()[0], {})
+        self.assertIn('id', response.json()[1])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 1)
+
+    def test_bulk_endpoints_require_login(self):
+        self.client.logout()
+        self.assertEqual(self.send('post', 'bulk', []).status_code, 403)
+        self.assertEqual(self.send('patch', 'bulk-stock', []).status_code,
+                         403)
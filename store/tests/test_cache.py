@@ -0,0 +1,144 @@
+# python manage.py test store
+
+import threading
+from unittest import mock
+
+from django.urls import reverse
+from store.cache import (catalog_cache_stats, catalog_version, get_or_build,
+                         mark_stale)
+from store.checkout import place_order, reserve_cart
+from store.models import Review, StockShard
+from store.stock import rebalance
+from store.tests.test_views import BaseTestCase
+
+
+class ProductDetailCacheTests(BaseTestCase):
+    def detail(self):
+        return self.client.get(reverse('product_detail',
+                                       args=[self.product.id]))
+
+    def test_second_hit_is_served_from_cache(self):
+        self.detail()
+        with self.assertNumQueries(2):  # live stock: holds, product
+            response = self.detail()
+        self.assertContains(response, 'Test Product')
+
+    def test_stock_shown_is_net_of_holds_and_shards(self):
+        self.detail()
+        reserve_cart(self.buyer, {str(self.product.id): 10})
+        self.assertContains(self.detail(), '<strong>Stock:</strong> 90')
+        rebalance(self.product, 2)
+        StockShard.objects.filter(product=self.product).update(quantity=0)
+        self.assertContains(self.detail(), '<strong>Stock:</strong> 0')
+
+    def test_product_save_invalidates(self):
+        self.detail()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Renamed Product'
+            self.product.save()
+        self.assertContains(self.detail(), 'Renamed Product')
+
+    def test_checkout_invalidates_stock(self):
+        self.detail()
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(self.buyer, {str(self.product.id): 5})
+        self.assertContains(self.detail(), '<strong>Stock:</strong> 95')
+
+    def test_new_review_invalidates(self):
+        self.detail()
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(product=self.product, user=self.buyer,
+                                  rating=5, comment='Fresh review')
+        self.assertContains(self.detail(), 'Fresh review')
+
+    def test_reviewer_rename_invalidates(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(product=self.product, user=self.buyer,
+                                  rating=5, comment='Nice')
+        self.assertContains(self.detail(), 'buyer')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.buyer.username = 'renamed-buyer'
+            self.buyer.save()
+        self.assertContains(self.detail(), 'renamed-buyer')
+
+    def test_missing_product_is_404(self):
+        response = self.client.get(reverse('product_detail', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+
+
+class CatalogListingCacheTests(BaseTestCase):
+    def listing(self, **params):
+        return self.client.get(reverse('all_products'), params)
+
+    def test_second_hit_skips_catalog_query(self):
+        self.listing()
+        with self.assertNumQueries(0):
+            response = self.listing()
+        self.assertContains(response, 'Test Product')
+        stats = catalog_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_ratio'], 0.5)
+
+    def test_sort_is_part_of_the_key(self):
+        self.listing()
+        self.listing(sort='price')
+        self.assertEqual(catalog_cache_stats()['misses'], 2)
+
+    def test_product_change_bumps_version(self):
+        self.listing()
+        version = catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Renamed Product'
+            self.product.save()
+        self.assertGreater(catalog_version(), version)
+        self.assertContains(self.listing(), 'Renamed Product')
+
+    def test_store_change_bumps_version(self):
+        version = catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.store.name = 'Renamed Store'
+            self.store.save()
+        self.assertGreater(catalog_version(), version)
+
+    def test_metrics_endpoint(self):
+        self.listing()
+        response = self.client.get(reverse('catalog_cache_metrics'))
+        self.assertContains(response, 'catalog_cache_misses_total 1')
+
+
+class StampedeProtectionTests(BaseTestCase):
+    def test_stale_value_served_while_one_worker_rebuilds(self):
+        get_or_build('key', lambda: 'old', ttl=60)
+        mark_stale('key')
+        started, release = threading.Event(), threading.Event()
+
+        def slow_build():
+            started.set()
+            release.wait(5)
+            return 'new'
+
+        results = []
+        rebuild = threading.Thread(
+            target=lambda: results.append(get_or_build('key', slow_build,
+                                                       ttl=60)))
+        rebuild.start()
+        started.wait(5)
+        other_build = mock.Mock(return_value='duplicate')
+        self.assertEqual(get_or_build('key', other_build, ttl=60), 'old')
+        other_build.assert_not_called()
+        release.set()
+        rebuild.join()
+        self.assertEqual(results, ['new'])
+        self.assertEqual(get_or_build('key', other_build, ttl=60), 'new')
+
+    def test_value_built_across_mark_stale_is_not_cached(self):
+        def build_before_commit():
+            mark_stale('key')
+            return 'pre-commit'
+
+        self.assertEqual(get_or_build('key', build_before_commit, ttl=60),
+                         'pre-commit')
+        self.assertEqual(get_or_build('key', lambda: 'committed', ttl=60),
+                         'committed')
+        self.assertEqual(get_or_build('key', lambda: 'again', ttl=60),
+                         'committed')
@@ -0,0 +1,214 @@
+# python manage.py test store
+
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from store.cart import add_line, cart_quantities, price_cart
+from store.checkout import (CheckoutError, InsufficientStock,
+                            available_stock, place_order, reserve_cart)
+from store.models import (Cart, CartLine, Product, Order, OrderItem,
+                          StockReservation, User)
+from store.tests.test_views import BaseTestCase
+
+
+class PlaceOrderTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.products = [
+            Product.objects.create(store=self.store,
+                                   name=f'Bulk {i}',
+                                   price=5.00,
+                                   stock=10)
+            for i in range(10)
+        ]
+
+    def test_place_order_creates_items_and_decrements_stock(self):
+        cart = {str(self.product.id): 3, str(self.products[0].id): 2}
+        order = place_order(self.buyer, cart)
+        self.assertEqual(order.items.count(), 2)
+        self.product.refresh_from_db()
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.product.stock, 97)
+        self.assertEqual(self.products[0].stock, 8)
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        small = {str(self.products[0].id): 1}
+        large = {str(p.id): 1 for p in self.products}
+        with self.assertNumQueries(12):
+            place_order(self.buyer, small)
+        with self.assertNumQueries(12):
+            place_order(self.buyer, large)
+
+    def test_insufficient_stock_rolls_back(self):
+        cart = {str(self.product.id): 1, str(self.products[0].id): 11}
+        with self.assertRaises(InsufficientStock):
+            place_order(self.buyer, cart)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 100)
+
+    def test_missing_product_is_rejected(self):
+        with self.assertRaises(CheckoutError):
+            place_order(self.buyer, {'999999': 1})
+
+    def test_checkout_view_reports_insufficient_stock(self):
+        self.client.login(username='buyer', password='testpass')
+        add_line(self.buyer, self.product.id, 101)
+        response = self.client.post(reverse('checkout'))
+        self.assertContains(response, "Not enough stock for Test Product.")
+
+
+class StockReservationTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = User.objects.create_user(username='other',
+                                              password='testpass',
+                                              role=User.BUYER)
+        self.cart = {str(self.product.id): 60}
+
+    def test_reservation_holds_stock_from_other_buyers(self):
+        reserve_cart(self.buyer, self.cart)
+        self.assertEqual(available_stock([self.product.id]),
+                         {self.product.id: 40})
+        with self.assertRaises(InsufficientStock) as ctx:
+            place_order(self.other, self.cart)
+        self.assertEqual(ctx.exception.available, 40)
+        with self.assertRaises(InsufficientStock):
+            reserve_cart(self.other, self.cart)
+        place_order(self.other, {str(self.product.id): 40})
+
+    def test_order_commits_own_reservation(self):
+        reserve_cart(self.buyer, self.cart)
+        reserve_cart(self.buyer, self.cart)  # replaces, does not stack
+        self.assertEqual(StockReservation.objects.count(), 1)
+        place_order(self.buyer, self.cart)
+        self.assertFalse(StockReservation.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 40)
+
+    def test_expired_reservations_stop_counting_and_are_swept(self):
+        reserve_cart(self.buyer, self.cart, ttl=timedelta(seconds=-1))
+        reserve_cart(self.other, {str(self.product.id): 1})
+        self.assertEqual(available_stock([self.product.id]),
+                         {self.product.id: 99})
+        out = StringIO()
+        call_command('expire_reservations', stdout=out)
+        self.assertIn('Expired 1 reservations.', out.getvalue())
+        self.assertEqual(list(StockReservation.objects
+                              .values_list('user__username', flat=True)),
+                         ['other'])
+        self.assertGreater(StockReservation.objects.get().expires_at,
+                           timezone.now())
+
+    def test_checkout_review_reserves_cart(self):
+        self.client.login(username='buyer', password='testpass')
+        add_line(self.buyer, self.product.id, 60)
+        response = self.client.get(reverse('checkout_review'))
+        self.assertRedirects(response, reverse('view_cart'))
+        self.assertFalse(StockReservation.objects.exists())
+        response = self.client.post(reverse('checkout_review'), follow=True)
+        self.assertContains(response, 'reserved for you until')
+        self.assertEqual(StockReservation.objects.get().quantity, 60)
+        add_line(self.buyer, self.product.id, 1)
+        response = self.client.get(reverse('checkout_review'))
+        self.assertRedirects(response, reverse('view_cart'))
+        self.client.get(reverse('remove_from_cart', args=[self.product.id]))
+        self.assertFalse(StockReservation.objects.exists())
+
+
+class PriceCartTests(BaseTestCase):
+    def test_price_cart_uses_one_query(self):
+        other = Product.objects.create(store=self.store, name='Other',
+                                       price='2.50', stock=1)
+        cart = {str(self.product.id): 2, str(other.id): 3}
+        with self.assertNumQueries(1):
+            priced = price_cart(cart)
+        self.assertEqual(priced.total, Decimal('27.50'))
+        self.assertEqual([line['subtotal'] for line in priced.lines],
+                         [Decimal('20.00'), Decimal('7.50')])
+
+    def test_view_cart_drops_deleted_products(self):
+        other = Product.objects.create(store=self.store, name='Other',
+                                       price='2.50', stock=1)
+        add_line(self.buyer, self.product.id)
+        add_line(self.buyer, other.id, 4)
+        other.delete()
+        self.client.login(username='buyer', password='testpass')
+        response = self.client.get(reverse('view_cart'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Total: $10.00')
+        self.assertEqual(cart_quantities(self.buyer), {self.product.id: 1})
+
+
+class CartTests(BaseTestCase):
+    def test_cart_mutations_write_one_row(self):
+        add_line(self.buyer, self.product.id)
+        self.client.login(username='buyer', password='testpass')
+        with self.assertNumQueries(1):
+            add_line(self.buyer, self.product.id, 2)
+        self.assertEqual(cart_quantities(self.buyer), {self.product.id: 3})
+        self.client.post(reverse('update_cart_quantity',
+                                 args=[self.product.id]), {'quantity': 5})
+        self.assertEqual(CartLine.objects.get().quantity, 5)
+        self.client.post(reverse('update_cart_quantity',
+                                 args=[self.product.id]), {'quantity': 0})
+        self.assertFalse(CartLine.objects.exists())
+
+    def test_session_cart_is_merged_at_login(self):
+        other = Product.objects.create(store=self.store, name='Other',
+                                       price='2.50', stock=1)
+        add_line(self.buyer, self.product.id, 2)
+        self.client.get(reverse('add_to_cart', args=[self.product.id]))
+        self.client.get(reverse('add_to_cart', args=[other.id]))
+        self.assertEqual(self.client.session['cart'],
+                         {str(self.product.id): 1, str(other.id): 1})
+        self.client.login(username='buyer', password='testpass')
+        self.assertEqual(cart_quantities(self.buyer),
+                         {self.product.id: 3, other.id: 1})
+        self.assertNotIn('cart', self.client.session)
+
+    def test_concurrent_adds_of_a_new_product_both_count(self):
+        other = Product.objects.create(store=self.store, name='Other',
+                                       price='2.50', stock=5)
+        add_line(self.buyer, self.product.id)
+
+        def add_concurrently(*args, **kwargs):
+            # Another request inserts the line after this one's UPDATE
+            CartLine.objects.create(cart_id=self.buyer.pk,
+                                    product_id=other.id, quantity=1)
+
+        with mock.patch.object(Cart.objects, 'bulk_create',
+                               side_effect=add_concurrently):
+            add_line(self.buyer, other.id)
+        self.assertEqual(cart_quantities(self.buyer)[other.id], 2)
+
+    def test_session_cart_of_signed_in_user_is_merged(self):
+        add_line(self.buyer, self.product.id)
+        self.client.login(username='buyer', password='testpass')
+        session = self.client.session
+        session['cart'] = {str(self.product.id): 2}
+        session.save()
+        response = self.client.get(reverse('view_cart'))
+        self.assertEqual(response.context['cart_items'][0]['quantity'], 3)
+        self.assertNotIn('cart', self.client.session)
+
+    def test_checkout_empties_cart(self):
+        add_line(self.buyer, self.product.id)
+        self.client.login(username='buyer', password='testpass')
+        self.client.post(reverse('checkout'))
+        self.assertEqual(Order.objects.get().items.get().quantity, 1)
+        self.assertEqual(cart_quantities(self.buyer), {})
+
+    def test_checkout_get_places_no_order(self):
+        add_line(self.buyer, self.product.id)
+        self.client.login(username='buyer', password='testpass')
+        response = self.client.get(reverse('checkout'))
+        self.assertRedirects(response, reverse('checkout_review'),
+                             fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
@@ -0,0 +1,51 @@
+# python manage.py test store
+
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.urls import reverse
+from store.cart import add_line
+from store.models import QueuedEmail
+from store.tests.test_views import BaseTestCase
+
+
+class QueuedEmailTests(BaseTestCase):
+    def test_checkout_queues_invoice_instead_of_sending(self):
+        self.buyer.email = 'buyer@example.com'
+        self.buyer.save()
+        self.client.login(username='buyer', password='testpass')
+        add_line(self.buyer, self.product.id)
+        response = self.client.post(reverse('checkout'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        queued = QueuedEmail.objects.get()
+        self.assertEqual(queued.to, ['buyer@example.com'])
+
+    def test_worker_sends_batch_over_one_connection(self):
+        for i in range(3):
+            QueuedEmail.objects.create(subject=f'Invoice {i}', body='Thanks',
+                                       from_email='shop@example.com',
+                                       to=['buyer@example.com'])
+        with mock.patch('store.management.commands.send_queued_emails'
+                        '.get_connection',
+                        wraps=mail.get_connection) as get_connection:
+            call_command('send_queued_emails', stdout=StringIO())
+        get_connection.assert_called_once()
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(
+            QueuedEmail.objects.exclude(status=QueuedEmail.SENT).exists())
+
+    def test_worker_retries_when_smtp_is_down(self):
+        email = QueuedEmail.objects.create(subject='Invoice', body='Thanks',
+                                           from_email='shop@example.com',
+                                           to=['buyer@example.com'])
+        with mock.patch('store.management.commands.send_queued_emails'
+                        '.get_connection',
+                        side_effect=OSError('connection refused')):
+            call_command('send_queued_emails', stdout=StringIO())
+        email.refresh_from_db()
+        self.assertEqual(email.status, QueuedEmail.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.last_error, 'connection refused')
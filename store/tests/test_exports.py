@@ -0,0 +1,73 @@
+# python manage.py test store
+
+import csv
+import io
+import json
+
+from django.urls import reverse
+from store.checkout import place_order
+from store.exports import PRODUCT_EXPORT_COLUMNS, export_rows
+from store.models import Product
+from store.stock import current_stock, rebalance
+from store.tests.test_views import BaseTestCase
+
+
+class StoreExportTests(BaseTestCase):
+    def export(self, dataset, fmt):
+        response = self.client.get(reverse('export_store',
+                                           args=[self.store.id, dataset, fmt]))
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_products_csv(self):
+        Product.objects.create(store=self.store, name='Comma, "quoted"',
+                               price='2.50', stock=3)
+        self.client.login(username='vendor', password='testpass')
+        rows = list(csv.DictReader(io.StringIO(self.export('products',
+                                                           'csv'))))
+        self.assertEqual([row['name'] for row in rows],
+                         ['Test Product', 'Comma, "quoted"'])
+        self.assertEqual(rows[1]['price'], '2.50')
+
+    def test_products_export_sharded_stock(self):
+        rebalance(self.product, 4)
+        place_order(self.buyer, {str(self.product.id): 5})
+        self.client.login(username='vendor', password='testpass')
+        rows = list(csv.DictReader(io.StringIO(self.export('products',
+                                                           'csv'))))
+        self.assertEqual(rows[0]['stock'], '95')
+
+    def test_orders_jsonl(self):
+        order = place_order(self.buyer, {str(self.product.id): 2})
+        self.client.login(username='vendor', password='testpass')
+        rows = [json.loads(line) for line in
+                self.export('orders', 'jsonl').splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['order_id'], order.id)
+        self.assertEqual(rows[0]['buyer'], 'buyer')
+        self.assertEqual(rows[0]['quantity'], 2)
+        self.assertEqual(rows[0]['price'], '10.00')
+
+    def test_export_pages_by_primary_key(self):
+        for i in range(4):
+            Product.objects.create(store=self.store, name=f'P{i}',
+                                   price=1, stock=1)
+        with self.assertNumQueries(3):
+            rows = list(export_rows(
+                Product.objects.annotate(current_stock=current_stock()),
+                PRODUCT_EXPORT_COLUMNS, chunk_size=2))
+        self.assertEqual([row[0] for row in rows],
+                         list(Product.objects.order_by('pk')
+                              .values_list('pk', flat=True)))
+
+    def test_only_owner_can_export(self):
+        self.client.login(username='buyer', password='testpass')
+        response = self.client.get(reverse('export_store',
+                                           args=[self.store.id, 'orders',
+                                                 'csv']))
+        self.assertEqual(response.status_code, 404)
+        self.client.login(username='vendor', password='testpass')
+        response = self.client.get(reverse('export_store',
+                                           args=[self.store.id, 'orders',
+                                                 'xml']))
+        self.assertEqual(response.status_code, 404)
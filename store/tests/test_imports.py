@@ -0,0 +1,129 @@
+# python manage.py test store
+
+import csv
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from store.imports import import_products, read_rows
+from store.models import Product, TweetOutbox, User
+from store.tests.test_views import BaseTestCase
+
+
+class ProductImportTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product.sku = 'EXIST'
+        self.product.save()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', newline='') as fh:
+            fh.write(text)
+        return path
+
+    def products(self):
+        return {p.sku: (p.name, p.price, p.stock)
+                for p in Product.objects.filter(store=self.store)}
+
+    def test_csv_import_upserts_by_sku_and_reports_rejects(self):
+        path = self.write('products.csv',
+                          'sku,name,price,stock,description\n'
+                          'EXIST,Renamed,12.50,7,\n'
+                          'NEW-1,Lamp,3.00,4,Bright\n'
+                          'NEW-2,Mug,cheap,4,\n'
+                          ',No SKU,1.00,1,\n'
+                          'NEW-3,Chair,20,2,\n')
+        out = StringIO()
+        call_command('import_products', self.store.id, path, chunk_size=2,
+                     stdout=out)
+        self.assertIn('Imported 3 products', out.getvalue())
+        self.assertIn('Rejected 2 rows', out.getvalue())
+        self.assertEqual(self.products(), {
+            'EXIST': ('Renamed', Decimal('12.50'), 7),
+            'NEW-1': ('Lamp', Decimal('3.00'), 4),
+            'NEW-3': ('Chair', Decimal('20.00'), 2),
+        })
+        self.assertFalse(TweetOutbox.objects.exists())
+
+        with open(path + '.rejects.csv', newline='') as fh:
+            rejects = list(csv.DictReader(fh))
+        self.assertEqual([r['line'] for r in rejects], ['4', '5'])
+        self.assertIn('price', rejects[0]['errors'])
+        self.assertIn('sku', rejects[1]['errors'])
+
+    def test_jsonl_import_keeps_last_row_of_repeated_sku(self):
+        path = self.write('products.jsonl',
+                          '{"sku": "A", "name": "First", "price": 1, '
+                          '"stock": 1}\n'
+                          'not json\n'
+                          '{"sku": "A", "name": "Second", "price": "2.00", '
+                          '"stock": 5}\n')
+        call_command('import_products', self.store.id, path,
+                     stdout=StringIO())
+        self.assertEqual(self.products()['A'],
+                         ('Second', Decimal('2.00'), 5))
+        with open(path + '.rejects.jsonl') as fh:
+            reject = json.loads(fh.readline())
+        self.assertEqual(reject['line'], 2)
+        self.assertEqual(reject['errors'], 'Invalid JSON.')
+
+    def test_chunk_is_one_upsert(self):
+        rows = [{'sku': f'S{i}', 'name': f'P{i}', 'price': '1.00',
+                 'stock': '1'} for i in range(50)]
+        # savepoint, upsert, release, ids of the products to invalidate
+        with self.assertNumQueries(4):
+            result = import_products(self.store,
+                                     read_rows(StringIO('\n'.join(
+                                         json.dumps(r) for r in rows)),
+                                         'jsonl'))
+        self.assertEqual(result.imported, 50)
+
+    def test_admin_action_returns_rejects(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.login(username='admin', password='pw')
+        upload = SimpleUploadedFile('products.csv',
+                                    b'sku,name,price,stock\n'
+                                    b'NEW,Lamp,3.00,4\n'
+                                    b'BAD,Mug,oops,4\n')
+        response = self.client.post(
+            reverse('admin:store_store_changelist'),
+            {'action': 'import_products_from_file', 'apply': '1',
+             '_selected_action': [self.store.pk], 'file': upload})
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename="rejects.csv"')
+        self.assertIn(b'BAD', response.content)
+        self.assertIn('NEW', self.products())
+
+    def test_admin_action_reports_file_that_is_not_utf8(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.login(username='admin', password='pw')
+        upload = SimpleUploadedFile('products.csv',
+                                    b'sku,name,price,stock\n'
+                                    b'NEW,L\xe4mp,3.00,4\n')
+        response = self.client.post(
+            reverse('admin:store_store_changelist'),
+            {'action': 'import_products_from_file', 'apply': '1',
+             '_selected_action': [self.store.pk], 'file': upload},
+            follow=True)
+        self.assertContains(response, 'Could not read products.csv')
+        self.assertNotIn('NEW', self.products())
+
+    def test_command_reports_unreadable_file(self):
+        path = os.path.join(self.tmp.name, 'products.csv')
+        with open(path, 'wb') as fh:
+            fh.write(b'sku,name,price,stock\nNEW,L\xe4mp,3.00,4\n')
+        with self.assertRaisesMessage(CommandError, 'Could not read'):
+            call_command('import_products', self.store.pk, path,
+                         stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, 'Could not open'):
+            call_command('import_products', self.store.pk,
+                         os.path.join(self.tmp.name, 'missing.csv'),
+                         stdout=StringIO())
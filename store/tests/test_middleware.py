@@ -0,0 +1,41 @@
+# python manage.py test store
+
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from store.middleware import QueryCountMiddleware, sql_shape
+from store.models import Product
+from store.tests.test_views import BaseTestCase
+
+
+class QueryCountMiddlewareTests(BaseTestCase):
+    def test_sql_shape_ignores_literals(self):
+        self.assertEqual(
+            sql_shape("SELECT * FROM t WHERE id = 1 AND name = 'x'"),
+            sql_shape("SELECT * FROM t WHERE id = 22 AND name = 'y'"))
+        self.assertEqual(sql_shape('WHERE id IN (%s, %s, %s)'),
+                         'WHERE id IN (...)')
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('home'))
+        self.assertRegex(response['Server-Timing'],
+                         r'db;dur=[\d.]+;desc="\d+ queries"')
+
+    def test_logs_structured_line(self):
+        with self.assertLogs('store.queries', 'INFO') as logs:
+            self.client.get(reverse('home'))
+        self.assertIn('url_name=home', logs.output[0])
+        self.assertEqual(logs.records[0].status, 200)
+
+    @override_settings(QUERY_N_PLUS_ONE_THRESHOLDS={'/loop/': 2})
+    def test_flags_repeated_statements(self):
+        def n_plus_one_view(request):
+            for product_id in range(3):
+                Product.objects.filter(id=product_id).exists()
+            return HttpResponse()
+
+        middleware = QueryCountMiddleware(n_plus_one_view)
+        with self.assertLogs('store.queries', 'WARNING') as logs:
+            middleware(RequestFactory().get('/loop/'))
+        self.assertIn('Possible N+1 in /loop/: statement ran 3 times',
+                      logs.output[0])
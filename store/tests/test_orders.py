@@ -0,0 +1,100 @@
+# python manage.py test store
+
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+from store.checkout import place_order
+from django.test import override_settings
+from store.models import Order, OrderItem, Product, Store, VendorOrderSummary
+from store.tests.test_views import BaseTestCase
+
+
+class OrderTotalTests(BaseTestCase):
+    def test_checkout_stores_total_and_status(self):
+        order = place_order(self.buyer, {str(self.product.id): 3})
+        order.refresh_from_db()
+        self.assertEqual(order.total, Decimal('30.00'))
+        self.assertEqual(order.status, Order.PLACED)
+
+    def test_backfill_order_totals(self):
+        orders = [Order.objects.create(user=self.buyer) for _ in range(3)]
+        for order in orders[:2]:
+            OrderItem.objects.create(order=order, product=self.product,
+                                     quantity=2, price='4.25')
+        call_command('backfill_order_totals', batch_size=2,
+                     stdout=StringIO())
+        totals = dict(Order.objects.values_list('pk', 'total'))
+        self.assertEqual(totals[orders[0].pk], Decimal('8.50'))
+        self.assertEqual(totals[orders[1].pk], Decimal('8.50'))
+        self.assertEqual(totals[orders[2].pk], Decimal('0.00'))
+
+    def test_order_history_renders_in_constant_queries(self):
+        self.client.login(username='buyer', password='testpass')
+        for _ in range(5):
+            Order.objects.create(user=self.buyer, total='12.00')
+        with self.assertNumQueries(3):  # session, user, orders
+            response = self.client.get(reverse('order_history'))
+        self.assertContains(response, '$12.00', count=5)
+
+
+class VendorOrderSummaryTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_store = Store.objects.create(owner=self.vendor,
+                                                name='Second Store')
+        self.other = Product.objects.create(store=self.other_store,
+                                            name='Other', price='2.50',
+                                            stock=10)
+
+    def test_checkout_writes_one_summary_per_store(self):
+        order = place_order(self.buyer, {str(self.product.id): 3,
+                                         str(self.other.id): 2})
+        summaries = {s.store_id: s for s in
+                     VendorOrderSummary.objects.filter(order=order)}
+        self.assertEqual(summaries[self.store.id].subtotal, Decimal('30.00'))
+        self.assertEqual(summaries[self.store.id].item_count, 3)
+        self.assertEqual(summaries[self.other_store.id].subtotal,
+                         Decimal('5.00'))
+        self.assertEqual(summaries[self.other_store.id].buyer_name, 'buyer')
+        self.assertEqual(summaries[self.other_store.id].vendor, self.vendor)
+
+        order.status = Order.SHIPPED
+        order.save()
+        self.assertEqual(set(VendorOrderSummary.objects
+                             .values_list('status', flat=True)),
+                         {Order.SHIPPED})
+
+    def test_backfill_matches_checkout(self):
+        place_order(self.buyer, {str(self.product.id): 1,
+                                 str(self.other.id): 4})
+        expected = list(VendorOrderSummary.objects.order_by('store_id')
+                        .values_list('store_id', 'item_count', 'subtotal'))
+        VendorOrderSummary.objects.all().delete()
+        out = StringIO()
+        call_command('backfill_vendor_order_summaries', stdout=out)
+        call_command('backfill_vendor_order_summaries', stdout=StringIO())
+        self.assertIn('for 1 orders', out.getvalue())
+        self.assertEqual(list(VendorOrderSummary.objects.order_by('store_id')
+                              .values_list('store_id', 'item_count',
+                                           'subtotal')), expected)
+
+    @override_settings(VENDOR_ORDER_PAGE_SIZE=2)
+    def test_vendor_orders_pages_through_summaries(self):
+        orders = [place_order(self.buyer, {str(self.product.id): 1})
+                  for _ in range(3)]
+        self.client.login(username='vendor', password='testpass')
+        # session, user, summaries, and the store menu of the base template
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('vendor_orders'))
+        self.assertEqual([s.order_id for s in response.context['summaries']],
+                         [orders[2].pk, orders[1].pk])
+        response = self.client.get(reverse('vendor_orders'),
+                                   {'after': response.context['next_cursor']})
+        self.assertEqual([s.order_id for s in response.context['summaries']],
+                         [orders[0].pk])
+        self.assertIsNone(response.context['next_cursor'])
+        response = self.client.get(reverse('vendor_orders'),
+                                   {'after': 'garbage'})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,116 @@
+# python manage.py test store
+
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from functions.tweet import CircuitOpenError, Tweet
+from store.models import TweetOutbox, TwitterCredential
+from store.tests.test_views import BaseTestCase
+
+
+class TweetOutboxTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.credential = TwitterCredential.store(self.vendor, 't')
+
+    def login_with_twitter(self):
+        self.client.login(username='vendor', password='testpass')
+        session = self.client.session
+        session['twitter_access_token'] = 'token'
+        session.save()
+
+    @mock.patch.object(Tweet, 'make_tweet')
+    def test_create_product_queues_tweet_without_posting(self, make_tweet):
+        self.login_with_twitter()
+        response = self.client.post(
+            reverse('create_product', args=[self.store.id]),
+            {'name': 'Queued Product', 'price': 20, 'stock': 5}
+        )
+        self.assertContains(response, 'queued for Twitter')
+        make_tweet.assert_not_called()
+        tweet = TweetOutbox.objects.get()
+        self.assertIn('Queued Product', tweet.text)
+        self.assertEqual(tweet.credential.access_token, 'token')
+        self.assertEqual(tweet.credential, self.vendor.twitter_credential)
+
+    def test_create_store_without_twitter_queues_nothing(self):
+        self.client.login(username='vendor', password='testpass')
+        self.client.post(reverse('create_store'), {'name': 'Quiet Store'})
+        self.assertFalse(TweetOutbox.objects.exists())
+
+    @mock.patch.object(Tweet, 'make_tweet')
+    def test_worker_posts_due_tweets(self, make_tweet):
+        TweetOutbox.objects.create(text='one', credential=self.credential)
+        TweetOutbox.objects.create(text='two', credential=self.credential)
+        call_command('drain_tweet_outbox', stdout=StringIO())
+        self.assertEqual(make_tweet.call_count, 2)
+        self.assertEqual(make_tweet.call_args.args[1], 't')
+        self.assertEqual(
+            TweetOutbox.objects.filter(status=TweetOutbox.SENT,
+                                       credential=None).count(), 2)
+
+    @mock.patch.object(Tweet, 'make_tweet')
+    def test_worker_drops_tokens_of_rows_queued_without_a_vendor(
+            self, make_tweet):
+        orphan = TwitterCredential.objects.create(access_token='old')
+        TweetOutbox.objects.create(text='old', credential=orphan)
+        call_command('drain_tweet_outbox', stdout=StringIO())
+        make_tweet.assert_called_once_with({'text': 'old'}, 'old')
+        self.assertFalse(TwitterCredential.objects.filter(
+            pk=orphan.pk).exists())
+        self.assertTrue(TwitterCredential.objects.filter(
+            pk=self.credential.pk).exists())
+
+    @mock.patch.object(Tweet, 'make_tweet', side_effect=Exception('503'))
+    def test_worker_backs_off_then_gives_up(self, make_tweet):
+        tweet = TweetOutbox.objects.create(text='flaky',
+                                           credential=self.credential)
+        call_command('drain_tweet_outbox', stdout=StringIO())
+        tweet.refresh_from_db()
+        self.assertEqual(tweet.status, TweetOutbox.PENDING)
+        self.assertEqual(tweet.attempts, 1)
+        self.assertGreater(tweet.next_attempt_at, timezone.now())
+        self.assertEqual(tweet.last_error, '503')
+
+        TweetOutbox.objects.update(next_attempt_at=timezone.now())
+        call_command('drain_tweet_outbox', max_attempts=2,
+                     stdout=StringIO())
+        tweet.refresh_from_db()
+        self.assertEqual(tweet.status, TweetOutbox.FAILED)
+
+    @mock.patch.object(Tweet, 'make_tweet',
+                       side_effect=CircuitOpenError('circuit is open'))
+    def test_open_circuit_does_not_use_up_attempts(self, make_tweet):
+        tweet = TweetOutbox.objects.create(text='later',
+                                           credential=self.credential)
+        for _ in range(3):
+            TweetOutbox.objects.update(next_attempt_at=timezone.now())
+            call_command('drain_tweet_outbox', max_attempts=2,
+                         stdout=StringIO())
+        tweet.refresh_from_db()
+        self.assertEqual((tweet.status, tweet.attempts),
+                         (TweetOutbox.PENDING, 0))
+        self.assertGreater(tweet.next_attempt_at, timezone.now())
+
+    def test_worker_reports_metrics_to_staff_endpoint(self):
+        client = Tweet()
+        client.metrics.collect()
+        response = mock.Mock(status_code=201)
+        response.json.return_value = {'data': {'id': '1'}}
+        TweetOutbox.objects.create(text='counted',
+                                   credential=self.credential)
+        with mock.patch.object(client.session, 'post',
+                               return_value=response):
+            call_command('drain_tweet_outbox', stdout=StringIO())
+
+        self.client.login(username='vendor', password='testpass')
+        self.assertEqual(
+            self.client.get(reverse('twitter_metrics')).status_code, 302)
+        self.vendor.is_staff = True
+        self.vendor.save()
+        response = self.client.get(reverse('twitter_metrics'))
+        self.assertContains(response, 'tweet_requests_total 1')
+        self.assertContains(response, 'tweet_circuit_open 0')
@@ -0,0 +1,61 @@
+# python manage.py test store
+
+from django.test import override_settings
+from django.urls import reverse
+from store.models import Product
+from store.pagination import keyset_page
+from store.tests.test_views import BaseTestCase
+
+
+class KeysetPaginationTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        # Duplicate prices make the id tie-breaker matter
+        Product.objects.bulk_create([
+            Product(store=self.store, name=f'Item {i}',
+                    price=i % 3 + 1, stock=1)
+            for i in range(9)
+        ])
+
+    def test_walks_every_product_once_in_price_order(self):
+        seen = []
+        cursor = None
+        while True:
+            page = keyset_page(Product.objects.all(), ('price', 'id'),
+                               cursor, page_size=4)
+            seen.extend(page.object_list)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual([p.pk for p in seen],
+                         list(Product.objects.order_by('price', 'id')
+                              .values_list('pk', flat=True)))
+
+    def test_deep_page_costs_one_query(self):
+        first = keyset_page(Product.objects.all(), ('id',), page_size=2)
+        with self.assertNumQueries(1):
+            keyset_page(Product.objects.all(), ('id',),
+                        first.next_cursor, page_size=2)
+
+    @override_settings(CATALOG_PAGE_SIZE=4)
+    def test_all_products_links_next_page(self):
+        response = self.client.get(reverse('all_products'),
+                                   {'sort': 'price'})
+        self.assertEqual(len(response.context['products']), 4)
+        self.assertContains(response, 'after=' +
+                            response.context['next_cursor'])
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get(reverse('home'), {'after': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('home'), {'after': 'x y\n' * 200})
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(CATALOG_PAGE_SIZE=4)
+    def test_cursor_is_cached_by_its_value(self):
+        cursor = self.client.get(reverse('home')).context['next_cursor']
+        self.client.get(reverse('home'), {'after': cursor})
+        padded = cursor + '=' * (-len(cursor) % 4)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'), {'after': padded})
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,106 @@
+# python manage.py test store
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+from store.cache import catalog_version
+from store.models import Product, Review, User
+from store.tests.test_views import BaseTestCase
+
+
+class RatingAggregateTests(BaseTestCase):
+    def review(self, rating, username='reviewer', product=None):
+        user, _ = User.objects.get_or_create(username=username)
+        return Review.objects.create(product=product or self.product,
+                                     user=user, rating=rating,
+                                     comment='ok')
+
+    def assertRatings(self, count, total, histogram):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_count, count)
+        self.assertEqual(self.product.rating_sum, total)
+        self.assertEqual(self.product.rating_histogram, histogram)
+
+    def test_create_update_delete_keep_aggregates(self):
+        first = self.review(5)
+        self.review(3, 'other')
+        self.assertRatings(2, 8, {1: 0, 2: 0, 3: 1, 4: 0, 5: 1})
+        self.assertEqual(self.product.average_rating, 4.0)
+        first.rating = 1
+        first.save()
+        self.assertRatings(2, 4, {1: 1, 2: 0, 3: 1, 4: 0, 5: 0})
+        first.delete()
+        self.assertRatings(1, 3, {1: 0, 2: 0, 3: 1, 4: 0, 5: 0})
+
+    def test_api_review_updates_aggregates(self):
+        self.client.login(username='buyer', password='testpass')
+        response = self.client.post('/api/reviews/', {
+            'product': self.product.id, 'user': self.buyer.id,
+            'rating': 4, 'comment': 'Nice'})
+        self.assertEqual(response.status_code, 201)
+        self.assertRatings(1, 4, {1: 0, 2: 0, 3: 0, 4: 1, 5: 0})
+        self.client.delete(f"/api/reviews/{response.json()['id']}/")
+        self.assertRatings(0, 0, {1: 0, 2: 0, 3: 0, 4: 0, 5: 0})
+
+    def test_rebuild_command_recomputes_from_reviews(self):
+        self.review(4)
+        self.review(2, 'other')
+        unreviewed = Product.objects.create(store=self.store, name='New',
+                                            price=1, stock=1)
+        Product.objects.update(rating_count=99, rating_sum=7, rating_5=3)
+        version = catalog_version()
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_product_ratings', batch_size=1,
+                         stdout=out)
+        self.assertIn('1 reviewed products (2 corrected)', out.getvalue())
+        self.assertRatings(2, 6, {1: 0, 2: 1, 3: 0, 4: 1, 5: 0})
+        unreviewed.refresh_from_db()
+        self.assertEqual((unreviewed.rating_count, unreviewed.rating_5),
+                         (0, 0))
+        self.assertGreater(catalog_version(), version)
+
+    def test_listing_shows_ratings_without_extra_queries(self):
+        self.review(5)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('all_products'))
+        self.assertContains(response, '5.0')
+
+
+class ReviewStreamTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(25):
+            user = User.objects.create_user(username=f'reviewer{i}')
+            Review.objects.create(product=self.product, user=user,
+                                  rating=i % 5 + 1, comment=f'Review {i}',
+                                  verified_purchase=i % 2 == 0)
+
+    def test_product_detail_renders_first_page_in_constant_queries(self):
+        url = reverse('product_detail', args=[self.product.id])
+        # product, reviews joined to users, then live stock: holds, product
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['reviews']), 10)
+        self.assertContains(response, 'Load more reviews')
+
+    def test_load_more_walks_all_reviews_newest_first(self):
+        url = reverse('product_reviews', args=[self.product.id])
+        comments, cursor = [], None
+        while True:
+            params = {'after': cursor} if cursor else {}
+            page = self.client.get(url, params).json()
+            comments += [review['comment'] for review in page['results']]
+            cursor = page['next']
+            if not cursor:
+                break
+        self.assertEqual(comments, [f'Review {i}' for i in range(24, -1, -1)])
+
+    def test_load_more_filters(self):
+        url = reverse('product_reviews', args=[self.product.id])
+        page = self.client.get(url, {'rating': 5, 'verified': 1}).json()
+        self.assertTrue(page['results'])
+        for review in page['results']:
+            self.assertEqual(review['rating'], 5)
+            self.assertTrue(review['verified_purchase'])
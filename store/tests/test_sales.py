@@ -0,0 +1,94 @@
+# python manage.py test store
+
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.utils import timezone
+from store.checkout import place_order
+from store.models import DailyStoreSales, Order, Product, Store
+from store.rollups import rebuild_daily_sales
+from store.tests.test_views import BaseTestCase
+
+
+class DailyStoreSalesTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_store = Store.objects.create(owner=self.vendor,
+                                                name='Second Store')
+        self.other = Product.objects.create(store=self.other_store,
+                                            name='Other', price='2.50',
+                                            stock=10)
+        self.today = timezone.localdate()
+
+    def rollup(self):
+        return {(row.store_id, row.date): (row.units, row.revenue, row.orders)
+                for row in DailyStoreSales.objects.all()}
+
+    def test_checkout_increments_rollup(self):
+        place_order(self.buyer, {str(self.product.id): 2,
+                                 str(self.other.id): 1})
+        place_order(self.buyer, {str(self.product.id): 1})
+        self.assertEqual(self.rollup(), {
+            (self.store.id, self.today): (3, Decimal('30.00'), 2),
+            (self.other_store.id, self.today): (1, Decimal('2.50'), 1),
+        })
+
+    def test_rebuild_matches_checkout(self):
+        place_order(self.buyer, {str(self.product.id): 2,
+                                 str(self.other.id): 1})
+        old = place_order(self.buyer, {str(self.product.id): 1})
+        Order.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - timedelta(days=3))
+        DailyStoreSales.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_sales_rollups', chunk_days=2, stdout=out)
+        self.assertIn('Rebuilt 3 daily sales rows', out.getvalue())
+        self.assertEqual(self.rollup(), {
+            (self.store.id, self.today): (2, Decimal('20.00'), 1),
+            (self.store.id, self.today - timedelta(days=3)):
+                (1, Decimal('10.00'), 1),
+            (self.other_store.id, self.today): (1, Decimal('2.50'), 1),
+        })
+
+        # Rebuilding one store's day leaves the others alone
+        call_command('rebuild_sales_rollups', stores=[self.other_store.id],
+                     start=self.today, stdout=StringIO())
+        self.assertEqual(len(self.rollup()), 3)
+
+    def test_rebuild_zeroes_rows_instead_of_deleting(self):
+        yesterday = self.today - timedelta(days=1)
+        DailyStoreSales.objects.create(store=self.store, date=yesterday,
+                                       units=5, revenue=50, orders=1)
+        written = rebuild_daily_sales(yesterday, self.today)
+        self.assertEqual(written, 0)
+        # Today's rows exist for every store, for orders placed meanwhile
+        self.assertEqual(self.rollup(), {
+            (self.store.id, yesterday): (0, Decimal('0.00'), 0),
+            (self.store.id, self.today): (0, Decimal('0.00'), 0),
+            (self.other_store.id, self.today): (0, Decimal('0.00'), 0),
+        })
+        place_order(self.buyer, {str(self.product.id): 1})
+        self.assertEqual(self.rollup()[self.store.id, self.today],
+                         (1, Decimal('10.00'), 1))
+
+    def test_sales_endpoint_reads_rollup(self):
+        place_order(self.buyer, {str(self.product.id): 2})
+        url = f'/api/stores/{self.store.id}/sales/'
+        self.client.login(username='vendor', password='testpass')
+        start = self.today - timedelta(days=2)
+        with self.assertNumQueries(4):  # session, user, store, rollup
+            response = self.client.get(url, {'from': start.isoformat()})
+        data = response.json()
+        self.assertEqual(data['totals'],
+                         {'units': 2, 'revenue': '20.00', 'orders': 1})
+        self.assertEqual([day['units'] for day in data['series']], [0, 0, 2])
+        self.assertEqual(data['series'][-1]['date'], self.today.isoformat())
+
+        self.assertEqual(self.client.get(url, {'from': 'soon'}).status_code,
+                         400)
+        self.assertEqual(self.client.get(url, {'from': '2000-01-01'})
+                         .status_code, 400)
+        self.client.login(username='buyer', password='testpass')
+        self.assertEqual(self.client.get(url).status_code, 403)
@@ -0,0 +1,129 @@
+# python manage.py test store
+
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from store import search
+from store.imports import upsert_products
+from store.models import Product
+from store.search import SearchIndex, tokenize
+from store.tests.test_views import BaseTestCase
+
+
+class SearchIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = SearchIndex.build([
+            (1, 'Bluetooth Speaker', 'Portable speaker with deep bass'),
+            (2, 'Blue Mug', 'A ceramic mug for coffee'),
+            (3, 'Coffee Grinder', 'Grinds coffee beans, coffee lovers'),
+        ])
+
+    def ids(self, query, **kwargs):
+        return [pid for pid, _ in self.index.search(query, **kwargs)]
+
+    def test_tokenize_drops_stop_words_and_punctuation(self):
+        self.assertEqual(tokenize('The Mug, for COFFEE!'), ['mug', 'coffee'])
+
+    def test_bm25_ranks_higher_term_frequency_first(self):
+        self.assertEqual(self.ids('coffee'), [3, 2])
+
+    def test_more_matching_terms_rank_higher(self):
+        self.assertEqual(self.ids('blue mug')[0], 2)
+
+    def test_prefix_matches_last_term(self):
+        self.assertEqual(sorted(self.ids('blu')), [1, 2])
+        self.assertEqual(self.ids('blu', prefix=False), [])
+
+    def test_prefix_expands_to_most_common_words(self):
+        index = SearchIndex()
+        index.prefix_expansions = 2
+        index.add(1, 'blue', 'blur')
+        index.add(2, 'blues', 'blur')
+        index.add(3, 'blu', 'bluish')
+        self.assertEqual(index.expand('blu'), ['blu', 'blur'])
+
+    def test_reindex_and_remove(self):
+        self.index.add(2, 'Tea Cup', 'Porcelain')
+        self.assertEqual(self.ids('coffee'), [3])
+        self.assertEqual(self.ids('tea'), [2])
+        self.index.remove(3)
+        self.assertEqual(self.ids('coffee'), [])
+        self.assertEqual(len(self.index), 2)
+
+    def test_compact_drops_retired_slots(self):
+        self.index.add(2, 'Tea Cup', 'Porcelain')
+        self.index.compact()
+        self.assertEqual(len(self.index.slot_products), 3)
+        self.assertNotIn('mug', self.index.postings)
+        self.assertEqual(self.ids('tea'), [2])
+
+    def test_champion_lists_are_rescored_exactly(self):
+        index = SearchIndex()
+        index.champion_size = 5
+        for product_id in range(1, 40):
+            index.add(product_id, 'widget', 'widget widget plain')
+        index.add(40, 'widget gadget', 'a very long description ' * 5)
+        index.pick_champions()
+        self.assertNotIn(40, index.champions['widget'][0])
+        self.assertEqual(index.search('widget gadget', limit=3)[0][0], 40)
+        index.add(41, 'widget', 'widget widget widget widget')
+        self.assertIn(41, [pid for pid, _ in index.search('widget')])
+
+
+class ProductSearchTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        path = os.path.join(self.tmp.name, 'index.pickle')
+        settings_override = override_settings(SEARCH_INDEX_PATH=path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        search.reset_index()
+        self.addCleanup(search.reset_index)
+        self.path = path
+
+    def test_build_command_writes_loadable_index(self):
+        out = StringIO()
+        call_command('build_search_index', stdout=out)
+        self.assertIn('Indexed 1 products', out.getvalue())
+        self.assertEqual([p.id for p in search.search_products('test')],
+                         [self.product.id])
+
+    def test_signals_update_loaded_index(self):
+        with self.assertLogs('store.search', 'WARNING'):
+            search.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            lamp = Product.objects.create(store=self.store, name='Desk Lamp',
+                                          price=5, stock=1)
+        self.assertEqual(search.search_products('lamp'), [lamp])
+        with self.captureOnCommitCallbacks(execute=True):
+            lamp.delete()
+        self.assertEqual(search.search_products('lamp'), [])
+
+    def test_bulk_upsert_updates_loaded_index(self):
+        with self.assertLogs('store.search', 'WARNING'):
+            search.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            ids = upsert_products([Product(store=self.store, sku='L1',
+                                           name='Desk Lamp', price=5,
+                                           stock=1)])
+        self.assertEqual([p.id for p in search.search_products('lamp')],
+                         [ids[self.store.id, 'L1']])
+
+    def test_missing_index_finds_nothing_instead_of_building(self):
+        with self.assertLogs('store.search', 'WARNING'):
+            self.assertEqual(search.search_products('test'), [])
+
+    def test_all_products_search(self):
+        Product.objects.create(store=self.store, name='Desk Lamp',
+                               price=5, stock=1)
+        call_command('build_search_index', stdout=StringIO())
+        response = self.client.get(reverse('all_products'), {'q': 'lam'})
+        self.assertContains(response, 'Desk Lamp')
+        self.assertNotContains(response, 'Test Product')
+        self.assertNotContains(response, 'Next page')
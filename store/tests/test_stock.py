@@ -0,0 +1,111 @@
+# python manage.py test store
+
+from io import StringIO
+
+from django.core.management import call_command
+from store.checkout import (CheckoutError, InsufficientStock, available_stock,
+                            place_order, reserve_cart)
+from store.models import StockShard, User
+from store.stock import rebalance, shard_totals, take_from_shards
+from store.tests.test_views import BaseTestCase
+
+
+class ShardedStockTests(BaseTestCase):
+    def shard_quantities(self):
+        return list(StockShard.objects.filter(product=self.product)
+                    .order_by('index').values_list('quantity', flat=True))
+
+    def test_rebalance_turns_sharding_on_and_off(self):
+        rebalance(self.product, 3)
+        self.assertEqual(self.shard_quantities(), [34, 33, 33])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_shards, 3)
+        rebalance(self.product, 0)
+        self.assertEqual(self.shard_quantities(), [])
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.stock_shards),
+                         (100, 0))
+
+    def test_order_takes_from_shards_not_the_product_row(self):
+        rebalance(self.product, 4)
+        place_order(self.buyer, {str(self.product.id): 5})
+        self.assertEqual(shard_totals([self.product.id]),
+                         {self.product.id: 95})
+        self.assertEqual(sorted(self.shard_quantities()), [20, 25, 25, 25])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 100)  # total as of rebalance
+        self.assertEqual(available_stock([self.product.id]),
+                         {self.product.id: 95})
+
+    def test_line_larger_than_any_shard_drains_several(self):
+        rebalance(self.product, 4)
+        self.product.refresh_from_db()
+        self.assertTrue(take_from_shards(self.product, 60))
+        self.assertEqual(sum(self.shard_quantities()), 40)
+        self.assertFalse(take_from_shards(self.product, 41))
+
+    def test_sharded_product_cannot_oversell(self):
+        rebalance(self.product, 2)
+        with self.assertRaises(CheckoutError):
+            place_order(self.buyer, {str(self.product.id): 101})
+        self.assertEqual(sum(self.shard_quantities()), 100)
+
+    def test_reservations_hold_sharded_stock(self):
+        rebalance(self.product, 4)
+        other = User.objects.create_user('otherbuyer')
+        reserve_cart(other, {str(self.product.id): 60})
+        with self.assertRaises(InsufficientStock):
+            reserve_cart(self.buyer, {str(self.product.id): 41})
+        with self.assertRaises(InsufficientStock) as raised:
+            place_order(self.buyer, {str(self.product.id): 41})
+        self.assertEqual(raised.exception.available, 40)
+        place_order(self.buyer, {str(self.product.id): 40})
+        place_order(other, {str(self.product.id): 60})
+        self.assertEqual(sum(self.shard_quantities()), 0)
+
+    def test_in_stock_filter_reads_shards(self):
+        rebalance(self.product, 2)
+        StockShard.objects.filter(product=self.product).update(quantity=0)
+        response = self.client.get('/api/products/', {'in_stock': 'true'})
+        self.assertEqual(response.json()['results'], [])
+        response = self.client.get('/api/products/', {'in_stock': 'false'})
+        self.assertEqual([p['id'] for p in response.json()['results']],
+                         [self.product.id])
+
+    def test_api_reads_and_writes_sharded_stock(self):
+        rebalance(self.product, 4)
+        place_order(self.buyer, {str(self.product.id): 5})
+        url = f'/api/products/{self.product.id}/'
+        self.assertEqual(self.client.get(url).json()['stock'], 95)
+        self.client.login(username='vendor', password='testpass')
+        response = self.client.patch(url, {'stock': 100},
+                                     content_type='application/json')
+        self.assertEqual(response.json()['stock'], 100)
+        self.assertEqual(available_stock([self.product.id]),
+                         {self.product.id: 100})
+        self.assertEqual(self.shard_quantities(), [25, 25, 25, 25])
+
+    def test_admin_writes_sharded_stock(self):
+        rebalance(self.product, 2)
+        place_order(self.buyer, {str(self.product.id): 10})
+        admin = User.objects.create_superuser('admin', password='pass')
+        self.client.force_login(admin)
+        url = f'/admin/store/product/{self.product.id}/change/'
+        form = self.client.get(url).context['adminform'].form
+        self.assertEqual(form.initial['stock'], 90)
+        data = {name: value for name, value in form.initial.items()
+                if value is not None and name != 'image'}
+        response = self.client.post(url, {**data, 'stock': 40})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.shard_quantities(), [20, 20])
+
+    def test_rebalance_command_evens_out_and_refreshes_total(self):
+        rebalance(self.product, 2)
+        StockShard.objects.filter(product=self.product,
+                                  index=0).update(quantity=0)
+        out = StringIO()
+        call_command('rebalance_stock_shards', stdout=out)
+        self.assertIn('Test Product: 50 units.', out.getvalue())
+        self.assertEqual(self.shard_quantities(), [25, 25])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 50)
@@ -0,0 +1,90 @@
+# python manage.py test store
+
+from django.test import SimpleTestCase
+from store import suggest
+from store.checkout import place_order
+from store.models import Product
+from store.suggest import Suggester
+from store.tests.test_views import BaseTestCase
+
+
+class SuggesterTests(SimpleTestCase):
+    def setUp(self):
+        self.suggester = Suggester([
+            (1, 'Blue Mug', 5),
+            (2, 'Blue  Lamp', 9),
+            (3, 'Bluetooth Speaker', 7),
+            (4, 'blue mug', 1),
+            (5, 'Red Mug', 100),
+        ])
+
+    def names(self, prefix, limit=10):
+        return [s['name'] for s in self.suggester.suggest(prefix, limit)]
+
+    def test_prefix_matches_ranked_by_popularity(self):
+        self.assertEqual(self.names('blu'),
+                         ['Blue  Lamp', 'Bluetooth Speaker', 'Blue Mug'])
+
+    def test_duplicate_names_merge_weights(self):
+        self.assertEqual(len(self.suggester), 4)
+        self.assertEqual(self.suggester.suggest('blue m'),
+                         [{'id': 1, 'name': 'Blue Mug'}])
+
+    def test_limit_and_no_match(self):
+        self.assertEqual(self.names('b', limit=1), ['Blue  Lamp'])
+        self.assertEqual(self.names('green'), [])
+        self.assertEqual(self.names('  '), [])
+
+    def test_top_k_matches_full_sort(self):
+        entries = [(i, f'item {i % 97}', (i * 7919) % 1000)
+                   for i in range(1, 2000)]
+        suggester = Suggester(entries)
+        expected = sorted(range(len(suggester)),
+                          key=lambda i: -suggester.weights[i])[:10]
+        self.assertEqual([s['id'] for s in suggester.suggest('item', 10)],
+                         [suggester.ids[i] for i in expected])
+
+
+class SuggestApiTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        suggest.reset_suggester()
+        self.addCleanup(suggest.reset_suggester)
+
+    def get(self, q):
+        return self.client.get('/api/products/suggest/', {'q': q}).json()
+
+    def test_sales_weight_suggestions_without_queries(self):
+        lamp = Product.objects.create(store=self.store, name='Test Lamp',
+                                      price=5, stock=10)
+        place_order(self.buyer, {str(lamp.id): 3})
+        self.assertEqual([s['name'] for s in self.get('test')['results']],
+                         ['Test Lamp', 'Test Product'])
+        with self.assertNumQueries(0):
+            self.get('tes')
+
+    def test_rebuilds_when_names_change(self):
+        self.assertEqual(self.get('desk')['results'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            desk = Product.objects.create(store=self.store, name='Desk',
+                                          price=5, stock=1)
+        self.assertEqual(len(self.get('desk')['results']), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            desk.name = 'Table'
+            desk.save()
+        self.assertEqual(self.get('desk')['results'], [])
+
+    def test_other_writes_do_not_rebuild(self):
+        self.get('test')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = 1
+            self.product.save()
+            place_order(self.buyer, {str(self.product.id): 1})
+        with self.assertNumQueries(0):
+            self.get('test')
+
+    def test_rebuilds_after_refresh_interval(self):
+        self.get('test')
+        with self.settings(SUGGEST_REFRESH_SECONDS=0):
+            with self.assertNumQueries(2):  # sales, products
+                self.get('test')
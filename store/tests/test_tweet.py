@@ -0,0 +1,73 @@
+# python manage.py test store
+
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase
+from functions.tweet import CircuitBreaker, CircuitOpenError, Tweet
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_threshold_and_recovers(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10,
+                                 clock=clock)
+        breaker.record_failure()
+        breaker.allow()
+        breaker.record_failure()
+        with self.assertRaises(CircuitOpenError):
+            breaker.allow()
+        clock.now = 10
+        breaker.allow()  # half-open trial
+        with self.assertRaises(CircuitOpenError):
+            breaker.allow()  # only one trial at a time
+        breaker.record_success()
+        breaker.allow()
+
+    def test_failed_trial_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5,
+                                 clock=clock)
+        breaker.record_failure()
+        clock.now = 5
+        breaker.allow()
+        breaker.record_failure()
+        with self.assertRaises(CircuitOpenError):
+            breaker.allow()
+
+
+class TweetClientTests(SimpleTestCase):
+    def setUp(self):
+        client = Tweet()
+        self.addCleanup(setattr, client, 'breaker', client.breaker)
+        client.breaker = CircuitBreaker(failure_threshold=2)
+
+    def test_uses_pooled_session_with_timeouts(self):
+        client = Tweet()
+        response = mock.Mock(status_code=201)
+        response.json.return_value = {'data': {'id': '1'}}
+        with mock.patch.object(client.session, 'post',
+                               return_value=response) as post:
+            client.make_tweet({'text': 'hi'}, 'token')
+        self.assertEqual(post.call_args.kwargs['timeout'],
+                         (Tweet.CONNECT_TIMEOUT, Tweet.READ_TIMEOUT))
+
+    def test_fails_fast_after_repeated_errors(self):
+        client = Tweet()
+        with mock.patch.object(client.session, 'post',
+                               side_effect=requests.Timeout) as post:
+            for _ in range(2):
+                with self.assertRaises(requests.Timeout):
+                    client.make_tweet({'text': 'hi'}, 'token')
+            with self.assertRaises(CircuitOpenError):
+                client.make_tweet({'text': 'hi'}, 'token')
+        self.assertEqual(post.call_count, 2)
+
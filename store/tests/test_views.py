@@ -1,8 +1,10 @@
 # python manage.py test store
 
+from django.core.cache import cache
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from store.cart import add_line, cart_quantities
 from store.models import User, Store, Product, Order, OrderItem, Review
 
 User = get_user_model()
@@ -10,6 +12,7 @@ User = get_user_model()
 
 class BaseTestCase(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = Client()
         self.vendor = User.objects.create_user(username='vendor',
                                                password='testpass',
@@ -76,26 +79,23 @@ class CartCheckoutTests(BaseTestCase):
         response = self.client.get(reverse('add_to_cart',
                                            args=[self.product.id]))
         self.assertEqual(response.status_code, 302)
-        session = self.client.session
-        self.assertIn(str(self.product.id), session.get('cart', {}))
+        self.assertEqual(cart_quantities(self.buyer), {self.product.id: 1})
 
     def test_view_cart(self):
         self.client.login(username='buyer', password='testpass')
-        session = self.client.session
-        session['cart'] = {str(self.product.id): 2}
-        session.save()
+        add_line(self.buyer, self.product.id, 2)
         response = self.client.get(reverse('view_cart'))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, self.product.name)
 
     def test_checkout_requires_buyer(self):
         self.client.login(username='vendor', password='testpass')
-        response = self.client.get(reverse('checkout'))
+        response = self.client.post(reverse('checkout'))
         self.assertContains(response, "Only buyers can checkout.")
 
     def test_checkout_empty_cart(self):
         self.client.login(username='buyer', password='testpass')
-        response = self.client.get(reverse('checkout'))
+        response = self.client.post(reverse('checkout'))
         self.assertContains(response, "Cart is empty.")
 
 
@@ -118,6 +118,16 @@ class OrderReviewTests(BaseTestCase):
                                               user=self.buyer).exists()
                         )
 
+    def test_submit_review_rejects_invalid_rating(self):
+        self.client.login(username='buyer', password='testpass')
+        for rating in (9, 'five'):
+            response = self.client.post(
+                reverse('submit_review', args=[self.product.id]),
+                {'rating': rating, 'comment': 'Great!'}
+            )
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(Review.objects.exists())
+
 
 class VendorActionsTests(BaseTestCase):
     def test_create_store(self):
@@ -145,5 +155,5 @@ class PermissionsTests(BaseTestCase):
 
     def test_vendor_cannot_checkout(self):
         self.client.login(username='vendor', password='testpass')
-        response = self.client.get(reverse('checkout'))
+        response = self.client.post(reverse('checkout'))
         self.assertContains(response, "Only buyers can checkout.")
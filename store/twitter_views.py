@@ -2,6 +2,9 @@ import os
 from requests_oauthlib import OAuth2Session
 from django.shortcuts import redirect, render
 from django.http import HttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from functions.tweet import render_metrics
+from .cache import tweet_metrics
 
 TWITTER_CLIENT_ID = os.getenv('TWITTER_CLIENT_ID')
 TWITTER_CLIENT_SECRET = os.getenv('TWITTER_CLIENT_SECRET')
@@ -36,3 +39,10 @@ def twitter_callback(request):
     # Save user's access token for future posting
     request.session['twitter_access_token'] = token['access_token']
     return HttpResponse("Twitter authorized! You may now add a store.")
+
+@staff_member_required
+def twitter_metrics(request):
+    # Prometheus scrape target for the counters the tweet worker reports
+    counts, breaker_state = tweet_metrics()
+    return HttpResponse(render_metrics(counts, breaker_state),
+                        content_type='text/plain; version=0.0.4')
@@ -13,6 +13,7 @@ urlpatterns = [
     path('api/', include(router.urls)),
     path('', views.home, name='home'),
     path('checkout/', views.checkout, name='checkout'),
+    path('checkout/review/', views.checkout_review, name='checkout_review'),
     path('product/<int:product_id>/review/', views.submit_review,
          name='submit_review'),
     path('manage-store/', views.manage_store, name='manage_store'),
@@ -44,13 +45,20 @@ urlpatterns = [
     path('svendor-stores/', views.vendor_store_list,
          name='vendor_store_list'),
     path('vendor-orders/', views.vendor_orders, name='vendor_orders'),
+    path('store/<int:store_id>/export/<slug:dataset>.<slug:fmt>',
+         views.export_store, name='export_store'),
     path('store/<int:store_id>/products/', views.vendor_product_list,
          name='vendor_product_list'),
     path('product/<int:product_id>/', views.product_detail,
          name='product_detail'),
+    path('product/<int:product_id>/reviews/', views.product_reviews,
+         name='product_reviews'),
     path('cart/add/<int:product_id>/', views.add_to_cart,
          name='add_to_cart'),
+    path('metrics/catalog-cache/', views.catalog_cache_metrics,
+         name='catalog_cache_metrics'),
     path('twitter/login/', twitter_views.twitter_login, name='twitter_login'),
     path('twitter/callback/', twitter_views.twitter_callback, name='twitter_callback'),
+    path('twitter/metrics/', twitter_views.twitter_metrics, name='twitter_metrics'),
 
 ]
@@ -1,23 +1,55 @@
 import os
+from datetime import date, timedelta
+from decimal import Decimal
 
 from django.contrib.auth import login
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
 from django.contrib.auth.forms import UserCreationForm
-from django.http import HttpResponse, HttpRequest, HttpResponseRedirect
+from django.conf import settings
+from django.http import (HttpResponse, HttpRequest, HttpResponseRedirect,
+                         Http404, JsonResponse, StreamingHttpResponse)
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponse
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.core.mail import send_mail
+from django.db import transaction
 from django.http import HttpResponse
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponse
 from django.shortcuts import render, redirect
-from functions.tweet import Tweet
-from .forms import ProductForm, StoreForm
-from .models import User, Store, Product, Review, Order, OrderItem
+from .cache import (bump_catalog_version, bump_suggest_version,
+                    catalog_cache_stats, catalog_listing_key, get_or_build,
+                    product_detail_key, record_catalog_lookup)
+from .cart import (add_line, cart_quantities, clear_cart, price_cart,
+                   remove_line, set_line_quantity)
+from .checkout import (CheckoutError, available_stock, place_order,
+                       release_reservations, reserve_cart)
+from .exports import (EXPORT_CONTENT_TYPES, store_orders_export,
+                      store_products_export)
+from .fieldsets import SparseFieldsetMixin
+from .filters import (ProductFilterBackend, parse_product_filters,
+                      product_facets)
+from .forms import ProductForm, ReviewForm, StoreForm
+from .imports import upsert_products
+from .models import (User, Store, Product, Review, Order, OrderItem,
+                     TweetOutbox, TwitterCredential, QueuedEmail,
+                     StockReservation, VendorOrderSummary)
+from .pagination import InvalidCursor, decode_cursor, keyset_page
+from .prefetch import PrefetchPlanMixin
+from .rollups import sales_series
+from .search import search_products
+from .stock import set_stock_levels
+from .suggest import get_suggester
 from rest_framework import viewsets, permissions
-from .serializers import StoreSerializer, ProductSerializer, ReviewSerializer
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.request import Request
+from rest_framework.response import Response
+from .serializers import (StoreSerializer, ProductSerializer, ReviewSerializer,
+                          BulkProductSerializer, StockLevelSerializer)
 
 
 User = get_user_model()
@@ -39,7 +71,37 @@ class CustomUserCreationForm(UserCreationForm):
         model = User
         fields = ('username', 'email', 'role')
 
-class StoreViewSet(viewsets.ModelViewSet):
+SALES_DEFAULT_DAYS = 30
+SALES_MAX_DAYS = 366
+
+
+def _sales_range(params) -> tuple:
+    """
+    Reads the ``from`` and ``to`` days of a sales report.
+
+    :raises ValidationError: If a day is malformed, the range is reversed
+        or it spans more than ``SALES_MAX_DAYS`` days.
+    """
+    days = {}
+    for name in ('from', 'to'):
+        try:
+            days[name] = (date.fromisoformat(params[name])
+                          if params.get(name) else None)
+        except ValueError:
+            raise ValidationError({name: "Must be a date (YYYY-MM-DD)."})
+    end = days['to'] or timezone.localdate()
+    start = days['from'] or end - timedelta(days=SALES_DEFAULT_DAYS - 1)
+    if start > end:
+        raise ValidationError({'from': "Must not be after 'to'."})
+    if (end - start).days >= SALES_MAX_DAYS:
+        raise ValidationError(
+            {'from': f"At most {SALES_MAX_DAYS} days can be requested."})
+    return start, end
+
+
+class StoreViewSet(SparseFieldsetMixin,
+                   PrefetchPlanMixin,
+                   viewsets.ModelViewSet):
     queryset = Store.objects.all()
     serializer_class = StoreSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -47,16 +109,209 @@ class StoreViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
-class ProductViewSet(viewsets.ModelViewSet):
+    @action(detail=True, permission_classes=[permissions.IsAuthenticated])
+    def sales(self, request: Request, pk=None) -> Response:
+        """
+        Returns a store's daily sales for its owner, read from the
+        :class:`store.models.DailyStoreSales` rollup with one range query.
+
+        ``?from=`` and ``?to=`` (``YYYY-MM-DD``, inclusive) pick the days;
+        the default is the last ``SALES_DEFAULT_DAYS`` days up to today,
+        and at most ``SALES_MAX_DAYS`` days are returned.
+
+        :param request: The API request of the store owner.
+        :type request: Request
+        :param pk: The store's primary key.
+        :return: ``{"store", "from", "to", "totals", "series"}``, where
+            ``series`` has one ``{"date", "units", "revenue", "orders"}``
+            entry per day.
+        :rtype: Response
+        """
+        store = get_object_or_404(Store.objects.only('id', 'owner_id'),
+                                  pk=pk)
+        if store.owner_id != request.user.id:
+            raise PermissionDenied("Only the store owner can view its sales.")
+        start, end = _sales_range(request.query_params)
+        series = sales_series(store.pk, start, end)
+        totals = {'units': sum(day['units'] for day in series),
+                  'revenue': sum((day['revenue'] for day in series),
+                                 Decimal('0.00')),
+                  'orders': sum(day['orders'] for day in series)}
+        for row in [totals, *series]:
+            row['revenue'] = str(row['revenue'])
+        return Response({'store': store.pk, 'from': start, 'to': end,
+                         'totals': totals, 'series': series})
+
+def _bulk_items(request: Request, serializer_class, **context) -> list:
+    """
+    Validates the list of items of a bulk product request.
+
+    :raises ValidationError: If the body is not a list, holds more than
+        ``PRODUCT_BULK_MAX_ITEMS`` items or any item is invalid; the
+        errors then come as a list with one entry per item.
+    """
+    serializer = serializer_class(
+        data=request.data, many=True, context=context,
+        max_length=getattr(settings, 'PRODUCT_BULK_MAX_ITEMS', 1000))
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+class ProductViewSet(SparseFieldsetMixin,
+                    PrefetchPlanMixin,
+                    viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-
-class ReviewViewSet(viewsets.ModelViewSet):
+    filter_backends = [ProductFilterBackend]
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        """
+        Lists products matching the filters of
+        :class:`store.filters.ProductFilterBackend`. The first page also
+        carries ``facets``: product counts per store and per price bucket
+        (see :func:`store.filters.product_facets`). Later pages, requested
+        with ``?cursor=``, skip them since they do not change.
+        """
+        response = super().list(request, *args, **kwargs)
+        if 'cursor' not in request.query_params:
+            response.data['facets'] = product_facets(
+                self.queryset.all(),
+                parse_product_filters(request.query_params))
+        return response
+
+    @action(detail=False)
+    def suggest(self, request: Request) -> Response:
+        """
+        Returns product names starting with ``?q=``, most popular first,
+        for type-ahead search boxes. Answered from memory by
+        :mod:`store.suggest`, without a database query per keystroke.
+
+        :param request: The API request carrying ``q`` and an optional
+            ``limit`` (at most 50).
+        :type request: Request
+        :return: ``{"results": [{"id": ..., "name": ...}, ...]}``.
+        :rtype: Response
+        """
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 50)
+        except ValueError:
+            limit = 10
+        query = request.query_params.get('q', '')
+        return Response({'results': get_suggester().suggest(query, limit)})
+
+    @action(detail=False, methods=['post'],
+            permission_classes=[permissions.IsAuthenticated])
+    def bulk(self, request: Request) -> Response:
+        """
+        Creates or updates many of the requester's products at once.
+
+        Takes a list of ``{"store", "sku", "name", "price", "stock",
+        "description"}`` items; ``description`` is optional. Each is
+        matched to a product of its store by SKU: existing products are
+        overwritten, except for an omitted description, and the others
+        created. All items are validated first and written in one
+        transaction with one upsert statement (see
+        :func:`store.imports.upsert_products`), so either every item is
+        applied or none is.
+
+        Product signals do not fire. The products are added to this
+        process's search index; other web processes find new and renamed
+        products after the next ``build_search_index`` run, as with
+        single saves.
+
+        :param request: The API request of a store owner.
+        :type request: Request
+        :return: ``{"results": [{"id", "store", "sku", "created"}, ...]}``
+            in item order.
+        :rtype: Response
+        """
+        stores = set(Store.objects.filter(owner=request.user)
+                     .values_list('id', flat=True))
+        items = _bulk_items(request, BulkProductSerializer, stores=stores)
+        if not items:
+            return Response({'results': []})
+        keys = [(item['store_id'], item['sku']) for item in items]
+        with transaction.atomic():
+            existing = {(store, sku): description
+                        for store, sku, description in
+                        Product.objects.select_for_update()
+                        .filter(store_id__in={store for store, _ in keys},
+                                sku__in={sku for _, sku in keys})
+                        .values_list('store_id', 'sku', 'description')}
+            for key, item in zip(keys, items):
+                # An omitted description keeps the stored one
+                if 'description' not in item and key in existing:
+                    item['description'] = existing[key]
+            ids = upsert_products([Product(**item) for item in items])
+            transaction.on_commit(bump_catalog_version)
+            transaction.on_commit(bump_suggest_version)
+        return Response({'results': [
+            {'id': ids[key], 'store': key[0], 'sku': key[1],
+             'created': key not in existing}
+            for key in keys]})
+
+    @action(detail=False, methods=['patch'], url_path='bulk-stock',
+            permission_classes=[permissions.IsAuthenticated])
+    def bulk_stock(self, request: Request) -> Response:
+        """
+        Sets the stock level of many of the requester's products at once,
+        for syncing from a warehouse system.
+
+        Takes a list of ``{"id", "stock"}`` items. The products are
+        locked and written in one transaction with one bulk update (see
+        :func:`store.stock.set_stock_levels`); if any item is invalid or
+        names a product outside the requester's stores, none is applied.
+
+        :param request: The API request of a store owner.
+        :type request: Request
+        :return: ``{"results": [{"id", "stock"}, ...]}`` in item order.
+        :rtype: Response
+        """
+        items = _bulk_items(request, StockLevelSerializer)
+        # Filtering on the store ids rather than joining the stores keeps
+        # the row locks to the products
+        stores = list(Store.objects.filter(owner=request.user)
+                      .values_list('id', flat=True))
+        with transaction.atomic():
+            products = (Product.objects.select_for_update()
+                        .filter(pk__in=[item['id'] for item in items],
+                                store_id__in=stores)
+                        .only('id', 'stock', 'stock_shards')
+                        .in_bulk())
+            errors = [{} if item['id'] in products
+                      else {'id': ["No such product in your stores."]}
+                      for item in items]
+            if any(errors):
+                raise ValidationError(errors)
+            for item in items:
+                products[item['id']].stock = item['stock']
+            if products:
+                set_stock_levels(list(products.values()))
+        return Response({'results': [
+            {'id': item['id'], 'stock': item['stock']} for item in items]})
+
+class ReviewViewSet(SparseFieldsetMixin,
+                    PrefetchPlanMixin,
+                    viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    # Review writes also move the product's rating aggregates (see
+    # store.signals), so both must commit together
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+
 def register(request: HttpRequest) -> HttpResponse:
     """
     Handles user registration by processing user input through a custom
@@ -88,11 +343,12 @@ def register(request: HttpRequest) -> HttpResponse:
 
 def add_to_cart(request: HttpRequest, product_id: int) -> HttpResponseRedirect:
     """
-    Handles adding a product to the shopping cart. Retrieves the cart
-    from the user's session and increments the quantity of the specified
-    product. If the cart does not exist in the session, it initializes
-    a new cart. After updating the cart, the user is redirected to the
-    "all_products" page.
+    Handles adding a product to the shopping cart. A signed-in user's
+    cart is stored in :class:`store.models.CartLine` rows, so adding a
+    product writes a single row (see :func:`store.cart.add_line`).
+    Anonymous visitors keep their cart in the session until they log in,
+    when it is merged into their stored cart. After updating the cart,
+    the user is redirected to the "all_products" page.
 
     :param request: HttpRequest object containing metadata about the request
         from the user.
@@ -102,21 +358,109 @@ def add_to_cart(request: HttpRequest, product_id: int) -> HttpResponseRedirect:
     :return: An HttpResponseRedirect to the "all_products" page.
     :rtype: HttpResponseRedirect
     """
-    cart = request.session.get('cart', {})
     product = get_object_or_404(Product, id=product_id)
-    cart[str(product_id)] = cart.get(str(product_id), 0) + 1
-    request.session['cart'] = cart
+    if request.user.is_authenticated:
+        add_line(request.user, product.id)
+    else:
+        cart = request.session.get('cart', {})
+        cart[str(product_id)] = cart.get(str(product_id), 0) + 1
+        request.session['cart'] = cart
     return redirect('all_products')
 
 
 from django.http import HttpResponse
 
 
+CATALOG_LISTING_TEMPLATES = {
+    'home': 'store/home_listing.html',
+    'all_products': 'store/all_products_listing.html',
+}
+CATALOG_ORDERINGS = {
+    'id': ('id',),
+    'price': ('price', 'id'),
+}
+
+
+def _catalog_sort(request: HttpRequest) -> str:
+    sort = request.GET.get('sort', 'id')
+    return sort if sort in CATALOG_ORDERINGS else 'id'
+
+
+def _catalog_page(request: HttpRequest) -> dict:
+    """
+    Builds the template context for one keyset-paginated catalog page.
+
+    The sort order is taken from ``?sort=`` (``id`` or ``price``) and the
+    position from ``?after=``, the cursor of the previous page. Page size
+    comes from the ``CATALOG_PAGE_SIZE`` setting.
+
+    :param request: The HTTP request carrying the query parameters.
+    :type request: HttpRequest
+    :return: A context with ``products``, ``sort`` and ``next_cursor``.
+    :rtype: dict
+    :raises Http404: If the cursor is malformed.
+    """
+    sort = _catalog_sort(request)
+    try:
+        page = keyset_page(Product.objects.all(),
+                           CATALOG_ORDERINGS[sort],
+                           request.GET.get('after'),
+                           getattr(settings, 'CATALOG_PAGE_SIZE', 24))
+    except InvalidCursor:
+        raise Http404("Invalid page cursor.")
+    return {'products': page.object_list,
+            'sort': sort,
+            'next_cursor': page.next_cursor}
+
+
+def _catalog_listing(request: HttpRequest, page: str) -> dict:
+    """
+    Returns the rendered product listing of a catalog page, from the
+    cache when possible.
+
+    The listing does not depend on who is looking at it, so it is cached
+    under the catalog generation, the page name, sort order, decoded
+    cursor and page size. The cursor is validated before it reaches the
+    cache. Any change to a product or store bumps the generation
+    (see :mod:`store.signals`), which retires every cached listing at
+    once. Each lookup is counted as a hit or a miss.
+
+    :param request: The HTTP request carrying the query parameters.
+    :type request: HttpRequest
+    :param page: The page name, a key of ``CATALOG_LISTING_TEMPLATES``.
+    :type page: str
+    :return: A context with the rendered ``listing``.
+    :rtype: dict
+    :raises Http404: If the cursor is malformed.
+    """
+    page_size = getattr(settings, 'CATALOG_PAGE_SIZE', 24)
+    sort = _catalog_sort(request)
+    cursor = request.GET.get('after')
+    try:
+        after = (decode_cursor(cursor, Product, CATALOG_ORDERINGS[sort])
+                 if cursor else None)
+    except InvalidCursor:
+        raise Http404("Invalid page cursor.")
+    built = []
+
+    def build():
+        built.append(True)
+        return render_to_string(CATALOG_LISTING_TEMPLATES[page],
+                                _catalog_page(request))
+
+    listing = get_or_build(
+        catalog_listing_key(page, sort, after, page_size),
+        build,
+        getattr(settings, 'CATALOG_CACHE_TTL', 300))
+    record_catalog_lookup(hit=not built)
+    return {'listing': mark_safe(listing)}
+
+
 def home(request: HttpRequest) -> HttpResponse:
     """
-    Fetches and displays all products from the database on the home page.
+    Fetches and displays a page of products on the home page.
 
-    This function queries the Product model for all available products
+    This function queries one keyset-paginated page of the Product model
     and then passes the fetched data to the 'store/home.html' template for
     rendering. The resulting page showcases the products to the end-users.
 
@@ -124,60 +468,99 @@ def home(request: HttpRequest) -> HttpResponse:
         The HTTP request object containing metadata about the request.
     :return:
         The HTTP response object that renders the 'store/home.html' template
-        populated with the list of products.
+        populated with the page of products.
     """
-    products = Product.objects.all()
     return render(request,
                   'store/home.html',
-                  {'products': products}
+                  _catalog_listing(request, 'home')
                   )
 
 
+@login_required
+def checkout_review(request: HttpRequest) -> HttpResponse:
+    """
+    Starts checkout by reserving the cart's stock for the buyer.
+
+    A POST from the cart page reserves the cart (see
+    :func:`store.checkout.reserve_cart`) and redirects back here, so
+    prefetching or reloading the page never takes stock. The
+    reservations hold the units for ``STOCK_RESERVATION_TTL`` seconds,
+    so the order placed from this page cannot fail for lack of stock
+    while they last. A GET without live reservations covering the whole
+    cart returns to the cart.
+
+    :param request: The HTTP request of a logged-in buyer.
+    :type request: HttpRequest
+    :return: The order summary with a button to place the order, or the
+        reason the cart cannot be reserved.
+    :rtype: HttpResponse
+    """
+    if request.user.role != User.BUYER:
+        return HttpResponse("Only buyers can checkout.")
+    cart = cart_quantities(request.user)
+    if not cart:
+        return HttpResponse("Cart is empty.")
+    if request.method == 'POST':
+        try:
+            reserve_cart(request.user, cart)
+        except CheckoutError as exc:
+            return HttpResponse(str(exc))
+        return redirect('checkout_review')
+    held = {product_id: (quantity, expires_at)
+            for product_id, quantity, expires_at in
+            StockReservation.objects
+            .filter(user=request.user, product_id__in=cart,
+                    expires_at__gt=timezone.now())
+            .values_list('product_id', 'quantity', 'expires_at')}
+    if any(held.get(product_id, (0,))[0] < quantity
+           for product_id, quantity in cart.items()):
+        return redirect('view_cart')
+    priced = price_cart(cart)
+    return render(request, 'checkout_review.html',
+                  {'cart_items': priced.lines,
+                   'total': priced.total,
+                   'expires_at': min(expires_at
+                                     for _, expires_at in held.values())})
+
+
 @login_required
 def checkout(request: HttpRequest) -> HttpResponse:
     """
     Handles the checkout process for a logged-in buyer user.
     Prevents negative stock and database errors by validating inventory.
+    The order itself is placed by :func:`store.checkout.place_order`,
+    which locks the cart products and writes the order in a constant
+    number of queries. The invoice is queued for the ``send_queued_emails``
+    worker, so checkout never waits on the mail server.
+
+    Only a POST from the review page places the order; a GET (a
+    prefetch, a reload, an old link) is sent to :func:`checkout_review`.
     """
+    if request.method != 'POST':
+        return redirect('checkout_review')
     if request.user.role != User.BUYER:
         return HttpResponse("Only buyers can checkout.")
 
-    cart = request.session.get('cart', {})
+    cart = cart_quantities(request.user)
     if not cart:
         return HttpResponse("Cart is empty.")
 
-    # Check stock for all products before creating the order
-    for product_id, quantity in cart.items():
-        product = Product.objects.get(id=product_id)
-        if product.stock < quantity:
-            return HttpResponse(
-                f"Not enough stock for {product.name}. "
-                f"Only {product.stock} left."
-            )
-
-    # All stock is sufficient, proceed with order creation
-    order = Order.objects.create(user=request.user)
-    for product_id, quantity in cart.items():
-        product = Product.objects.get(id=product_id)
-        OrderItem.objects.create(
-            order=order,
-            product=product,
-            quantity=quantity,
-            price=product.price
-        )
-        product.stock -= quantity
-        product.save()
-
-    # Clear the cart
-    request.session['cart'] = {}
-
-    # Send invoice email (simplified)
-    send_mail(
-        subject="Your Invoice",
-        message=f"Thank you for your purchase! Order #{order.id}",
-        from_email="yourshop@example.com",
-        recipient_list=[request.user.email]
-    )
+    # Lock, validate and decrement stock for the whole cart in one
+    # transaction, queueing the invoice email and emptying the cart
+    # alongside the order
+    try:
+        with transaction.atomic():
+            order = place_order(request.user, cart)
+            clear_cart(request.user)
+            if request.user.email:
+                QueuedEmail.objects.create(
+                    subject="Your Invoice",
+                    body=f"Thank you for your purchase! Order #{order.id}",
+                    from_email="yourshop@example.com",
+                    to=[request.user.email]
+                )
+    except CheckoutError as exc:
+        return HttpResponse(str(exc))
 
     return render(request, 'checkout.html')
 
@@ -197,22 +580,30 @@ def submit_review(request: HttpRequest, product_id: int) -> HttpResponse:
         the review is being submitted.
     :return: An HttpResponse either rendering the review submission
         page or redirecting the user to the product detail page after
-        successful submission.
+        successful submission. An invalid rating or comment redisplays
+        the form with status 400.
     """
     product = Product.objects.get(id=product_id)
     if request.method == 'POST':
-        rating = int(request.POST['rating'])
-        comment = request.POST['comment']
+        # The rating must be one of the model's choices, since the review
+        # signals count it into the matching rating_N column
+        form = ReviewForm(request.POST)
+        if not form.is_valid():
+            return render(request, 'submit_review.html',
+                          {'product': product, 'form': form}, status=400)
         # Check if user purchased this product
         verified = OrderItem.objects.filter(order__user=request.user,
                                             product=product).exists()
-        Review.objects.create(
-            product=product,
-            user=request.user,
-            rating=rating,
-            comment=comment,
-            verified_purchase=verified
-        )
+        # The review signals update the product's rating aggregates in the
+        # same transaction
+        with transaction.atomic():
+            Review.objects.create(
+                product=product,
+                user=request.user,
+                rating=form.cleaned_data['rating'],
+                comment=form.cleaned_data['comment'],
+                verified_purchase=verified
+            )
         return redirect('product_detail', product_id=product.id)
     return render(request,
                   'submit_review.html',
@@ -250,56 +641,40 @@ def manage_store(request: HttpRequest) -> HttpResponse:
 def view_cart(request: HttpRequest) -> HttpResponse:
     """
     Handles the display of the user's shopping cart and calculates
-    the total cost of items within the cart. It retrieves product
-    information as well as computes
-    the subtotal for each product based on its price and quantity.
+    the total cost of items within the cart. The cart lines are read with
+    one query and priced by :func:`store.cart.price_cart` with another;
+    lines of deleted products are removed with the product.
 
     :param request: Django HTTP request object used for retrieving
-        the session and rendering the response.
+        the user and rendering the response.
     :type request: HttpRequest
     :return: HttpResponse object containing the rendered cart page with the
         list of cart items and the total cost.
     :rtype: HttpResponse
     """
-    cart = request.session.get('cart', {})
-    cart_items = []
-    total = 0
-    for product_id, quantity in cart.items():
-        product = get_object_or_404(Product, id=product_id)
-        subtotal = product.price * quantity
-        cart_items.append({
-            'product': product,
-            'quantity': quantity,
-            'subtotal': subtotal,
-        })
-        total += subtotal
+    priced = price_cart(cart_quantities(request.user))
     return render(request, 'cart.html',
-                  {'cart_items': cart_items, 'total': total})
+                  {'cart_items': priced.lines, 'total': priced.total})
 
 
 @login_required
 def remove_from_cart(request: HttpRequest, product_id: int) -> HttpResponse:
     """
-    Removes a product from the user's shopping cart stored in the session.
+    Removes a product from the user's shopping cart.
 
-    This function checks if a specific product exists in the user's current
-    session-based shopping cart by its product ID and removes it if
-    present.
-    The updated cart information is then saved back into the session.
-    After modification, the user is redirected to the cart view page.
+    The product's cart line is deleted with a single statement, and any
+    stock reserved for it at checkout is released. After modification,
+    the user is redirected to the cart view page.
 
-    :param request: The HTTP request object containing session data
-        and user information.
+    :param request: The HTTP request object containing user information.
     :type request: HttpRequest
     :param product_id: The ID of the product to be removed from the cart.
     :type product_id: int
     :return: An HTTP response redirecting the user to the cart view page.
     :rtype: HttpResponse
     """
-    cart = request.session.get('cart', {})
-    if str(product_id) in cart:
-        del cart[str(product_id)]
-        request.session['cart'] = cart
+    if remove_line(request.user, product_id):
+        release_reservations(request.user, [product_id])
     return redirect('view_cart')
 
 
@@ -310,14 +685,15 @@ def update_cart_quantity(request: HttpRequest,
     Updates the quantity of a specific product in the shopping cart.
 
     This function allows a logged-in user to update the quantity
-    of a product in their session-based shopping cart. If the quantity is
+    of a product in their shopping cart, writing only that product's cart
+    line. If the quantity is
     greater than zero, the cart is updated with the new quantity. If the
     quantity is zero or less, the product is removed from the cart. If the
     product is not already in the
     cart, no action is taken.
 
-    :param request: The incoming HTTP request object containing session
-        data and POST data with the updated quantity.
+    :param request: The incoming HTTP request object containing the user
+        and POST data with the updated quantity.
     :type request: HttpRequest
     :param product_id: The identifier of the product whose quantity is being
         updated in the cart.
@@ -327,13 +703,9 @@ def update_cart_quantity(request: HttpRequest,
     """
     if request.method == 'POST':
         quantity = int(request.POST.get('quantity', 1))
-        cart = request.session.get('cart', {})
-        if str(product_id) in cart:
-            if quantity > 0:
-                cart[str(product_id)] = quantity
-            else:
-                del cart[str(product_id)]
-            request.session['cart'] = cart
+        if set_line_quantity(request.user, product_id, quantity):
+            # The hold no longer matches the cart; checkout reserves again
+            release_reservations(request.user, [product_id])
     return redirect('view_cart')
 
 
@@ -394,28 +766,130 @@ def vendor_product_list(request: HttpRequest, store_id: int) -> HttpResponse:
 
 def all_products(request: HttpRequest) -> HttpResponse:
     """
-    Retrieve and display all products available in the database.
+    Retrieve and display the products available in the database.
+
+    This view fetches one keyset-paginated page of the Product model
+    and renders it into an HTML template for display. Deep pages cost the
+    same as the first one because the database seeks to the cursor
+    instead of skipping rows with ``OFFSET``.
 
-    This view fetches all instances of the Product model from the database
-    and renders them into an HTML template for display.
+    With ``?q=`` the page shows the best matches for the query instead,
+    ranked by :mod:`store.search`.
 
     :param request: The HTTP request object received from the user.
     :type request: HttpRequest
     :return: An HTTP response object containing the rendered template with
-        all products.
+        a page of products.
     :rtype: HttpResponse
     """
-    products = Product.objects.all()
+    query = request.GET.get('q', '').strip()
+    if query:
+        return render(request, 'store/all_products.html',
+                      {'query': query,
+                       'products': search_products(
+                           query, getattr(settings, 'CATALOG_PAGE_SIZE', 24))})
     return render(request,
                   'store/all_products.html',
-                  {'products': products}
+                  _catalog_listing(request, 'all_products')
                   )
 
 
+REVIEW_ORDERING = ('-created_at', '-id')
+REVIEW_QUERY_PARAMS = {'after', 'rating', 'verified'}
+
+
+def catalog_cache_metrics(request: HttpRequest) -> HttpResponse:
+    """
+    Exposes the catalog listing cache counters in the Prometheus text
+    format, so the hit ratio can be scraped and graphed.
+
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: The counters as ``text/plain``.
+    :rtype: HttpResponse
+    """
+    stats = catalog_cache_stats()
+    lines = ['# TYPE catalog_cache_hits_total counter',
+             f'catalog_cache_hits_total {stats["hits"]}',
+             '# TYPE catalog_cache_misses_total counter',
+             f'catalog_cache_misses_total {stats["misses"]}']
+    return HttpResponse('\n'.join(lines) + '\n',
+                        content_type='text/plain; version=0.0.4')
+
+
+def _review_page(request: HttpRequest, product: Product):
+    """
+    Returns one keyset-paginated page of a product's reviews, newest
+    first, with each review's user joined in the same query.
+
+    ``?after=`` continues from a previous page, ``?rating=`` keeps only
+    reviews with that many stars and ``?verified=1`` keeps only verified
+    purchases. Page size comes from the ``REVIEW_PAGE_SIZE`` setting.
+
+    :param request: The HTTP request carrying the query parameters.
+    :type request: HttpRequest
+    :param product: The reviewed product.
+    :type product: Product
+    :return: The page of reviews and the cursor of the next one.
+    :rtype: KeysetPage
+    :raises Http404: If the cursor is malformed.
+    """
+    reviews = product.reviews.select_related('user')
+    rating = request.GET.get('rating')
+    if rating in {'1', '2', '3', '4', '5'}:
+        reviews = reviews.filter(rating=int(rating))
+    if request.GET.get('verified') in {'1', 'true'}:
+        reviews = reviews.filter(verified_purchase=True)
+    try:
+        return keyset_page(reviews,
+                           REVIEW_ORDERING,
+                           request.GET.get('after'),
+                           getattr(settings, 'REVIEW_PAGE_SIZE', 10))
+    except InvalidCursor:
+        raise Http404("Invalid page cursor.")
+
+
+def _build_product_fragments(request: HttpRequest, product_id: int):
+    """
+    Renders the product block and the review block (rating summary and
+    the first page of reviews) of the product detail page.
+
+    :param request: The HTTP request; review filters in its query string
+        are applied to the review block.
+    :type request: HttpRequest
+    :param product_id: The unique identifier of the product.
+    :type product_id: int
+    :return: The rendered fragments and the product's id and name, or
+        ``None`` if the product does not exist.
+    :rtype: dict
+    """
+    product = Product.objects.filter(id=product_id).first()
+    if product is None:
+        return None
+    page = _review_page(request, product)
+    return {
+        'product': {'id': product.id, 'name': product.name},
+        'product_block': render_to_string('store/product_block.html',
+                                          {'product': product}),
+        'review_block': render_to_string('store/review_block.html',
+                                         {'product': product,
+                                          'reviews': page.object_list,
+                                          'next_cursor': page.next_cursor}),
+    }
+
+
 def product_detail(request: HttpRequest, product_id: int) -> HttpResponse:
     """
     Fetches and displays the details of a specific product along with
-    its associated reviews.
+    the first page of its reviews. Further pages are loaded from
+    :func:`product_reviews`.
+
+    The rendered product and review blocks are cached per product and
+    marked stale by the signals in :mod:`store.signals` whenever the
+    product or its reviews change. Requests that filter or page the
+    reviews bypass the cache. The stock shown is read on every request
+    with :func:`store.checkout.available_stock`, since it moves with
+    other buyers' reservations and sharded products' shards.
 
     :param request: The HTTP request object containing metadata about
         the request.
@@ -426,15 +900,57 @@ def product_detail(request: HttpRequest, product_id: int) -> HttpResponse:
         detail page with the product information and its reviews.
     :rtype: HttpResponse
     """
-    product = Product.objects.get(id=product_id)
-    reviews = product.review_set.all()
+    if REVIEW_QUERY_PARAMS.intersection(request.GET):
+        fragments = _build_product_fragments(request, product_id)
+    else:
+        fragments = get_or_build(
+            product_detail_key(product_id),
+            lambda: _build_product_fragments(request, product_id),
+            getattr(settings, 'PRODUCT_CACHE_TTL', 300),
+            getattr(settings, 'PRODUCT_CACHE_STALE_TTL', 600))
+    if fragments is None:
+        raise Http404("No Product matches the given query.")
     return render(request,
                   'store/product_detail.html',
-                  {'product': product,
-                   'reviews': reviews}
+                  {'product': fragments['product'],
+                   'available': available_stock([product_id]).get(
+                       product_id, 0),
+                   'product_block': mark_safe(fragments['product_block']),
+                   'review_block': mark_safe(fragments['review_block'])}
                   )
 
 
+def product_reviews(request: HttpRequest, product_id: int) -> JsonResponse:
+    """
+    Returns a page of a product's reviews as JSON for the "load more"
+    button on the product detail page.
+
+    Accepts the same ``after``, ``rating`` and ``verified`` query
+    parameters as the product detail page. Each page is one indexed
+    range query, so a product with 50,000 reviews pages as fast as one
+    with five.
+
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :param product_id: The unique identifier of the reviewed product.
+    :type product_id: int
+    :return: A JSON response with ``results`` and the ``next`` cursor.
+    :rtype: JsonResponse
+    """
+    product = get_object_or_404(Product.objects.only('id'), id=product_id)
+    page = _review_page(request, product)
+    return JsonResponse({
+        'results': [{'id': review.id,
+                     'username': review.user.username,
+                     'rating': review.rating,
+                     'comment': review.comment,
+                     'created_at': review.created_at.isoformat(),
+                     'verified_purchase': review.verified_purchase}
+                    for review in page.object_list],
+        'next': page.next_cursor,
+    })
+
+
 @login_required
 def order_history(request: HttpRequest) -> HttpResponse:
     """
@@ -442,7 +958,8 @@ def order_history(request: HttpRequest) -> HttpResponse:
     and renders it on the order history page. The function queries the
     database for all orders associated with the authenticated user and
     passes the data to the specified
-    HTML template for rendering.
+    HTML template for rendering. Totals and statuses are stored on the
+    order itself, so any number of orders renders from one query.
 
     :param request: The HTTP request object representing the current
         request, which must be initiated by a logged-in user.
@@ -451,7 +968,7 @@ def order_history(request: HttpRequest) -> HttpResponse:
         template with the user's orders.
     :rtype: HttpResponse
     """
-    orders = Order.objects.filter(user=request.user)
+    orders = Order.objects.filter(user=request.user).order_by('-created_at')
     return render(request,
                   'store/order_history.html',
                   {'orders': orders}
@@ -481,6 +998,50 @@ def vendor_store_list(request: HttpRequest) -> HttpResponse:
                   )
 
 
+STORE_EXPORTS = {
+    'products': store_products_export,
+    'orders': store_orders_export,
+}
+
+
+@login_required
+def export_store(request: HttpRequest, store_id: int, dataset: str,
+                 fmt: str) -> StreamingHttpResponse:
+    """
+    Streams a vendor's store data as a CSV or JSON lines download.
+
+    ``dataset`` is ``products`` (the store's catalog) or ``orders`` (every
+    order item bought from the store). Rows are read in primary-key
+    pages of plain values and written to the response as they are
+    produced (see :mod:`store.exports`), so memory use does not grow with
+    the size of the store.
+
+    :param request: The HTTP request of the store owner.
+    :type request: HttpRequest
+    :param store_id: The store to export.
+    :type store_id: int
+    :param dataset: ``products`` or ``orders``.
+    :type dataset: str
+    :param fmt: ``csv`` or ``jsonl``.
+    :type fmt: str
+    :return: The streamed file.
+    :rtype: StreamingHttpResponse
+    :raises Http404: If the store is not the user's, or the dataset or
+        format is unknown.
+    """
+    store = get_object_or_404(Store, id=store_id, owner=request.user)
+    if dataset not in STORE_EXPORTS or fmt not in EXPORT_CONTENT_TYPES:
+        raise Http404("Unknown export.")
+    response = StreamingHttpResponse(STORE_EXPORTS[dataset](store.id, fmt),
+                                     content_type=EXPORT_CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = (
+        f'attachment; filename="store-{store.id}-{dataset}.{fmt}"')
+    return response
+
+
+VENDOR_ORDER_ORDERING = ('-order_id', '-store_id')
+
+
 @login_required
 def vendor_orders(request: HttpRequest) -> HttpResponse:
     """
@@ -489,21 +1050,37 @@ def vendor_orders(request: HttpRequest) -> HttpResponse:
     users with the vendor role and ensures that only orders associated with
     their stores are displayed.
 
+    Orders are read from :class:`store.models.VendorOrderSummary`, newest
+    first, one keyset page at a time: ``?after=`` continues from the
+    previous page and the page size comes from the
+    ``VENDOR_ORDER_PAGE_SIZE`` setting. Each page is an index range seek,
+    so it costs the same however many orders the vendor has.
+
     :param request: The HTTP request object containing metadata about
         the request and the user's session.
     :types request: HttpRequest
     :return: An HTTP response containing rendered vendor-specific
         order details or a 403 response if the user is not a vendor.
     :rtype: HttpResponse
+    :raises Http404: If the cursor is malformed.
     """
     if request.user.role != User.VENDOR:
         return HttpResponse("Only vendors can view store orders.",
                             status=403)
-    stores = Store.objects.filter(owner=request.user)
-    orders = Order.objects.filter(items__product__store__in=stores).distinct()
+    summaries = (VendorOrderSummary.objects
+                 .filter(vendor=request.user)
+                 .select_related('store'))
+    try:
+        page = keyset_page(summaries,
+                           VENDOR_ORDER_ORDERING,
+                           request.GET.get('after'),
+                           getattr(settings, 'VENDOR_ORDER_PAGE_SIZE', 25))
+    except InvalidCursor:
+        raise Http404("Invalid page cursor.")
     return render(request,
                   'store/vendor_orders.html',
-                  {'orders': orders})
+                  {'summaries': page.object_list,
+                   'next_cursor': page.next_cursor})
 
 
 @login_required
@@ -515,19 +1092,23 @@ def create_product(request: HttpRequest, store_id: int) -> HttpResponse:
         if form.is_valid():
             product = form.save(commit=False)
             product.store = store
-            product.save()
             tweet_text = f"New product at {store.name}: {product.name}\n{product.description}"
             user_token = request.session.get('twitter_access_token')
-            if user_token:
-                try:
-                    Tweet._instance.make_tweet({'text': tweet_text}, user_token)
-                except Exception as exc:
-                    error_message = f"Product added, but Twitter posting failed: {exc}"
-            else:
+            # The tweet is queued with the product and posted by the
+            # drain_tweet_outbox worker, never inside this request
+            with transaction.atomic():
+                product.save()
+                if user_token:
+                    TweetOutbox.objects.create(
+                        text=tweet_text,
+                        credential=TwitterCredential.store(request.user,
+                                                           user_token))
+            if not user_token:
                 error_message = "Product added, but you are not authenticated with Twitter."
             return render(request, 'store/product_success.html', {
                 'product': product,
-                'error_message': error_message
+                'error_message': error_message,
+                'tweet_queued': bool(user_token)
             })
     else:
         form = ProductForm()
@@ -546,19 +1127,21 @@ def create_store(request: HttpRequest) -> HttpResponse:
         if form.is_valid():
             store = form.save(commit=False)
             store.owner = request.user
-            store.save()
             tweet_text = f"New store: {store.name}\n{getattr(store, 'description', '')}"
             user_token = request.session.get('twitter_access_token')
-            if user_token:
-                try:
-                    Tweet._instance.make_tweet({'text': tweet_text}, user_token)
-                except Exception as exc:
-                    error_message = f"Store added, but Twitter posting failed: {exc}"
-            else:
+            with transaction.atomic():
+                store.save()
+                if user_token:
+                    TweetOutbox.objects.create(
+                        text=tweet_text,
+                        credential=TwitterCredential.store(request.user,
+                                                           user_token))
+            if not user_token:
                 error_message = "Store added, but you are not authenticated with Twitter."
             return render(request, 'store/store_success.html', {
                 'store': store,
-                'error_message': error_message
+                'error_message': error_message,
+                'tweet_queued': bool(user_token)
             })
     else:
         form = StoreForm()